@@ -0,0 +1,90 @@
+"""Memory benchmark of the `SeriesCollector` (full datasets) vs. the `CompactSeriesCollector` (header only).
+
+A synthetic series of encoded MR instances is decoded the same way the SCP does it (with and without pixel data) and
+collected; the memory held by the collector is measured with `tracemalloc`.
+
+Usage:
+    python benchmarks/bench_collector_memory.py --instances 1000 --rows 256 --columns 256
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydicom import Dataset, dcmread, dcmwrite  # noqa: E402
+from pydicom.dataset import FileMetaDataset  # noqa: E402
+from pydicom.uid import ExplicitVRLittleEndian, MRImageStorage  # noqa: E402
+from client import CompactSeriesCollector, SeriesCollector  # noqa: E402
+
+
+def make_instance(index: int, rows: int, columns: int) -> bytes:
+    """Encode a synthetic MR instance in the DICOM file format."""
+    dataset = Dataset()
+    dataset.PatientID = 'BENCH'
+    dataset.PatientName = 'Bench^Mark'
+    dataset.StudyInstanceUID = '1.2.3'
+    dataset.SeriesInstanceUID = '1.2.3.4'
+    dataset.SOPClassUID = MRImageStorage
+    dataset.SOPInstanceUID = f'1.2.3.4.{index}'
+    dataset.Rows = rows
+    dataset.Columns = columns
+    dataset.BitsAllocated = 16
+    dataset.BitsStored = 16
+    dataset.HighBit = 15
+    dataset.PixelRepresentation = 0
+    dataset.SamplesPerPixel = 1
+    dataset.PhotometricInterpretation = 'MONOCHROME2'
+    dataset.PixelData = bytes(rows * columns * 2)
+    dataset.file_meta = FileMetaDataset()
+    dataset.file_meta.MediaStorageSOPClassUID = MRImageStorage
+    dataset.file_meta.MediaStorageSOPInstanceUID = dataset.SOPInstanceUID
+    dataset.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    buffer = BytesIO()
+    dcmwrite(buffer, dataset, enforce_file_format=True)
+    return buffer.getvalue()
+
+
+def measure(collector_class, instances: list[bytes], stop_before_pixels: bool) -> tuple[int, int, float]:
+    """Collect all instances and return the retained and the peak memory in bytes and the elapsed seconds."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    collector = None
+    for encoded in instances:
+        dataset = dcmread(BytesIO(encoded), stop_before_pixels=stop_before_pixels)
+        if collector is None:
+            collector = collector_class(dataset)
+        else:
+            collector.add_instance(dataset)
+        del dataset
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert collector.instance_count == len(instances)
+    return current, peak, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--instances', type=int, default=1000)
+    parser.add_argument('--rows', type=int, default=256)
+    parser.add_argument('--columns', type=int, default=256)
+    args = parser.parse_args()
+
+    instances = [make_instance(index, args.rows, args.columns) for index in range(args.instances)]
+
+    for name, collector_class, stop_before_pixels in (('full', SeriesCollector, False),
+                                                      ('compact', CompactSeriesCollector, True)):
+        current, peak, elapsed = measure(collector_class, instances, stop_before_pixels)
+        print(f"{name:8} retained {current / 2 ** 20:9.2f} MiB, peak {peak / 2 ** 20:9.2f} MiB, "
+              f"{args.instances / elapsed:9.1f} instances/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Benchmark of the hand-over from the SCP handler threads to the `SeriesDispatcher` collection loop.
+
+Compares the former polling loop (one `queue.Queue.get()` per 200 ms tick) with the event driven `main()`, without
+and with the crash-safe spool, and prints the achieved instances/second.
+
+Usage:
+    python benchmarks/bench_dispatcher_throughput.py --instances 2000 --legacy-instances 25 --producers 8
+"""
+import argparse
+import asyncio
+import io
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydicom import Dataset  # noqa: E402
+from client import SeriesDispatcher  # noqa: E402
+from completion import CompletionTracker  # noqa: E402
+
+
+def make_events(count: int) -> list:
+    """Create fake C-STORE events carrying small datasets of a single series."""
+    events = []
+    for index in range(count):
+        dataset = Dataset()
+        dataset.PatientID = 'BENCH'
+        dataset.PatientName = 'Bench^Mark'
+        dataset.StudyInstanceUID = '1.2.3'
+        dataset.SeriesInstanceUID = '1.2.3.4'
+        dataset.SOPInstanceUID = f'1.2.3.4.{index}'
+        event = MagicMock()
+        event.dataset = dataset
+        event.file_meta = Dataset()
+        event.request.DataSet = io.BytesIO(b'\x00' * 1024)
+        event.assoc.requestor.ae_title = 'BENCHSCU'
+        events.append(event)
+    return events
+
+
+async def run_legacy(dispatcher: SeriesDispatcher, count: int) -> float:
+    """Replicates the former polling `main()` loop and returns the elapsed seconds to collect `count` instances."""
+    legacy_queue: queue.Queue = queue.Queue()
+    for event in make_events(count):
+        legacy_queue.put(event.dataset)
+
+    start = time.perf_counter()
+    collected = 0
+    while collected < count:
+        if not legacy_queue.empty():
+            await dispatcher.run_series_collectors(legacy_queue.get())
+            collected += 1
+        await asyncio.sleep(0.2)
+    return time.perf_counter() - start
+
+
+async def run_event_driven(dispatcher: SeriesDispatcher, count: int, producers: int) -> float:
+    """Feeds `count` instances through `handle_store` from `producers` threads (like concurrent associations) and
+    returns the elapsed seconds until the running `main()` collected all of them."""
+    events = make_events(count)
+    main_task = asyncio.create_task(dispatcher.main())
+    await asyncio.sleep(0)
+
+    def produce(part: list) -> None:
+        for event in part:
+            dispatcher.modality_scp.handle_store(event)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=produce, args=(events[index::producers],)) for index in range(producers)]
+    for thread in threads:
+        thread.start()
+    while True:
+        collector = dispatcher.series_collectors.get('1.2.3.4')
+        if collector is not None and collector.instance_count == count:
+            break
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+
+    for thread in threads:
+        thread.join()
+    main_task.cancel()
+    return elapsed
+
+
+def make_dispatcher(**kwargs) -> SeriesDispatcher:
+    """Create a dispatcher which never dispatches during the measurement, only the collection is benchmarked."""
+    return SeriesDispatcher(completion_tracker=CompletionTracker(default_wait=3600, min_wait=3600), **kwargs)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--instances', type=int, default=2000, help='Instances fed to the event driven loop.')
+    parser.add_argument('--legacy-instances', type=int, default=25, help='Instances fed to the polling loop.')
+    parser.add_argument('--producers', type=int, default=8, help='Threads feeding the event driven loop.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dispatcher = make_dispatcher()
+        legacy = asyncio.run(run_legacy(dispatcher, args.legacy_instances))
+        dispatcher.series_collectors.clear()
+        event_driven = asyncio.run(run_event_driven(dispatcher, args.instances, args.producers))
+        dispatcher.modality_scp.stop()
+        stats = dispatcher.modality_scp.stats.snapshot()
+
+        dispatcher = make_dispatcher(spool_path=os.path.join(tmp_dir, 'spool.db'))
+        spooled = asyncio.run(run_event_driven(dispatcher, args.instances, args.producers))
+        dispatcher.modality_scp.stop()
+
+    print(f"polling loop:  {args.legacy_instances / legacy:10.1f} instances/s ({args.legacy_instances} instances)")
+    print(f"event driven:  {args.instances / event_driven:10.1f} instances/s ({args.instances} instances)")
+    print(f"with spool:    {args.instances / spooled:10.1f} instances/s ({args.instances} instances)")
+    print(f"handler:       mean {stats['handler_time_mean'] * 1e6:.1f} us, max {stats['handler_time_max'] * 1e6:.1f} us, "
+          f"max queue depth {stats['max_queue_depth']}, blocked {stats['blocked_time_total']:.3f} s")
+
+
+if __name__ == '__main__':
+    main()
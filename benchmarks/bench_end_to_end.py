@@ -0,0 +1,250 @@
+"""End-to-end load benchmark of the whole pipeline: C-STORE -> `SeriesDispatcher` -> `POST /series` -> SQLite.
+
+Synthetic series are sent by pynetdicom SCUs (one association per SCU thread) to the `ModalityStoreSCP` of a real
+`SeriesDispatcher`, which posts the complete series to the FastAPI server running in-process with uvicorn on a
+temporary database. Everything runs on localhost, no network access is needed.
+
+The results are printed as JSON (and written to `--output` if given) so runs can be compared across commits:
+instances/second received, series latency percentiles from the first instance and from the last instance of a series
+until the server stored it, peak RSS of the process, and database rows/second.
+
+Usage:
+    python benchmarks/bench_end_to_end.py --series 20 --instances 50 --concurrency 4 --output results.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np  # noqa: E402
+from pydicom import Dataset  # noqa: E402
+from pydicom.dataset import FileMetaDataset  # noqa: E402
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid  # noqa: E402
+from pynetdicom import AE  # noqa: E402
+from pynetdicom.sop_class import CTImageStorage, MRImageStorage  # noqa: E402
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def make_series(instances: int, sop_class: str, rows: int, columns: int) -> list[Dataset]:
+    """Create a synthetic axial series."""
+    study_uid = generate_uid()
+    series_uid = generate_uid()
+    series = []
+    for index in range(instances):
+        dataset = Dataset()
+        dataset.PatientID = f"LOAD{index % 7}"
+        dataset.PatientName = 'Load^Test'
+        dataset.StudyInstanceUID = study_uid
+        dataset.SeriesInstanceUID = series_uid
+        dataset.SOPClassUID = sop_class
+        dataset.SOPInstanceUID = generate_uid()
+        dataset.InstanceNumber = index + 1
+        dataset.ImagePositionPatient = [0.0, 0.0, index * 2.0]
+        dataset.ImageOrientationPatient = [1.0, 0.0, 0.0, 0.0, 1.0, 0.0]
+        dataset.Rows = rows
+        dataset.Columns = columns
+        dataset.BitsAllocated = 16
+        dataset.BitsStored = 16
+        dataset.HighBit = 15
+        dataset.PixelRepresentation = 0
+        dataset.SamplesPerPixel = 1
+        dataset.PhotometricInterpretation = 'MONOCHROME2'
+        dataset.PixelData = bytes(rows * columns * 2)
+        dataset.file_meta = FileMetaDataset()
+        dataset.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+        series.append(dataset)
+    return series
+
+
+def send(port: int, series_list: list[list[Dataset]], sent: dict[str, tuple[float, float]]) -> None:
+    """Send the given series over one association and record the time of the first and the last instance."""
+    ae = AE(ae_title='LOADSCU')
+    ae.add_requested_context(MRImageStorage, ExplicitVRLittleEndian)
+    ae.add_requested_context(CTImageStorage, ExplicitVRLittleEndian)
+    assoc = ae.associate('127.0.0.1', port)
+    if not assoc.is_established:
+        raise RuntimeError("Association rejected")
+    try:
+        for series in series_list:
+            first = time.perf_counter()
+            for dataset in series:
+                status = assoc.send_c_store(dataset)
+                if status.Status != 0x0000:
+                    raise RuntimeError(f"C-STORE failed with status 0x{status.Status:04X}")
+            sent[str(series[0].SeriesInstanceUID)] = (first, time.perf_counter())
+    finally:
+        assoc.release()
+
+
+def start_server(app, port: int):
+    """Run the FastAPI app with uvicorn in a background thread."""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {'p50': float(p50), 'p90': float(p90), 'p99': float(p99), 'max': float(max(values))}
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in kilobytes on Linux, in bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace, server_module) -> dict:
+    from client import SeriesDispatcher
+
+    server_port = free_port()
+    scp_port = free_port()
+    uvicorn_server, server_thread = start_server(server_module.app, server_port)
+
+    dispatcher = SeriesDispatcher(compact=args.compact, server_url=f"http://127.0.0.1:{server_port}",
+                                  batch_window=args.batch_window,
+                                  scp_options={'address': ('127.0.0.1', scp_port),
+                                               'max_associations': args.concurrency + 1})
+    # Record when the server acknowledged each series, i.e. when it was committed
+    stored: dict[str, float] = {}
+    acknowledge = dispatcher.acknowledge
+
+    async def record_acknowledge(series_instance_uids: list[str], sop_instance_uids: list[str]) -> None:
+        now = time.perf_counter()
+        for uid in series_instance_uids:
+            stored.setdefault(uid, now)
+        await acknowledge(series_instance_uids, sop_instance_uids)
+
+    dispatcher.acknowledge = record_acknowledge
+
+    all_series = [make_series(args.instances, MRImageStorage if index % 2 else CTImageStorage, args.rows,
+                              args.columns) for index in range(args.series)]
+    groups = [all_series[index::args.concurrency] for index in range(args.concurrency)]
+    sent: dict[str, tuple[float, float]] = {}
+
+    # Started before the senders connect, `main()` finds it running
+    dispatcher.start()
+    main_task = asyncio.create_task(dispatcher.main())
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        await asyncio.gather(*(loop.run_in_executor(executor, send, scp_port, group, sent)
+                               for group in groups if group))
+    sent_end = time.perf_counter()
+
+    deadline = sent_end + args.timeout
+    while len(stored) < args.series and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    end = time.perf_counter()
+
+    main_task.cancel()
+    try:
+        await main_task
+    except asyncio.CancelledError:
+        pass
+    uvicorn_server.should_exit = True
+    await loop.run_in_executor(None, server_thread.join)
+
+    conn = server_module.db.connect()
+    rows = conn.execute('SELECT COUNT(*) FROM series').fetchone()[0]
+    conn.close()
+    store_times = sorted(stored.values())
+    write_seconds = server_module.DB_WRITE_SECONDS
+    handler_seconds = dispatcher.modality_scp.stats.snapshot()['handler_time_mean']
+
+    total = args.series * args.instances
+    return {
+        'instances': total,
+        'series': args.series,
+        'series_stored': len(stored),
+        'duration_seconds': end - start,
+        'instances_per_second': total / (sent_end - start),
+        'series_latency_seconds': percentiles([stored[uid] - first for uid, (first, _) in sent.items()
+                                               if uid in stored]),
+        'completion_latency_seconds': percentiles([stored[uid] - last for uid, (_, last) in sent.items()
+                                                   if uid in stored]),
+        'peak_rss_bytes': peak_rss_bytes(),
+        'db_rows': rows,
+        'db_rows_per_second': rows / (store_times[-1] - start) if store_times else 0.0,
+        'db_write_seconds_mean': write_seconds.sum / write_seconds.count if write_seconds.count else 0.0,
+        'store_handler_seconds_mean': handler_seconds,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--series', type=int, default=20, help='Number of series sent.')
+    parser.add_argument('--instances', type=int, default=50, help='Instances per series.')
+    parser.add_argument('--concurrency', type=int, default=4, help='Number of SCUs sending in parallel.')
+    parser.add_argument('--rows', type=int, default=128)
+    parser.add_argument('--columns', type=int, default=128)
+    parser.add_argument('--compact', action='store_true', help='Collect only the headers (CompactSeriesCollector).')
+    parser.add_argument('--batch-window', type=float, default=0.0, help='Batch window of the dispatcher in seconds.')
+    parser.add_argument('--write-behind', action='store_true', help='Enable the write-behind mode of the server.')
+    parser.add_argument('--timeout', type=float, default=60.0,
+                        help='Seconds to wait for the series to be stored after the last instance was sent.')
+    parser.add_argument('--output', help='Path of a JSON file the results are written to.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The server reads its configuration from the environment when it is imported
+        os.environ['DICOM_DB_PATH'] = os.path.join(tmp_dir, 'series.db')
+        os.environ['DICOM_DB_WRITE_BEHIND'] = '1' if args.write_behind else '0'
+        import server
+
+        results = asyncio.run(run(args, server))
+        server.db.close()
+        if server.writer is not None:
+            server.writer.close()
+
+    report = {
+        'benchmark': 'end_to_end',
+        'commit': git_commit(),
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'parameters': vars(args),
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Benchmark of the extractor pipeline on one large series with an increasing number of worker processes.
+
+Writes a synthetic axial series to a temporary directory and measures the wall time of `ExtractorPipeline.run` with
+the default extractors, compared with running the extractors sequentially in the calling process. The time of the
+first run of each pool, which includes spawning the workers, is reported separately.
+
+Usage:
+    python benchmarks/bench_extractor_scaling.py --instances 200 --rows 512 --columns 512 --workers 1 2 4 8
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from pydicom import Dataset, dcmwrite  # noqa: E402
+from pydicom.dataset import FileMetaDataset  # noqa: E402
+from pydicom.uid import ExplicitVRLittleEndian, MRImageStorage, generate_uid  # noqa: E402
+from extractors import DEFAULT_EXTRACTORS, ExtractorPipeline, map_chunk  # noqa: E402
+
+
+def write_series(directory: str, instances: int, rows: int, columns: int) -> list[str]:
+    """Write a synthetic series of 16 bit slices with random pixel values and return the file paths."""
+    rng = np.random.default_rng(0)
+    series_uid = generate_uid()
+    paths = []
+    for index in range(instances):
+        dataset = Dataset()
+        dataset.file_meta = FileMetaDataset()
+        dataset.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+        dataset.SOPClassUID = MRImageStorage
+        dataset.SOPInstanceUID = generate_uid()
+        dataset.SeriesInstanceUID = series_uid
+        dataset.InstanceNumber = index + 1
+        dataset.ImagePositionPatient = [0.0, 0.0, float(index) * 2.5]
+        dataset.ImageOrientationPatient = [1.0, 0.0, 0.0, 0.0, 1.0, 0.0]
+        dataset.Rows = rows
+        dataset.Columns = columns
+        dataset.BitsAllocated = 16
+        dataset.BitsStored = 12
+        dataset.HighBit = 11
+        dataset.PixelRepresentation = 0
+        dataset.SamplesPerPixel = 1
+        dataset.PhotometricInterpretation = 'MONOCHROME2'
+        dataset.PixelData = rng.integers(0, 4096, (rows, columns), dtype=np.uint16).tobytes()
+        path = os.path.join(directory, f"{dataset.SOPInstanceUID}.dcm")
+        dcmwrite(path, dataset, enforce_file_format=True)
+        paths.append(path)
+    return paths
+
+
+def run_sequential(paths: list[str]) -> dict:
+    parts = map_chunk(DEFAULT_EXTRACTORS, paths)
+    summary = {}
+    for extractor, extractor_parts in zip(DEFAULT_EXTRACTORS, parts):
+        summary.update(extractor.reduce(extractor_parts))
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--instances', type=int, default=200)
+    parser.add_argument('--rows', type=int, default=512)
+    parser.add_argument('--columns', type=int, default=512)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = write_series(tmp_dir, args.instances, args.rows, args.columns)
+        print(f"{args.instances} instances of {args.rows}x{args.columns}, {os.cpu_count()} CPUs")
+
+        start = time.perf_counter()
+        run_sequential(paths)
+        sequential = time.perf_counter() - start
+        print(f"{'in process':>12} {sequential:8.3f} s")
+
+        for workers in args.workers:
+            pipeline = ExtractorPipeline(max_workers=workers)
+            try:
+                start = time.perf_counter()
+                asyncio.run(pipeline.run(paths))
+                first = time.perf_counter() - start
+
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    asyncio.run(pipeline.run(paths))
+                elapsed = (time.perf_counter() - start) / args.repeat
+            finally:
+                pipeline.close()
+            print(f"{workers:>4} workers {elapsed:8.3f} s  speedup {sequential / elapsed:5.2f}x  "
+                  f"(first run with spawn {first:.3f} s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Microbenchmark of the per-instance CPU time of the C-STORE handler on large multi-frame objects.
+
+Compares decoding the full dataset (`event.dataset`), copying the encoded dataset and reading it up to the pixel data
+(`event.encoded_dataset()` + `dcmread(stop_before_pixels=True)`) and the header scan of `scp.read_header` over the
+receive buffer.
+
+Usage:
+    python benchmarks/bench_handler_parsing.py --frames 100 --rows 512 --columns 512 --repeat 20
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from io import BytesIO
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydicom import Dataset, dcmread, dcmwrite  # noqa: E402
+from pydicom.dataset import FileMetaDataset  # noqa: E402
+from pydicom.filebase import DicomFileLike  # noqa: E402
+from pydicom.filewriter import write_file_meta_info  # noqa: E402
+from pydicom.uid import EnhancedMRImageStorage, ExplicitVRLittleEndian, generate_uid  # noqa: E402
+from pynetdicom.dsutils import decode  # noqa: E402
+from scp import HEADER_KEYWORDS, read_header  # noqa: E402
+
+
+def make_event(frames: int, rows: int, columns: int) -> MagicMock:
+    """Create a fake C-STORE event carrying an encoded multi-frame dataset."""
+    dataset = Dataset()
+    dataset.PatientID = 'BENCH'
+    dataset.PatientName = 'Bench^Mark'
+    dataset.StudyInstanceUID = generate_uid()
+    dataset.SeriesInstanceUID = generate_uid()
+    dataset.SOPClassUID = EnhancedMRImageStorage
+    dataset.SOPInstanceUID = generate_uid()
+    dataset.InstanceNumber = 1
+    dataset.NumberOfFrames = frames
+    dataset.Rows = rows
+    dataset.Columns = columns
+    dataset.BitsAllocated = 16
+    dataset.BitsStored = 16
+    dataset.HighBit = 15
+    dataset.PixelRepresentation = 0
+    dataset.SamplesPerPixel = 1
+    dataset.PhotometricInterpretation = 'MONOCHROME2'
+    dataset.PixelData = bytes(frames * rows * columns * 2)
+    buffer = BytesIO()
+    dcmwrite(buffer, dataset, implicit_vr=False, little_endian=True)
+
+    file_meta = FileMetaDataset()
+    file_meta.MediaStorageSOPClassUID = dataset.SOPClassUID
+    file_meta.MediaStorageSOPInstanceUID = dataset.SOPInstanceUID
+    file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+
+    event = MagicMock()
+    event.request.DataSet = buffer
+    event.context.transfer_syntax = ExplicitVRLittleEndian
+    event.file_meta = file_meta
+
+    def encoded_dataset():
+        # Like pynetdicom: preamble, file meta information and a copy of the received dataset
+        encoded = BytesIO()
+        encoded.write(b'\x00' * 128 + b'DICM')
+        write_file_meta_info(DicomFileLike(encoded), file_meta)
+        encoded.write(buffer.getvalue())
+        return encoded.getvalue()
+
+    event.encoded_dataset.side_effect = encoded_dataset
+    return event
+
+
+def full_decode(event: MagicMock) -> str:
+    dataset = decode(event.request.DataSet, False, True)
+    # Accessing the pixel data like any consumer of the full dataset would
+    dataset.PixelData
+    return dataset.SeriesInstanceUID
+
+
+def copy_and_read(event: MagicMock) -> str:
+    return dcmread(BytesIO(event.encoded_dataset()), stop_before_pixels=True).SeriesInstanceUID
+
+
+def header_scan(event: MagicMock) -> str:
+    return read_header(event, HEADER_KEYWORDS).SeriesInstanceUID
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--rows', type=int, default=512)
+    parser.add_argument('--columns', type=int, default=512)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    logging.getLogger('pynetdicom').setLevel(logging.WARNING)
+    event = make_event(args.frames, args.rows, args.columns)
+    size = event.request.DataSet.getbuffer().nbytes
+    print(f"instance size {size / 2 ** 20:.1f} MiB")
+
+    for name, parse in (('full decode', full_decode), ('copy + read', copy_and_read), ('header scan', header_scan)):
+        start = time.process_time()
+        for _ in range(args.repeat):
+            parse(event)
+            event.request.DataSet.seek(0)
+        elapsed = (time.process_time() - start) / args.repeat
+        print(f"{name:12} {elapsed * 1e6:12.1f} us CPU per instance")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark of the instance-level storage of the server at scale.
+
+Synthetic series with their encoded SOP Instance UIDs are written to the normalized schema of `server.py` in a
+temporary database, `--batch-size` series per transaction as by `/series/batch`. Reported are the instances/second of
+the first insert and of an idempotent resend of all series, the database size per instance, the latency of the
+lookups served by the index plan (instance by UID, first page of the instances of a series, stored instance count of a
+series) with their query plans, and the size of the encoded UIDs of one series vs. a JSON list.
+
+Usage:
+    python benchmarks/bench_instance_store.py --series 1000 --instances 1000 --batch-size 50
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydicom.uid import generate_uid  # noqa: E402
+from uid_codec import encode_uids  # noqa: E402
+
+
+def make_series(index: int, instances: int) -> dict:
+    """Create the payload of a series whose instance UIDs share a root, as generated by a modality."""
+    root = generate_uid()
+    return {
+        'PatientID': f'P{index % 1000}',
+        'PatientName': 'Bench^Mark',
+        'StudyInstanceUID': f'1.2.3.{index // 4}',
+        'SeriesInstanceUID': f'{root}.0',
+        'InstanceInSeries': instances,
+        'EncodedSOPInstanceUIDs': encode_uids([f'{root}.{number}' for number in range(1, instances + 1)]),
+    }
+
+
+def write_all(server, conn, payloads: list[dict], batch_size: int) -> float:
+    """Write all series in transactions of `batch_size` series and return the elapsed seconds."""
+    start = time.perf_counter()
+    for offset in range(0, len(payloads), batch_size):
+        batch = payloads[offset:offset + batch_size]
+        server.store_series(conn, [server.series_record(series) for series in batch])
+    return time.perf_counter() - start
+
+
+def latency_us(conn, query: str, params_list: list[tuple]) -> float:
+    """Return the median latency of a query in microseconds."""
+    latencies = []
+    for params in params_list:
+        start = time.perf_counter()
+        conn.execute(query, params).fetchall()
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--series', type=int, default=1000)
+    parser.add_argument('--instances', type=int, default=1000, help='Instances per series.')
+    parser.add_argument('--batch-size', type=int, default=50, help='Series per transaction.')
+    parser.add_argument('--lookups', type=int, default=1000, help='Number of lookups timed per query.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The server reads its configuration from the environment when it is imported
+        path = os.path.join(tmp_dir, 'series.db')
+        os.environ['DICOM_DB_PATH'] = path
+        import server
+        server.init_db()
+
+        payloads = [make_series(index, args.instances) for index in range(args.series)]
+        total = args.series * args.instances
+        conn = server.db.connect()
+
+        elapsed = write_all(server, conn, payloads, args.batch_size)
+        print(f"insert: {total / elapsed:12.0f} instances/s ({total} instances in {elapsed:.1f} s)")
+        elapsed = write_all(server, conn, payloads, args.batch_size)
+        print(f"resend: {total / elapsed:12.0f} instances/s (idempotent, nothing changed)")
+
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        size = os.path.getsize(path)
+        print(f"database: {size / 2 ** 20:.1f} MiB, {size / total:.1f} bytes/instance")
+
+        series_uids = [payload['SeriesInstanceUID'] for payload in payloads]
+        step = max(1, len(series_uids) // args.lookups)
+        sampled = series_uids[::step][:args.lookups]
+        queries = {
+            'instance by UID': ('SELECT SeriesInstanceUID FROM instances WHERE SOPInstanceUID = ?',
+                                [(uid[:-1] + '7',) for uid in sampled]),
+            'instances of series': ('SELECT SOPInstanceUID FROM instances WHERE SeriesInstanceUID = ? '
+                                    "AND SOPInstanceUID > '' ORDER BY SOPInstanceUID LIMIT 100",
+                                    [(uid,) for uid in sampled]),
+            'stored count': ('SELECT StoredInstances FROM series WHERE SeriesInstanceUID = ?',
+                             [(uid,) for uid in sampled]),
+        }
+        for name, (query, params_list) in queries.items():
+            plan = '; '.join(row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {query}', params_list[0]))
+            print(f"{name:20} {latency_us(conn, query, params_list):8.1f} us  ({plan})")
+        conn.close()
+        server.db.close()
+
+    uids = [f'1.2.826.0.1.3680043.8.498.{index}' for index in range(args.instances)]
+    print(f"payload of {args.instances} UIDs: {len(encode_uids(uids))} bytes encoded, "
+          f"{len(json.dumps(uids))} bytes as JSON list")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Benchmark of the read endpoints of the server under a read-heavy mixed workload, with and without the read cache.
+
+The database in a temporary directory is filled with `--series` series of `--patients` patients. Then concurrent
+clients send a random mix of requests, most of them reads of a small set of hot series and patients (as a UI polling
+the recent studies): series lookups, patient listings, and a share of conditional requests (`If-None-Match` with the
+ETag of the previous response of the client), interleaved with `--write-ratio` upserts of hot series, which
+invalidate the cached responses. The app is driven in-process through `httpx.ASGITransport`. Requests/second, latency
+percentiles, the cache hit ratio and the number of 304 responses are reported.
+
+Usage:
+    python benchmarks/bench_read_cache.py --requests 20000 --write-ratio 0.05 --concurrency 16
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+
+def make_series(count: int, patients: int) -> list[dict]:
+    return [
+        {
+            'PatientID': f'P{index % patients}',
+            'PatientName': 'Bench^Mark',
+            'StudyInstanceUID': f'1.2.3.{index // 4}',
+            'SeriesInstanceUID': f'1.2.4.{index}',
+            'InstanceInSeries': 100
+        }
+        for index in range(count)
+    ]
+
+
+def make_workload(args: argparse.Namespace, series: list[dict]) -> list[tuple[str, str, dict | None]]:
+    """Return the requests as (method, path, body). Reads target the hot series and their patients."""
+    rng = random.Random(42)
+    hot = series[-args.hot:]
+    requests = []
+    for _ in range(args.requests):
+        target = rng.choice(hot)
+        draw = rng.random()
+        if draw < args.write_ratio:
+            requests.append(('POST', '/series', dict(target, InstanceInSeries=rng.randrange(1, 1000))))
+        elif draw < args.write_ratio + (1 - args.write_ratio) / 2:
+            requests.append(('GET', f"/series/{target['SeriesInstanceUID']}", None))
+        else:
+            requests.append(('GET', f"/series?PatientID={target['PatientID']}", None))
+    return requests
+
+
+async def run(app, requests: list, concurrency: int, conditional_ratio: float) -> tuple[list[float], int]:
+    """Send all requests with `concurrency` parallel clients and return the latencies and the number of 304s."""
+    latencies = []
+    not_modified = 0
+    request_iter = iter(requests)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        async def worker(seed: int) -> None:
+            nonlocal not_modified
+            rng = random.Random(seed)
+            etags: dict[str, str] = {}
+            for method, path, body in request_iter:
+                headers = {}
+                if method == 'GET' and path in etags and rng.random() < conditional_ratio:
+                    headers['If-None-Match'] = etags[path]
+                start = time.perf_counter()
+                response = await client.request(method, path, json=body, headers=headers)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code == 304:
+                    not_modified += 1
+                else:
+                    response.raise_for_status()
+                if 'ETag' in response.headers:
+                    etags[path] = response.headers['ETag']
+
+        await asyncio.gather(*(worker(seed) for seed in range(concurrency)))
+    return latencies, not_modified
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--series', type=int, default=20000)
+    parser.add_argument('--patients', type=int, default=2000)
+    parser.add_argument('--hot', type=int, default=200, help='Number of hot series the requests target.')
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--write-ratio', type=float, default=0.05, help='Share of upserts among the requests.')
+    parser.add_argument('--conditional-ratio', type=float, default=0.5,
+                        help='Share of repeated reads sent with If-None-Match.')
+    parser.add_argument('--concurrency', type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The server reads its configuration from the environment when it is imported
+        os.environ['DICOM_DB_PATH'] = os.path.join(tmp_dir, 'series.db')
+        import server
+        server.init_db()
+        from database import ReadCache
+
+        series = make_series(args.series, args.patients)
+        conn = server.db.connect()
+        server.store_series(conn, [server.series_record(data) for data in series])
+        conn.close()
+        requests = make_workload(args, series)
+        cache = server.read_cache or ReadCache()
+
+        for name, read_cache in (('no cache', None), ('cache', cache)):
+            server.read_cache = read_cache
+            hits, misses = server.READ_CACHE_HITS.value, server.READ_CACHE_MISSES.value
+            start = time.perf_counter()
+            latencies, not_modified = asyncio.run(run(server.app, requests, args.concurrency,
+                                                      args.conditional_ratio))
+            elapsed = time.perf_counter() - start
+            quantiles = statistics.quantiles(latencies, n=100)
+            hits, misses = server.READ_CACHE_HITS.value - hits, server.READ_CACHE_MISSES.value - misses
+            hit_ratio = f"hit ratio {hits / (hits + misses):5.1%}" if hits + misses else ''
+            print(f"{name:9} {len(latencies) / elapsed:9.1f} req/s  p50 {quantiles[49] * 1000:7.2f} ms  "
+                  f"p99 {quantiles[98] * 1000:7.2f} ms  304s {not_modified:6}  {hit_ratio}")
+        server.db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Benchmark of the DICOM ingestion with several modalities sending at the same time.
+
+N series are sent by pynetdicom SCUs to a running `SeriesDispatcher`, once with one association sending all series
+one after the other and once with one association per series in parallel. Reported is the time until all instances
+were collected.
+
+Usage:
+    python benchmarks/bench_scp_parallel.py --series 8 --instances 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydicom import Dataset  # noqa: E402
+from pydicom.dataset import FileMetaDataset  # noqa: E402
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid  # noqa: E402
+from pynetdicom import AE  # noqa: E402
+from pynetdicom.sop_class import CTImageStorage, MRImageStorage  # noqa: E402
+from client import SeriesDispatcher  # noqa: E402
+
+PORT = 6667
+
+
+def make_series(instances: int, sop_class: str, rows: int = 64, columns: int = 64) -> list[Dataset]:
+    """Create a synthetic series of small images."""
+    study_uid = generate_uid()
+    series_uid = generate_uid()
+    series = []
+    for index in range(instances):
+        dataset = Dataset()
+        dataset.PatientID = 'BENCH'
+        dataset.PatientName = 'Bench^Mark'
+        dataset.StudyInstanceUID = study_uid
+        dataset.SeriesInstanceUID = series_uid
+        dataset.SOPClassUID = sop_class
+        dataset.SOPInstanceUID = generate_uid()
+        dataset.InstanceNumber = index + 1
+        dataset.Rows = rows
+        dataset.Columns = columns
+        dataset.BitsAllocated = 16
+        dataset.BitsStored = 16
+        dataset.HighBit = 15
+        dataset.PixelRepresentation = 0
+        dataset.SamplesPerPixel = 1
+        dataset.PhotometricInterpretation = 'MONOCHROME2'
+        dataset.PixelData = bytes(rows * columns * 2)
+        dataset.file_meta = FileMetaDataset()
+        dataset.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+        series.append(dataset)
+    return series
+
+
+def send(series_list: list[list[Dataset]]) -> None:
+    """Send the given series over one association."""
+    ae = AE(ae_title='BENCHSCU')
+    ae.add_requested_context(MRImageStorage, ExplicitVRLittleEndian)
+    ae.add_requested_context(CTImageStorage, ExplicitVRLittleEndian)
+    assoc = ae.associate('127.0.0.1', PORT)
+    if not assoc.is_established:
+        raise RuntimeError("Association rejected")
+    for series in series_list:
+        for dataset in series:
+            status = assoc.send_c_store(dataset)
+            if status.Status != 0x0000:
+                raise RuntimeError(f"C-STORE failed with status 0x{status.Status:04X}")
+    assoc.release()
+
+
+async def run(dispatcher: SeriesDispatcher, all_series: list[list[Dataset]], parallel: bool) -> float:
+    """Send all series and return the seconds until all instances have been collected."""
+    dispatcher.series_collectors.clear()
+    loop = asyncio.get_running_loop()
+    groups = [[series] for series in all_series] if parallel else [all_series]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+        senders = [loop.run_in_executor(executor, send, group) for group in groups]
+        await asyncio.gather(*senders)
+        expected = sum(len(series) for series in all_series)
+        while sum(collector.instance_count for collector in dispatcher.series_collectors.values()) < expected:
+            await asyncio.sleep(0.001)
+    return time.perf_counter() - start
+
+
+async def bench(args: argparse.Namespace) -> None:
+    dispatcher = SeriesDispatcher(compact=True, scp_options={'max_associations': args.series})
+    # Never dispatch during the measurement, only the ingestion is benchmarked
+    dispatcher.dispatch_interval = 3600
+    all_series = [make_series(args.instances, MRImageStorage if index % 2 else CTImageStorage)
+                  for index in range(args.series)]
+    total = args.series * args.instances
+
+    # Started before the senders connect, `main()` finds it running
+    dispatcher.start()
+    main_task = asyncio.create_task(dispatcher.main())
+    sequential = await run(dispatcher, all_series, parallel=False)
+    parallel = await run(dispatcher, all_series, parallel=True)
+    main_task.cancel()
+    await dispatcher.stop()
+
+    print(f"1 association:   {total / sequential:9.1f} instances/s")
+    print(f"{args.series} associations: {total / parallel:9.1f} instances/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--series', type=int, default=8)
+    parser.add_argument('--instances', type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(bench(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Benchmark of the SCP worker processes (`SeriesDispatcher(scp_workers=N)`) sharing one port.
+
+N series are sent in parallel by pynetdicom SCUs running in separate sender processes, so the senders are not limited
+by the GIL of the benchmark process. Reported is the number of instances/second until all instances were collected by
+the dispatcher, with the SCP in process and with 1, 2, 4 and 8 worker processes. The speedup is bounded by the number
+of CPU cores.
+
+Usage:
+    python benchmarks/bench_scp_workers.py --series 8 --instances 100 --workers 1 2 4 8
+"""
+import argparse
+import asyncio
+import multiprocessing
+from multiprocessing.pool import Pool
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydicom import Dataset  # noqa: E402
+from pydicom.dataset import FileMetaDataset  # noqa: E402
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid  # noqa: E402
+from pynetdicom import AE  # noqa: E402
+from pynetdicom.sop_class import MRImageStorage  # noqa: E402
+from client import SeriesDispatcher  # noqa: E402
+
+PORT = 6669
+
+
+def send_series(instances: int, rows: int = 64, columns: int = 64) -> None:
+    """Create a synthetic series of small images and send it over one association."""
+    study_uid = generate_uid()
+    series_uid = generate_uid()
+    ae = AE(ae_title='BENCHSCU')
+    ae.add_requested_context(MRImageStorage, ExplicitVRLittleEndian)
+    assoc = ae.associate('127.0.0.1', PORT)
+    if not assoc.is_established:
+        raise RuntimeError("Association rejected")
+    for index in range(instances):
+        dataset = Dataset()
+        dataset.PatientID = 'BENCH'
+        dataset.PatientName = 'Bench^Mark'
+        dataset.StudyInstanceUID = study_uid
+        dataset.SeriesInstanceUID = series_uid
+        dataset.SOPClassUID = MRImageStorage
+        dataset.SOPInstanceUID = generate_uid()
+        dataset.InstanceNumber = index + 1
+        dataset.Rows = rows
+        dataset.Columns = columns
+        dataset.BitsAllocated = 16
+        dataset.BitsStored = 16
+        dataset.HighBit = 15
+        dataset.PixelRepresentation = 0
+        dataset.SamplesPerPixel = 1
+        dataset.PhotometricInterpretation = 'MONOCHROME2'
+        dataset.PixelData = bytes(rows * columns * 2)
+        dataset.file_meta = FileMetaDataset()
+        dataset.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+        status = assoc.send_c_store(dataset)
+        if status.Status != 0x0000:
+            raise RuntimeError(f"C-STORE failed with status 0x{status.Status:04X}")
+    assoc.release()
+
+
+async def run(args: argparse.Namespace, workers: int, senders: Pool) -> float:
+    """Send all series from the sender processes and return the instances/second until all were collected."""
+    dispatcher = SeriesDispatcher(compact=True, scp_workers=workers,
+                                  scp_options={'address': ('127.0.0.1', PORT), 'max_associations': args.series})
+    # Never dispatch during the measurement, only the ingestion is benchmarked
+    dispatcher.dispatch_interval = 3600
+    # Started before the senders connect, `main()` finds it running
+    dispatcher.start()
+    main_task = asyncio.create_task(dispatcher.main())
+    loop = asyncio.get_running_loop()
+    expected = args.series * args.instances
+
+    start = time.perf_counter()
+    await loop.run_in_executor(None, senders.map, send_series, [args.instances] * args.series)
+    while sum(collector.instance_count for collector in dispatcher.series_collectors.values()) < expected:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+
+    main_task.cancel()
+    await dispatcher.stop()
+    return expected / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--series', type=int, default=8, help='Number of series, each sent by its own SCU.')
+    parser.add_argument('--instances', type=int, default=100, help='Instances per series.')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='Numbers of SCP workers.')
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, {args.series} series of {args.instances} instances")
+    with multiprocessing.get_context('spawn').Pool(args.series) as senders:
+        for workers in [0] + args.workers:
+            label = 'in process' if workers == 0 else f'{workers} workers'
+            print(f"{label:>12}: {asyncio.run(run(args, workers, senders)):9.1f} instances/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Benchmark of the consistency checks of a complete series, vectorized vs. a naive loop over the datasets.
+
+`SeriesGeometry` records the attributes of each instance while the series is collected and runs the checks on NumPy
+arrays at dispatch. The naive variant visits every dataset at dispatch and computes the same results with Python
+lists, sets and `sorted`.
+
+Usage:
+    python benchmarks/bench_series_analysis.py --instances 5000 --repeat 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydicom import Dataset  # noqa: E402
+from pydicom.uid import generate_uid  # noqa: E402
+from series_analysis import SeriesGeometry, dicom_time_seconds  # noqa: E402
+
+
+def make_series(instances: int) -> list[Dataset]:
+    """Create the header of an axial series with one missing slice, received in reverse order."""
+    datasets = []
+    for index in range(instances, 0, -1):
+        if index == instances // 2:
+            continue
+        dataset = Dataset()
+        dataset.SOPInstanceUID = generate_uid()
+        dataset.InstanceNumber = index
+        dataset.AcquisitionTime = f"12{index // 60 % 60:02d}{index % 60:02d}.{index % 1000:03d}"
+        dataset.ImagePositionPatient = [-120.0, -120.0, index * 0.8]
+        dataset.ImageOrientationPatient = [1.0, 0.0, 0.0, 0.0, 1.0, 0.0]
+        datasets.append(dataset)
+    return datasets
+
+
+def naive_analysis(datasets: list[Dataset]) -> dict:
+    uids = [str(dataset.SOPInstanceUID) for dataset in datasets]
+    summary = {'DuplicateSOPInstanceUIDs': len(uids) - len(set(uids))}
+
+    numbers = sorted({int(dataset.InstanceNumber) for dataset in datasets})
+    summary['MissingInstanceNumbers'] = numbers[-1] - numbers[0] + 1 - len(numbers)
+
+    times = [dicom_time_seconds(dataset.AcquisitionTime) for dataset in datasets]
+    summary['AcquisitionDuration'] = max(times) - min(times)
+
+    orientations = [tuple(dataset.ImageOrientationPatient) for dataset in datasets]
+    summary['MixedOrientations'] = sum(orientation != orientations[0] for orientation in orientations)
+
+    row, column = datasets[0].ImageOrientationPatient[:3], datasets[0].ImageOrientationPatient[3:]
+    normal = (row[1] * column[2] - row[2] * column[1], row[2] * column[0] - row[0] * column[2],
+              row[0] * column[1] - row[1] * column[0])
+    slices = sorted((sum(p * n for p, n in zip(dataset.ImagePositionPatient, normal)), int(dataset.InstanceNumber))
+                    for dataset in datasets)
+    spacings = [b[0] - a[0] for a, b in zip(slices, slices[1:])]
+    distinct = [spacing for spacing in spacings if spacing >= 1e-3]
+    spacing = statistics.median(distinct)
+    summary['SliceSpacing'] = spacing
+    summary['DuplicateSlices'] = len(spacings) - len(distinct)
+    summary['MissingSlices'] = sum(max(round(value / spacing) - 1, 0) for value in distinct)
+    steps = [b[1] - a[1] for a, b in zip(slices, slices[1:])]
+    summary['InstanceNumberOrder'] = ('ascending' if all(step > 0 for step in steps) else
+                                      'descending' if all(step < 0 for step in steps) else 'unordered')
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--instances', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    datasets = make_series(args.instances)
+    print(f"{len(datasets)} instances")
+
+    start = time.perf_counter()
+    geometry = SeriesGeometry()
+    for dataset in datasets:
+        geometry.add(dataset)
+    elapsed = time.perf_counter() - start
+    print(f"{'record':18} {elapsed / len(datasets) * 1e6:10.2f} us per instance, during collection")
+
+    # The first call includes importing parts of NumPy lazily
+    geometry.analyze()
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        vectorized = geometry.analyze()
+    elapsed = (time.perf_counter() - start) / args.repeat
+    print(f"{'vectorized':18} {elapsed * 1e3:10.2f} ms per series at dispatch")
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        naive = naive_analysis(datasets)
+    elapsed = (time.perf_counter() - start) / args.repeat
+    print(f"{'naive loop':18} {elapsed * 1e3:10.2f} ms per series at dispatch")
+
+    assert vectorized.keys() == naive.keys(), (vectorized, naive)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Load test of the series ingestion of the FastAPI server, single requests vs. batch requests vs. single requests
+with write-behind group commits.
+
+The app is driven in-process through `httpx.ASGITransport` against a database in a temporary directory, with a
+configurable number of concurrent clients. All three modes are measured at each durability setting of `--synchronous`
+(the `synchronous` pragma of all connections, `DICOM_DB_SYNCHRONOUS` of the server), so they are compared at the same
+durability. Requests/second, series/second and latency percentiles are reported.
+
+Usage:
+    python benchmarks/bench_server_ingest.py --series 2000 --batch-size 100 --concurrency 16 --synchronous NORMAL FULL
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+
+def make_series(count: int, prefix: str) -> list[dict]:
+    return [
+        {
+            'PatientID': f'P{index % 100}',
+            'PatientName': 'Bench^Mark',
+            'StudyInstanceUID': f'1.2.3.{index % 500}',
+            'SeriesInstanceUID': f'{prefix}.{index}',
+            'InstanceInSeries': index % 300 + 1
+        }
+        for index in range(count)
+    ]
+
+
+async def run(app, path: str, payloads: list, concurrency: int) -> list[float]:
+    """Post all payloads with `concurrency` parallel clients and return the latency of each request in seconds."""
+    latencies = []
+    payload_iter = iter(payloads)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        async def worker() -> None:
+            for payload in payload_iter:
+                start = time.perf_counter()
+                response = await client.post(path, json=payload)
+                latencies.append(time.perf_counter() - start)
+                response.raise_for_status()
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+def report(name: str, latencies: list[float], elapsed: float, series: int) -> None:
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    print(f"{name:8} {len(latencies) / elapsed:9.1f} req/s {series / elapsed:10.1f} series/s  "
+          f"p50 {quantiles[49] * 1000:8.2f} ms  p99 {quantiles[98] * 1000:8.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--series', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--synchronous', nargs='+', default=['NORMAL', 'FULL'], choices=('NORMAL', 'FULL'),
+                        help='Durability settings all modes are measured at.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        import server
+        from database import GroupCommitWriter
+        from server import app
+        server.init_db()
+
+        for synchronous in args.synchronous:
+            # The connections are opened again with the new setting
+            server.db.close()
+            server.db.synchronous = synchronous
+            print(f"synchronous={synchronous}")
+
+            single = make_series(args.series, f'1.1.{synchronous}')
+            start = time.perf_counter()
+            latencies = asyncio.run(run(app, '/series', single, args.concurrency))
+            report('single', latencies, time.perf_counter() - start, args.series)
+
+            series = make_series(args.series, f'1.2.{synchronous}')
+            batches = [series[i:i + args.batch_size] for i in range(0, len(series), args.batch_size)]
+            start = time.perf_counter()
+            latencies = asyncio.run(run(app, '/series/batch', batches, args.concurrency))
+            report('batch', latencies, time.perf_counter() - start, args.series)
+
+            server.writer = GroupCommitWriter(server.db, server.UPSERT_SERIES)
+            single = make_series(args.series, f'1.3.{synchronous}')
+            start = time.perf_counter()
+            latencies = asyncio.run(run(app, '/series', single, args.concurrency))
+            report('w-behind', latencies, time.perf_counter() - start, args.series)
+            server.writer.close()
+            server.writer = None
+        server.db.close()
+        os.chdir(REPO_DIR)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark of the startup of the client and the server, as paid by every restart and test run.
+
+Reported are the cold import times of the entry point modules, each measured in a fresh interpreter (median of
+`--repeat` runs), and the time to construct, `start()` and `stop()` a `SeriesDispatcher` (SCP in process and, with
+`--workers`, in worker processes) and to start and stop the server app through its lifespan on a temporary database.
+The imports have no side effects: constructing the dispatcher binds no port and importing the server opens no
+database, both only happen when they are started.
+
+Usage:
+    python benchmarks/bench_startup.py --repeat 5 --workers 2
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+MODULES = ['view_database', 'scp', 'client', 'server']
+PORT = 6670
+
+
+def import_seconds(module: str, repeat: int) -> float:
+    """Return the median time to import `module` in a fresh interpreter, without the interpreter startup."""
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code], cwd=REPO_DIR, check=True, capture_output=True,
+                                text=True).stdout
+        times.append(float(output.split()[-1]))
+    return statistics.median(times)
+
+
+async def dispatcher_lifecycle(**kwargs) -> tuple[float, float, float]:
+    """Return the seconds to construct, start and stop a dispatcher."""
+    from client import SeriesDispatcher
+
+    start = time.perf_counter()
+    dispatcher = SeriesDispatcher(compact=True, scp_options={'address': ('127.0.0.1', PORT)}, **kwargs)
+    constructed = time.perf_counter()
+    dispatcher.start()
+    started = time.perf_counter()
+    await dispatcher.stop()
+    stopped = time.perf_counter()
+    return constructed - start, started - constructed, stopped - started
+
+
+def server_lifecycle(app) -> tuple[float, float]:
+    """Return the seconds to run the startup and the shutdown of the lifespan of the app."""
+    from fastapi.testclient import TestClient
+
+    client = TestClient(app)
+    start = time.perf_counter()
+    client.__enter__()
+    started = time.perf_counter()
+    client.__exit__(None, None, None)
+    return started - start, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters per import measurement.')
+    parser.add_argument('--workers', type=int, default=2, help='SCP worker processes, 0 to skip.')
+    args = parser.parse_args()
+
+    for module in MODULES:
+        print(f"import {module:14} {import_seconds(module, args.repeat) * 1000:8.1f} ms")
+
+    variants = {'dispatcher': {}}
+    if args.workers > 0:
+        variants[f'{args.workers} SCP workers'] = {'scp_workers': args.workers}
+    for name, kwargs in variants.items():
+        constructed, started, stopped = asyncio.run(dispatcher_lifecycle(**kwargs))
+        print(f"{name:21} construct {constructed * 1000:8.1f} ms  start {started * 1000:8.1f} ms  "
+              f"stop {stopped * 1000:8.1f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The server reads its configuration from the environment when it is imported
+        os.environ['DICOM_DB_PATH'] = os.path.join(tmp_dir, 'series.db')
+        import server
+
+        # The first start creates the database, a restart finds it in place
+        for name in ('server', 'server restart'):
+            started, stopped = server_lifecycle(server.app)
+            print(f"{name:21} {'':19} start {started * 1000:8.1f} ms  stop {stopped * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark of the request body formats of the series ingestion: payload size and server CPU time per 10k series.
+
+Compared are JSON validated with a pydantic model per series (`server.SeriesData`, as `POST /series` does), JSON
+checked directly (as `POST /series/batch` does), msgpack, and gzip compressed msgpack. The server side is measured as
+the CPU time to decode a body with `payload.decode` and to build the database rows of all series with
+`server.decode_records`, without the database writes. The client side is measured as the CPU time to encode the body.
+
+Usage:
+    python benchmarks/bench_wire_format.py --series 10000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import TypeAdapter  # noqa: E402
+from pydicom.uid import generate_uid  # noqa: E402
+import payload  # noqa: E402
+from uid_codec import encode_uids  # noqa: E402
+
+
+def make_batch(series: int, instances: int) -> list[dict]:
+    batch = []
+    for index in range(series):
+        root = generate_uid()
+        batch.append({
+            'PatientID': f'P{index % 1000}',
+            'PatientName': 'Bench^Mark',
+            'StudyInstanceUID': f'1.2.3.{index // 4}',
+            'SeriesInstanceUID': f'{root}.0',
+            'InstanceInSeries': instances,
+            'Summary': {'DuplicateSOPInstanceUIDs': 0, 'MissingInstanceNumbers': 0, 'InstanceNumberOrder': 'spatial',
+                        'SliceSpacing': 1.25, 'DuplicateSlices': 0, 'MissingSlices': 0},
+        })
+        if instances:
+            uids = [f'{root}.{number}' for number in range(1, instances + 1)]
+            batch[-1]['EncodedSOPInstanceUIDs'] = encode_uids(uids)
+    return batch
+
+
+def cpu_seconds(func, repeat: int) -> float:
+    """Return the minimum CPU time of `repeat` calls of `func`."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.process_time()
+        func()
+        best = min(best, time.process_time() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--series', type=int, default=10000)
+    parser.add_argument('--instances', type=int, default=0,
+                        help='Instances per series whose UIDs are sent, none by default. Decoding the UIDs costs the '
+                             'same in all formats.')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The server reads its configuration from the environment when it is imported
+        os.environ['DICOM_DB_PATH'] = os.path.join(tmp_dir, 'series.db')
+        import server
+        server.init_db()
+
+        batch = make_batch(args.series, args.instances)
+        adapter = TypeAdapter(list[server.SeriesData])
+
+        def decode_pydantic(body: bytes) -> list:
+            records = []
+            for data in adapter.validate_json(body):
+                summary = data.Summary.model_dump_json(exclude_none=True) if data.Summary is not None else None
+                row = (data.SeriesInstanceUID, data.PatientID, data.PatientName, data.StudyInstanceUID,
+                       data.InstanceInSeries, summary)
+                records.append((row, server.instance_rows(data.model_dump())))
+            return records
+
+        def decode_direct(body: bytes, headers: dict) -> list:
+            return server.decode_records(payload.decode(body, headers['Content-Type'],
+                                                        headers.get('Content-Encoding')))
+
+        variants = {
+            'json + pydantic': (payload.JSON, None, decode_pydantic),
+            'json': (payload.JSON, None, None),
+            'msgpack': (payload.MSGPACK, None, None),
+            'msgpack + gzip': (payload.MSGPACK, 0, None),
+        }
+        scale = 10000 / args.series
+        print(f"{args.series} series of {args.instances} instances, CPU time per 10k series")
+        for name, (content_type, compress_min_bytes, decoder) in variants.items():
+            body, headers = payload.encode(batch, content_type, compress_min_bytes)
+            encode_time = cpu_seconds(lambda: payload.encode(batch, content_type, compress_min_bytes), args.repeat)
+            if decoder is None:
+                decode_time = cpu_seconds(lambda: decode_direct(body, headers), args.repeat)
+            else:
+                decode_time = cpu_seconds(lambda: decoder(body), args.repeat)
+            print(f"{name:16} {len(body) * scale / 2 ** 20:8.2f} MiB  server {decode_time * scale * 1000:8.1f} ms  "
+                  f"client {encode_time * scale * 1000:8.1f} ms")
+        server.db.close()
+
+    uncompressed = len(json.dumps(batch))
+    print(f"(JSON with spaces as sent by aiohttp: {uncompressed * scale / 2 ** 20:.2f} MiB)")
+
+
+if __name__ == '__main__':
+    main()
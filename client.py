@@ -1,9 +1,43 @@
 import asyncio
+import logging
+import os
 import time
+from typing import NamedTuple
 from pydicom import Dataset
 from scp import ModalityStoreSCP
+from scp_pool import ScpWorkerPool, shard_index
+from completion import CompletionTracker
+from spool import InstanceSpool
+from extractors import ExtractorPipeline
+from series_analysis import SeriesGeometry
+from uid_codec import encode_uids
+import payload
+import metrics
 import aiohttp
 
+logger = logging.getLogger(__name__)
+
+SERIES_DISPATCHED = metrics.Counter('dicom_dispatcher_series_dispatched_total', "Series dispatched to the server.")
+INSTANCES_PER_SERIES = metrics.Histogram('dicom_dispatcher_instances_per_series',
+                                         "Number of instances of the dispatched series.",
+                                         buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000))
+DISPATCH_DELAY_SECONDS = metrics.Histogram('dicom_dispatcher_dispatch_delay_seconds',
+                                           "Time from the last instance of a series to its dispatch.")
+POST_SECONDS = metrics.Histogram('dicom_dispatcher_post_seconds', "Latency of the HTTP requests to the server.")
+POST_FAILURES = metrics.Counter('dicom_dispatcher_post_failures_total',
+                                "HTTP requests to the server which failed, including retried ones.")
+
+
+class SeriesHeader(NamedTuple):
+    """The header fields of a series which are sent to the server, taken from the first instance of the series."""
+    PatientID: str
+    PatientName: str
+    StudyInstanceUID: str
+
+    @classmethod
+    def from_dataset(cls, dataset: Dataset) -> 'SeriesHeader':
+        return cls(str(dataset.PatientID), str(dataset.PatientName), str(dataset.StudyInstanceUID))
+
 
 class SeriesCollector:
     """A Series Collector is used to build up a list of instances (a DICOM series) as they are received by the modality.
@@ -19,6 +53,8 @@ class SeriesCollector:
         """
         self.series_instance_uid = first_dataset.SeriesInstanceUID
         self.series: list[Dataset] = [first_dataset]
+        self.geometry = SeriesGeometry()
+        self.geometry.add(first_dataset)
         self.last_update_time = time.time()
         self.dispatch_started = False
 
@@ -33,11 +69,75 @@ class SeriesCollector:
         """
         if self.series_instance_uid == dataset.SeriesInstanceUID:
             self.series.append(dataset)
+            self.geometry.add(dataset)
             self.last_update_time = time.time()
             return True
 
         return False
 
+    @property
+    def header(self) -> SeriesHeader:
+        """The header fields of the series, taken from the first instance."""
+        return SeriesHeader.from_dataset(self.series[0])
+
+    @property
+    def instance_count(self) -> int:
+        """The number of instances collected so far."""
+        return len(self.series)
+
+    @property
+    def sop_instance_uids(self) -> list[str]:
+        """The SOP Instance UIDs of the instances collected so far."""
+        return [str(dataset.SOPInstanceUID) for dataset in self.series]
+
+
+class CompactSeriesCollector:
+    """A memory saving variant of the `SeriesCollector` which does not keep the datasets.
+    Only the header fields needed for the series information and the SOP Instance UIDs of the collected instances are
+    recorded, so no pixel data is held in memory until the series is dispatched.
+    """
+
+    __slots__ = ('series_instance_uid', 'header', 'geometry', 'last_update_time', 'dispatch_started')
+
+    def __init__(self, first_dataset: Dataset) -> None:
+        """Initialization of the Compact Series Collector with the first dataset (instance).
+
+        Args:
+            first_dataset (Dataset): The first dataset or the regarding series received from the modality.
+        """
+        self.series_instance_uid = first_dataset.SeriesInstanceUID
+        self.header = SeriesHeader.from_dataset(first_dataset)
+        self.geometry = SeriesGeometry()
+        self.geometry.add(first_dataset)
+        self.last_update_time = time.time()
+        self.dispatch_started = False
+
+    def add_instance(self, dataset: Dataset) -> bool:
+        """Record a dataset in the series collected by this Series Collector if it has the correct Series UID.
+
+        Args:
+            dataset (Dataset): The dataset to add.
+
+        Returns:
+            bool: `True`, if the Series UID of the dataset to add matched and the dataset was therefore added, `False` otherwise.
+        """
+        if self.series_instance_uid == dataset.SeriesInstanceUID:
+            self.geometry.add(dataset)
+            self.last_update_time = time.time()
+            return True
+
+        return False
+
+    @property
+    def sop_instance_uids(self) -> list[str]:
+        """The SOP Instance UIDs of the instances collected so far, kept once by the geometry of the series."""
+        return self.geometry.sop_instance_uids
+
+    @property
+    def instance_count(self) -> int:
+        """The number of instances collected so far."""
+        return len(self.geometry.sop_instance_uids)
+
 
 class SeriesDispatcher:
     """This code provides a template for receiving data from a modality using DICOM.
@@ -47,43 +147,256 @@ class SeriesDispatcher:
     You can use the given template, but you don't have to!
     """
 
-    def __init__(self) -> None:
-        """Initialize the Series Dispatcher.
+    def __init__(self, compact: bool = False, store_dir: str | None = None,
+                 server_url: str = 'http://localhost:8000', batch_window: float = 0.0, max_batch_size: int = 100,
+                 max_retries: int = 3, retry_backoff: float = 0.5, connection_limit: int = 10,
+                 num_shards: int = 4, scp_options: dict | None = None,
+                 completion_tracker: CompletionTracker | None = None, spool_path: str | None = None,
+                 extractors: ExtractorPipeline | None = None, metrics_port: int | None = None,
+                 metrics_address: str = '127.0.0.1', scp_workers: int = 0, send_instance_uids: bool = True,
+                 content_type: str = payload.JSON, compress_min_bytes: int | None = 64 * 1024) -> None:
+        """Initialize the Series Dispatcher. Nothing is started yet: the SCP starts listening (and the metrics are
+        served) with `start()`, which `main()` calls.
+
+        Args:
+            compact (bool): Collect only the header fields and SOP Instance UIDs (`CompactSeriesCollector`) instead of
+                the full datasets. The SCP then parses the received datasets without pixel data.
+            store_dir (str | None): Optional directory the SCP writes each received instance to as DICOM file.
+            server_url (str): Base URL of the server storing the series information.
+            batch_window (float): If greater than 0, series dispatched within this many seconds are coalesced and
+                sent in one request to the batch endpoint of the server.
+            max_batch_size (int): Maximum number of series sent in one batch request.
+            max_retries (int): Number of retries of a failed request before the series information is dropped.
+            retry_backoff (float): Delay in seconds before the first retry, doubled for every further retry.
+            connection_limit (int): Maximum number of simultaneous connections to the server.
+            num_shards (int): Number of tasks the collection is distributed to. All instances of a series are
+                collected by the same task, so a large series only delays series of its own shard.
+            scp_options (dict | None): Further keyword arguments of the `ModalityStoreSCP`, e.g. the address, the
+                supported SOP classes and transfer syntaxes or the maximum number of associations.
+            completion_tracker (CompletionTracker | None): Decides when a series is complete, a tracker with the
+                default (adaptive) wait times if `None`.
+            spool_path (str | None): Optional path of an `InstanceSpool` journaling the received instances until their
+                series is stored by the server. Series which were not stored are replayed when `main()` starts.
+            extractors (ExtractorPipeline | None): Optional pipeline computing a summary of each complete series from
+                its instance files in a process pool, sent to the server with the series. Requires `store_dir`.
+            metrics_port (int | None): Optional port the metrics are served on (`/metrics`) while the dispatcher is
+                started.
+            metrics_address (str): The address the metrics are served on, only the loopback interface by default
+                like the SCP; empty for all interfaces.
+            scp_workers (int): If greater than 0, the SCP runs in this many worker processes sharing its port
+                (`ScpWorkerPool`), which route the received datasets directly to the collector shards. The SCP
+                metrics are then kept per worker process. Requires `compact`, so no pixel data is passed between
+                the processes.
+            send_instance_uids (bool): Send the SOP Instance UIDs of each series (encoded with
+                `uid_codec.encode_uids`), so the server stores the instances of the series.
+            content_type (str): The format of the request bodies, `payload.JSON` or the more compact and faster to
+                decode `payload.MSGPACK`.
+            compress_min_bytes (int | None): msgpack bodies of at least this size (large batches) are sent gzip
+                compressed, none if `None`.
         """
+        if content_type not in payload.CONTENT_TYPES:
+            raise ValueError(f"Unsupported content type: {content_type}")
+        if extractors is not None and store_dir is None:
+            raise ValueError("The extractor pipeline reads the instance files, a store_dir is required")
+        if scp_workers > 0 and not compact:
+            raise ValueError("SCP workers pass every dataset to the client process, compact=True is required")
 
         self.loop: asyncio.AbstractEventLoop
-        self.modality_scp = ModalityStoreSCP()
+        self.compact = compact
+        self.collector_class = CompactSeriesCollector if compact else SeriesCollector
+        self.spool = InstanceSpool(spool_path) if spool_path is not None else None
+        self.scp_workers = scp_workers
+        self.send_instance_uids = send_instance_uids
+        self.content_type = content_type
+        self.compress_min_bytes = compress_min_bytes
+        if scp_workers > 0:
+            self.modality_scp = ScpWorkerPool(scp_workers, num_shards,
+                                              dict(keep_pixel_data=not compact, store_dir=store_dir,
+                                                   **(scp_options or {})), spool_path)
+        else:
+            self.modality_scp = ModalityStoreSCP(keep_pixel_data=not compact, store_dir=store_dir, spool=self.spool,
+                                                 **(scp_options or {}))
         # Dictionary to track series collectors by their SeriesInstanceUID to handle multiple series
         self.series_collectors = {}
+        # Maximum interval in seconds in which the collected series are checked for dispatch
+        self.dispatch_interval = 0.2
+        self.num_shards = num_shards
+        self.completion = completion_tracker if completion_tracker is not None else CompletionTracker()
+        self.extractors = extractors
+        self.metrics_port = metrics_port
+        self.metrics_address = metrics_address
+        self.metrics_server = None
+
+        self.server_url = server_url
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.connection_limit = connection_limit
+        # The HTTP session is created on first use and kept open, so the connections to the server are reused
+        self.session: aiohttp.ClientSession | None = None
+        # Pending series information with the SOP Instance UIDs removed from the spool once the batch is stored
+        self._batch: list[tuple[dict, list[str] | None]] = []
+        self._batch_task: asyncio.Task | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        """Start serving the metrics, open the spool and start the SCP (or its worker processes), so the modality can
+        connect. Does nothing if the dispatcher is already started.
+        """
+        if self.metrics_port is not None and self.metrics_server is None:
+            self.metrics_server = metrics.start_http_server(self.metrics_port, self.metrics_address)
+        if self.spool is not None:
+            # Opened here as well when the SCP workers append to it, the dispatcher replays and compacts it
+            self.spool.open()
+        self.modality_scp.start()
+
+    async def stop(self) -> None:
+        """Stop the SCP, so no further instances are accepted, then close the dispatcher (see `close()`).
+        """
+        self.modality_scp.stop()
+        await self.close()
 
     async def main(self) -> None:
         """An infinitely running method used as hook for the asyncio event loop.
-        Keeps the event loop alive whether or not datasets are received from the modality and prints a message
-        regulary when no datasets are received.
+        Starts the dispatcher, waits for datasets received from the modality and collects them as soon as they arrive.
+        The check whether collected series are ready for dispatch runs in a separate, timer driven task. The
+        dispatcher is stopped when the task is cancelled.
+        """
+        self.loop = asyncio.get_running_loop()
+        self.start()
+        await self.replay_spool()
+        shards = [asyncio.Queue() for _ in range(self.num_shards)]
+        tasks = [asyncio.create_task(self.run_shard(shard)) for shard in shards]
+        tasks.append(asyncio.create_task(self.run_dispatch_timer()))
+
+        try:
+            if self.scp_workers > 0:
+                # The worker processes route the datasets to the shards themselves
+                self.modality_scp.attach_shards(self.loop, shards)
+                await asyncio.gather(*tasks)
+
+            self.modality_scp.attach_loop(self.loop)
+            while True:
+                # Sleep until the SCP hands over a dataset, then drain everything which is already available so a
+                # burst of instances is distributed in a single wakeup.
+                self.route(shards, *await self.modality_scp.get())
+
+                while not self.modality_scp.queue.empty():
+                    self.route(shards, *self.modality_scp.get_nowait())
+        finally:
+            for task in tasks:
+                task.cancel()
+            await self.stop()
+
+    async def replay_spool(self) -> None:
+        """Collects the spooled instances of the series which were not stored by the server before the last shutdown.
+        """
+        if self.spool is None:
+            return
+
+        replayed = 0
+        for dataset, calling_ae in self.spool.replay():
+            await self.run_series_collectors(dataset, (calling_ae, None))
+            replayed += 1
+        if replayed:
+            logger.info("Replayed %d spooled instances", replayed)
+
+    def route(self, shards: list[asyncio.Queue], dataset: Dataset | None, source: tuple[str, int]) -> None:
+        """Hands a dataset received from the SCP over to the shard collecting its series. The release of an
+        association is passed to all shards, behind the datasets of the association.
+
+        Args:
+            shards (list[Queue]): The queues of the shards.
+            dataset (Dataset | None): The received dataset or `None` if the association was released.
+            source (tuple[str, int]): The calling AE title and the association identifier.
+        """
+        if dataset is None:
+            for shard in shards:
+                shard.put_nowait((None, source))
+        else:
+            shards[self.shard_index(dataset.SeriesInstanceUID)].put_nowait((dataset, source))
+
+    def shard_index(self, series_instance_uid: str) -> int:
+        """Returns the index of the shard collecting the given series. The index is stable across processes.
+
+        Args:
+            series_instance_uid (str): The Series Instance UID.
+
+        Returns:
+            int: The shard index.
+        """
+        return shard_index(series_instance_uid, self.num_shards)
+
+    async def run_shard(self, shard: asyncio.Queue) -> None:
+        """Collects the datasets of one shard in the order they were received.
+
+        Args:
+            shard (Queue): The queue of the datasets of this shard.
         """
         while True:
-            # TODO: Regulary check if new datasets are received and act if they are.
-            # Information about Python asyncio: https://docs.python.org/3/library/asyncio.html
-            # When datasets are received you should collect and process them
-            # (e.g. using `asyncio.create_task(self.run_series_collector()`)
-
-            # Check if there are new datasets
-            if not self.modality_scp.queue.empty():
-                dataset = self.modality_scp.queue.get()
-                await self.run_series_collectors(dataset)
+            dataset, source = await shard.get()
+            if dataset is None:
+                # Arrivals are recorded by the association identifier alone, see `run_series_collectors`
+                self.completion.association_released(source[1])
             else:
-                print("Waiting for Modality")
+                await self.run_series_collectors(dataset, source)
+
+    async def run_dispatch_timer(self) -> None:
+        """Checks whether collected series are ready to be dispatched, whenever the earliest completion deadline has
+        passed and at least every `dispatch_interval` seconds. The dispatch runs in its own task, so a slow server
+        does not delay the next check.
+        """
+        while True:
+            delay = self.dispatch_interval
+            next_deadline = self.completion.next_deadline()
+            if next_deadline is not None:
+                delay = min(delay, max(0.0, next_deadline - time.time()))
+            await asyncio.sleep(delay)
+            self._spawn(self.dispatch_series_collector())
 
-            # Periodically check for dispatching the series
-            await self.dispatch_series_collector()
+    def _spawn(self, coro) -> asyncio.Task:
+        """Run a coroutine as task which is awaited when the dispatcher is closed.
 
-            await asyncio.sleep(0.2)
+        Args:
+            coro (Coroutine): The coroutine to run.
 
-    async def run_series_collectors(self, dataset) -> None:
+        Returns:
+            Task: The created task.
+        """
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def close(self) -> None:
+        """Send the pending batch, wait for running dispatches and close the HTTP session.
+        """
+        if self._batch_task is not None:
+            self._batch_task.cancel()
+            self._batch_task = None
+        if self._batch:
+            await self.flush_batch()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        if self.spool is not None:
+            self.spool.close()
+        if self.extractors is not None:
+            self.extractors.close()
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
+            self.metrics_server.server_close()
+            self.metrics_server = None
+
+    async def run_series_collectors(self, dataset, source: tuple[str, int] | None = None) -> None:
         """Processes the incoming DICOM dataset and adds it to the corresponding series.
 
         Args:
             dataset (Dataset): The incoming DICOM dataset.
+            source (tuple[str, int] | None): The calling AE title and the association identifier, if known.
         """
         # TODO: Get the data from the SCP and start dispatching
         series_uid = dataset.SeriesInstanceUID
@@ -91,98 +404,199 @@ class SeriesDispatcher:
         # Check if we already have a SeriesCollector for this series UID
         if series_uid not in self.series_collectors:
             # Create a new SeriesCollector if it doesn't exist or if it's a new series
-            print(
-                f"New series started instance {dataset.SOPInstanceUID}: {series_uid}")
-            self.series_collectors[series_uid] = SeriesCollector(dataset)
+            logger.info("New series started instance %s: %s", dataset.SOPInstanceUID, series_uid)
+            self.series_collectors[series_uid] = self.collector_class(dataset)
         else:
             # Add the dataset to the existing collector
             added = self.series_collectors[series_uid].add_instance(dataset)
             if added:
-                print(
-                    f"Added instance {dataset.SOPInstanceUID} to series: {series_uid}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Added instance %s to series: %s", dataset.SOPInstanceUID, series_uid)
             else:
-                print(
-                    f"Series UID mismatch for dataset, discarding dataset: {series_uid}")
+                logger.warning("Series UID mismatch for dataset, discarding dataset: %s", series_uid)
+                return
+
+        calling_ae, association = source if source is not None else ('', None)
+        self.completion.record_arrival(series_uid, calling_ae, association)
 
-    async def dispatch_series_collector(self) -> None:
+    async def dispatch_series_collector(self, now: float | None = None) -> None:
         """Tries to dispatch a Series Collector, i.e. to finish it's dataset collection and scheduling of further
         methods to extract the desired information.
-        """
-        # Check if the series collector hasn't had an update for a long enough timespan and send the series to the
-        # server if it is complete
-        # NOTE: This is the last given function, you should create more for extracting the information and
-        # sending the data to the server
-
-        maximum_wait_time = 1
-        current_time = time.time()
-        series_to_dispatch = []
 
-        # Iterate over all series collectors to check which series are ready for dispatch
-        for series_uid, collector in list(self.series_collectors.items()):
-            time_since_last_update = current_time - collector.last_update_time
-            if time_since_last_update > maximum_wait_time and not collector.dispatch_started:
+        Args:
+            now (float | None): The time to check the completion deadlines against, the current time if `None`.
+        """
+        # The completion tracker returns the series whose adaptive deadline after the last instance has passed
+        collectors = []
+        for series_uid in self.completion.pop_due(now):
+            collector = self.series_collectors.pop(series_uid, None)
+            if collector is not None:
                 # Mark the dispatch as started to avoid duplicate processing
                 collector.dispatch_started = True
-                print(f"Dispatching series: {collector.series_instance_uid}")
-                series_to_dispatch.append(series_uid)
+                logger.info("Dispatching series: %s", collector.series_instance_uid)
+                SERIES_DISPATCHED.inc()
+                INSTANCES_PER_SERIES.observe(collector.instance_count)
+                DISPATCH_DELAY_SECONDS.observe(time.time() - collector.last_update_time)
+                collectors.append(collector)
 
-        # Dispatch all series that are ready for dispatch and remove them from the collector
-        for series_uid in series_to_dispatch:
-            await self.extract_and_send_series_info(self.series_collectors[series_uid])
-            del self.series_collectors[series_uid]
+        # Dispatch all complete series concurrently
+        await asyncio.gather(*(self.extract_and_send_series_info(collector) for collector in collectors))
 
-    async def extract_and_send_series_info(self, collector: SeriesCollector) -> None:
-        """Extracts the series metadata and sends it to the server.
+    async def extract_and_send_series_info(self, collector: SeriesCollector | CompactSeriesCollector) -> None:
+        """Extracts the series metadata and sends it to the server. The consistency checks of the series geometry
+        are sent as `Summary`, together with the results of the extractor pipeline if one is configured.
 
         Args:
-            collector (SeriesCollector): The SeriesCollector object containing the series' DICOM datasets.
+            collector (SeriesCollector | CompactSeriesCollector): The collector of the series.
         """
 
         # Extract metadata from the first dataset
-        first_dataset = collector.series[0]
-        patient_id = str(first_dataset.PatientID)
-        patient_name = str(first_dataset.PatientName)
-        study_instance_uid = str(first_dataset.StudyInstanceUID)
-        series_instance_uid = str(collector.series_instance_uid)
-        num_instances = len(collector.series)
+        header = collector.header
 
         # Prepare the data to send to the server
         data = {
-            'PatientID': patient_id,
-            'PatientName': patient_name,
-            'StudyInstanceUID': study_instance_uid,
-            'SeriesInstanceUID': series_instance_uid,
-            'InstanceInSeries': num_instances
+            'PatientID': header.PatientID,
+            'PatientName': header.PatientName,
+            'StudyInstanceUID': header.StudyInstanceUID,
+            'SeriesInstanceUID': str(collector.series_instance_uid),
+            'InstanceInSeries': collector.instance_count
         }
+        if self.send_instance_uids:
+            data['EncodedSOPInstanceUIDs'] = encode_uids(collector.sop_instance_uids)
+
+        summary = collector.geometry.analyze()
+        if self.extractors is not None:
+            # The extractors run in worker processes on the files written by the SCP, the loop only awaits them
+            try:
+                paths = [self.modality_scp.instance_path(uid) for uid in collector.sop_instance_uids]
+                summary.update(await self.extractors.run(paths))
+            except Exception:
+                # E.g. a missing instance file or undecodable pixel data, the series is sent without their results
+                logger.exception("Extractors failed for series %s", collector.series_instance_uid)
+        data['Summary'] = summary
 
         # Send data to the server to store them into database
-        await self.send_data_to_server(data)
+        await self.send_data_to_server(data, collector.sop_instance_uids)
 
-    async def send_data_to_server(self, data: dict) -> None:
-        """Sends the extracted series metadata to the server for storage.
+    async def send_data_to_server(self, data: dict, sop_instance_uids: list[str] | None = None) -> None:
+        """Sends the extracted series metadata to the server for storage. In batch mode the series information is
+        added to the pending batch instead, which is sent after `batch_window` seconds or once it is full.
 
         Args:
             data (dict): The series metadata to send.
+            sop_instance_uids (list[str] | None): The SOP Instance UIDs of the collected instances the metadata was
+                extracted from, removed from the spool once the server stored the series.
+        """
+        if self.batch_window > 0:
+            self._batch.append((data, sop_instance_uids))
+            if len(self._batch) >= self.max_batch_size:
+                if self._batch_task is not None:
+                    self._batch_task.cancel()
+                    self._batch_task = None
+                await self.flush_batch()
+            elif self._batch_task is None:
+                self._batch_task = self._spawn(self._flush_batch_later())
+            return
+
+        response_data = await self.post(f"{self.server_url}/series", data)
+        if response_data is not None:
+            logger.debug("Server message: %s", response_data.get('message'))
+            await self.acknowledge([data['SeriesInstanceUID']], sop_instance_uids or [])
+
+    async def _flush_batch_later(self) -> None:
+        """Sends the pending batch once the batch window has passed.
+        """
+        await asyncio.sleep(self.batch_window)
+        self._batch_task = None
+        await self.flush_batch()
+
+    async def flush_batch(self) -> None:
+        """Sends all pending series information in one request to the batch endpoint of the server.
+        """
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+
+        response_data = await self.post(f"{self.server_url}/series/batch", [data for data, _ in batch])
+        if response_data is not None:
+            logger.debug("Server message: %s", response_data.get('message'))
+            await self.acknowledge([data['SeriesInstanceUID'] for data, _ in batch],
+                                   [uid for _, uids in batch for uid in uids or ()])
+
+    async def acknowledge(self, series_instance_uids: list[str], sop_instance_uids: list[str]) -> None:
+        """Removes the instances sent with series stored by the server from the spool. Instances of these series
+        received while they were sent stay spooled until the reopened series is sent.
+
+        Args:
+            series_instance_uids (list[str]): The Series Instance UIDs of the stored series.
+            sop_instance_uids (list[str]): The SOP Instance UIDs of the instances sent with them.
+        """
+        if self.spool is not None:
+            await asyncio.wrap_future(self.spool.acknowledge(sop_instance_uids))
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Returns the HTTP session of the dispatcher and creates it on first use.
+
+        Returns:
+            ClientSession: The long-lived session with a pool of keep-alive connections to the server.
         """
-        url = 'http://localhost:8000/series'  # server URL
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.connection_limit, keepalive_timeout=60)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=30))
+        return self.session
+
+    async def post(self, url: str, data: dict | list) -> dict | None:
+        """Posts data to the server as JSON or msgpack (`content_type`). Connection errors and server errors (5xx) are
+        retried with exponential backoff, client errors (4xx) are not retried.
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=data) as response:
-                if response.status == 200:
-                    # Parse the JSON response from the server
-                    response_data = await response.json()
-                    print(
-                        f"Successfully sent data to the server: {response.status}")
-                    print(f"Server message: {response_data.get('message')}")
-                else:
-                    print(
-                        f"Failed to send data to the server: {response.status}")
-                    print(f"Response text: {await response.text()}")
+        Args:
+            url (str): The URL to post to.
+            data (dict | list): The data to send.
+
+        Returns:
+            dict | None: The parsed JSON response or `None` if the request failed.
+        """
+        session = await self.get_session()
+        if self.content_type == payload.JSON:
+            request = {'json': data}
+        else:
+            # Encoded once for all attempts
+            body, headers = payload.encode(data, self.content_type, self.compress_min_bytes)
+            request = {'data': body, 'headers': headers}
+
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                async with session.post(url, **request) as response:
+                    if response.status == 200:
+                        # Parse the JSON response from the server
+                        response_data = await response.json()
+                        POST_SECONDS.observe(time.perf_counter() - start)
+                        logger.debug("Successfully sent data to the server: %d", response.status)
+                        return response_data
+
+                    POST_FAILURES.inc()
+                    logger.warning("Failed to send data to the server: %d %s", response.status,
+                                   await response.text())
+                    if response.status < 500:
+                        return None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                POST_FAILURES.inc()
+                logger.warning("Failed to send data to the server: %r", e)
+
+            if attempt < self.max_retries:
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+
+        logger.error("Giving up sending data to the server after %d attempts", self.max_retries + 1)
+        return None
 
 
 if __name__ == "__main__":
     """Create a Series Dispatcher object and run it's infinite `main()` method in a event loop.
     """
-    engine = SeriesDispatcher()
-    engine.loop = asyncio.get_event_loop()
-    engine.loop.run_until_complete(engine.main())
+    logging.basicConfig(level=os.environ.get('DICOM_LOG_LEVEL', 'INFO'),
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    engine = SeriesDispatcher(metrics_port=int(os.environ.get('DICOM_METRICS_PORT', '9100')),
+                              metrics_address=os.environ.get('DICOM_METRICS_ADDRESS', '127.0.0.1'),
+                              content_type=os.environ.get('DICOM_CONTENT_TYPE', payload.JSON))
+    asyncio.run(engine.main())
@@ -0,0 +1,188 @@
+import heapq
+import time
+from collections import OrderedDict
+from metrics import Counter
+
+SERIES_REOPENED = Counter('dicom_dispatcher_series_reopened_total',
+                          "Series which received instances after they were dispatched.")
+
+
+class SeriesTiming:
+    """Arrival statistics of one series which is still being collected."""
+
+    __slots__ = ('last_arrival', 'mean_interval', 'calling_ae', 'associations', 'version')
+
+    def __init__(self, calling_ae: str, now: float) -> None:
+        self.last_arrival = now
+        self.mean_interval: float | None = None
+        self.calling_ae = calling_ae
+        # Number of instances of the series received per association
+        self.associations: dict[object, int] = {}
+        self.version = 0
+
+
+class CompletionTracker:
+    """Decides when a series is complete, i.e. when no further instances are expected.
+
+    There is no attribute telling how many instances a series has, so a series is considered complete once no new
+    instance arrived for a while. Instead of a fixed timeout, the wait time adapts to the sender: it is a multiple of
+    the smoothed inter-arrival time of the series, or of the calling AE title for series with a single instance so
+    far, clamped to `[min_wait, max_wait]`. The release of an association which transferred several instances of a
+    series is taken as strong signal that the series is complete and shortens the wait to `release_grace`.
+
+    Pending deadlines are kept in a heap, so finding the complete series is O(log n) per series instead of a scan of
+    all open series. Outdated heap entries are skipped lazily by their version.
+    """
+
+    def __init__(self, default_wait: float = 1.0, min_wait: float = 0.2, max_wait: float = 10.0,
+                 interval_factor: float = 5.0, release_grace: float = 0.1, smoothing: float = 0.2,
+                 dispatched_history: int = 10000) -> None:
+        """Initialize the tracker.
+
+        Args:
+            default_wait (float): Wait time in seconds if nothing is known about the sender yet.
+            min_wait (float): Lower bound of the adaptive wait time in seconds.
+            max_wait (float): Upper bound of the adaptive wait time in seconds.
+            interval_factor (float): The wait time is this multiple of the mean inter-arrival time.
+            release_grace (float): Wait time in seconds after the association of a series has been released.
+            smoothing (float): Weight of the latest inter-arrival time in the exponential moving average.
+            dispatched_history (int): Number of dispatched series remembered to detect reopened series.
+        """
+        self.default_wait = default_wait
+        self.min_wait = min_wait
+        self.max_wait = max_wait
+        self.interval_factor = interval_factor
+        self.release_grace = release_grace
+        self.smoothing = smoothing
+        self.dispatched_history = dispatched_history
+
+        self._series: dict[str, SeriesTiming] = {}
+        self._heap: list[tuple[float, str, int]] = []
+        self._ae_intervals: dict[str, float] = {}
+        self._association_series: dict[object, set[str]] = {}
+        self._dispatched: OrderedDict[str, float] = OrderedDict()
+        # Number of dispatched series and of series which received instances after their dispatch
+        self.dispatched = 0
+        self.reopened = 0
+
+    def _smooth(self, mean: float | None, value: float) -> float:
+        return value if mean is None else (1 - self.smoothing) * mean + self.smoothing * value
+
+    def wait_time(self, series_instance_uid: str) -> float:
+        """Return the current wait time of a series after its last instance.
+
+        Args:
+            series_instance_uid (str): The Series Instance UID.
+
+        Returns:
+            float: The wait time in seconds.
+        """
+        timing = self._series[series_instance_uid]
+        interval = timing.mean_interval
+        if interval is None:
+            interval = self._ae_intervals.get(timing.calling_ae)
+        if interval is None:
+            return self.default_wait
+        return min(self.max_wait, max(self.min_wait, self.interval_factor * interval))
+
+    def _schedule(self, series_instance_uid: str, deadline: float) -> None:
+        timing = self._series[series_instance_uid]
+        timing.version += 1
+        heapq.heappush(self._heap, (deadline, series_instance_uid, timing.version))
+
+    def record_arrival(self, series_instance_uid: str, calling_ae: str = '', association: object = None,
+                       now: float | None = None) -> float:
+        """Record the arrival of an instance and reschedule the completion of its series.
+
+        Args:
+            series_instance_uid (str): The Series Instance UID of the instance.
+            calling_ae (str): The AE title of the sender.
+            association (object): An identifier of the association the instance was received with.
+            now (float | None): The arrival time, the current time if `None`.
+
+        Returns:
+            float: The new completion deadline of the series.
+        """
+        now = time.time() if now is None else now
+        timing = self._series.get(series_instance_uid)
+        if timing is None:
+            timing = SeriesTiming(calling_ae, now)
+            self._series[series_instance_uid] = timing
+            if self._dispatched.pop(series_instance_uid, None) is not None:
+                self.reopened += 1
+                SERIES_REOPENED.inc()
+        else:
+            interval = now - timing.last_arrival
+            timing.mean_interval = self._smooth(timing.mean_interval, interval)
+            self._ae_intervals[calling_ae] = self._smooth(self._ae_intervals.get(calling_ae), interval)
+            timing.last_arrival = now
+
+        if association is not None:
+            timing.associations[association] = timing.associations.get(association, 0) + 1
+            self._association_series.setdefault(association, set()).add(series_instance_uid)
+
+        deadline = now + self.wait_time(series_instance_uid)
+        self._schedule(series_instance_uid, deadline)
+        return deadline
+
+    def association_released(self, association: object, now: float | None = None) -> None:
+        """Shorten the wait of the series transferred with a released association. Series with only one instance
+        in the association are left alone, as some modalities open an association per instance.
+
+        Args:
+            association (object): The identifier of the released association.
+            now (float | None): The release time, the current time if `None`.
+        """
+        now = time.time() if now is None else now
+        for series_instance_uid in self._association_series.pop(association, ()):
+            timing = self._series.get(series_instance_uid)
+            if timing is not None and timing.associations.pop(association, 0) > 1:
+                self._schedule(series_instance_uid, min(now + self.release_grace,
+                                                        timing.last_arrival + self.wait_time(series_instance_uid)))
+
+    def next_deadline(self) -> float | None:
+        """Return the earliest pending deadline, which may be outdated, or `None` if no series is open."""
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float | None = None) -> list[str]:
+        """Remove and return the series whose deadline has passed. They are remembered as dispatched.
+
+        Args:
+            now (float | None): The current time, the current time if `None`.
+
+        Returns:
+            list[str]: The Series Instance UIDs of the complete series.
+        """
+        now = time.time() if now is None else now
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, series_instance_uid, version = heapq.heappop(self._heap)
+            timing = self._series.get(series_instance_uid)
+            if timing is None or timing.version != version:
+                continue
+            self.discard(series_instance_uid)
+            self._dispatched[series_instance_uid] = now
+            if len(self._dispatched) > self.dispatched_history:
+                self._dispatched.popitem(last=False)
+            self.dispatched += 1
+            due.append(series_instance_uid)
+        return due
+
+    def discard(self, series_instance_uid: str) -> None:
+        """Stop tracking a series. Its remaining heap entries are skipped.
+
+        Args:
+            series_instance_uid (str): The Series Instance UID.
+        """
+        timing = self._series.pop(series_instance_uid, None)
+        if timing is not None:
+            for association in timing.associations:
+                series = self._association_series.get(association)
+                if series is not None:
+                    series.discard(series_instance_uid)
+                    if not series:
+                        del self._association_series[association]
+
+    def stats(self) -> dict:
+        """Return the number of open, dispatched and reopened series."""
+        return {'open': len(self._series), 'dispatched': self.dispatched, 'reopened': self.reopened}
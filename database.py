@@ -0,0 +1,340 @@
+import asyncio
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Hashable, Iterable
+
+logger = logging.getLogger(__name__)
+
+# A SQL statement executed for each row, or a function writing the rows with the given connection and returning its
+# result, e.g. the number of changed rows
+Statement = str | Callable[[sqlite3.Connection, list[tuple]], Any]
+
+# Values of the `synchronous` pragma
+SYNCHRONOUS_SETTINGS = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+
+class ConnectionPool():
+    """A small pool of SQLite connections used by the server.
+
+    Queries are run in a thread pool, so the blocking `sqlite3` calls never run on the event loop. Every worker thread
+    of the pool lazily opens its own connection, which is configured for concurrent access (WAL journal, relaxed
+    `synchronous` and a busy timeout instead of failing immediately on a locked database).
+    """
+
+    def __init__(self, path: str, size: int = 4, busy_timeout: int = 5000, synchronous: str = 'NORMAL') -> None:
+        """Initialize the pool. No connection is opened until the first query is run.
+
+        Args:
+            path (str): Path of the SQLite database file.
+            size (int): Number of worker threads and therefore connections.
+            busy_timeout (int): Time in milliseconds a connection waits for a lock held by another connection.
+            synchronous (str): Value of the `synchronous` pragma. `NORMAL` is durable in WAL mode except for power
+                loss, use `FULL` to sync every commit.
+
+        Raises:
+            ValueError: If `synchronous` is not a valid setting.
+        """
+        if synchronous.upper() not in SYNCHRONOUS_SETTINGS:
+            raise ValueError(f"Invalid synchronous setting: {synchronous}")
+        self.path = path
+        self.size = size
+        self.busy_timeout = busy_timeout
+        self.synchronous = synchronous
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix='sqlite')
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def connect(self) -> sqlite3.Connection:
+        """Open a new, configured connection to the database.
+
+        Returns:
+            Connection: The connection.
+        """
+        # Each connection is only used by one worker thread, but closed by the thread closing the pool
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout / 1000, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout)}')
+        return conn
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return the connection of the current worker thread and open it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self.connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _call(self, func: Callable[..., Any], args: tuple) -> Any:
+        """Call `func` with the connection of the current worker thread, rolling back on errors."""
+        conn = self._connection()
+        try:
+            return func(conn, *args)
+        except BaseException:
+            conn.rollback()
+            raise
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run `func(connection, *args)` in the thread pool and wait for its result.
+
+        Args:
+            func (Callable): The function executing the queries. It is responsible for committing.
+            *args: Further arguments passed to `func`.
+
+        Returns:
+            Any: The return value of `func`.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call, func, args)
+
+    def close(self) -> None:
+        """Wait for running queries and close all connections of the pool. The pool can be used again afterwards, e.g.
+        by a restarted app, and opens new connections on demand.
+        """
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        # The worker threads of the new executor, and their connections, are only created with the next query
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix='sqlite')
+
+
+class GroupCommitWriter():
+    """Write-behind writer which commits the rows of many requests in one transaction (group commit).
+
+    Rows submitted by concurrent requests are collected by a dedicated writer thread and flushed every
+    `flush_interval` seconds or as soon as `max_records` rows are pending. The future returned by `submit` is only
+    resolved once the transaction containing the rows has been committed, so a request answered successfully is never
+    lost. Commits are as durable as those of the pool (its `synchronous` setting): with `FULL` every commit is synced
+    and the writer shares the cost of one sync between all rows of a flush, which is where it gains most over a
+    commit per request; with `NORMAL` (WAL) commits are not synced and only the per-transaction overhead is shared.
+    """
+
+    def __init__(self, pool: ConnectionPool, statement: Statement, flush_interval: float = 0.01,
+                 max_records: int = 500) -> None:
+        """Initialize the writer. The writer thread is started with the first submission.
+
+        Args:
+            pool (ConnectionPool): The pool whose database is written to.
+            statement (Statement): The statement executed for every row, unless a submission uses another one. May
+                also be a function `statement(connection, rows)` writing all rows of a submission without committing
+                and returning its result, e.g. the number of changed rows.
+            flush_interval (float): Maximum time in seconds a row waits for further rows before it is committed.
+            max_records (int): Number of pending rows which triggers a flush immediately.
+        """
+        self.pool = pool
+        self.statement = statement
+        self.flush_interval = flush_interval
+        self.max_records = max_records
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def submit(self, rows: list[tuple], statement: Statement | None = None) -> Future:
+        """Queue rows to be written in the next flush.
+
+        Args:
+            rows (list[tuple]): The parameters of the statement for each row.
+            statement (Statement | None): The statement executed for the rows, `statement` of the writer if `None`.
+
+        Returns:
+            Future: Resolves to the number of changed rows (the result of a function statement) once they are
+            committed, or to the exception raised by the rows (which are then rolled back alone) or by the failed
+            commit. Use `asyncio.wrap_future` to await it.
+        """
+        future: Future = Future()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+                self._thread.start()
+        self._queue.put((rows, statement or self.statement, future))
+        return future
+
+    def _run(self) -> None:
+        """Writer thread: collects submissions and commits them in groups until `None` is received."""
+        conn = self.pool.connect()
+        stopped = False
+
+        while not stopped:
+            item = self._queue.get()
+            if item is None:
+                break
+            group = [item]
+            pending = len(item[0])
+            deadline = time.monotonic() + self.flush_interval
+
+            while pending < self.max_records:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopped = True
+                    break
+                group.append(item)
+                pending += len(item[0])
+
+            try:
+                self._flush(conn, group)
+            except Exception as e:
+                # The writer thread must survive, otherwise all later submissions would wait forever
+                logger.exception("Group commit of %d submissions failed", len(group))
+                for _, _, future in group:
+                    if not future.done():
+                        future.set_exception(e)
+
+        conn.close()
+
+    @staticmethod
+    def _write(conn: sqlite3.Connection, rows: list[tuple], statement: Statement) -> Any:
+        """Write the rows of one submission and return its result."""
+        if callable(statement):
+            return statement(conn, rows)
+        count = 0
+        for row in rows:
+            count += conn.execute(statement, row).rowcount
+        return count
+
+    def _flush(self, conn: sqlite3.Connection, group: list[tuple[list[tuple], Statement, Future]]) -> None:
+        """Write all rows of the group in one transaction and resolve their futures.
+
+        Each submission is written within a savepoint, so a failing submission is rolled back alone and only its
+        future receives the error, while the other submissions of the group are committed. Submissions whose future
+        was cancelled (e.g. by `asyncio.wrap_future` when the awaiting task is cancelled) are skipped, the others can
+        no longer be cancelled.
+        """
+        group = [item for item in group if item[2].set_running_or_notify_cancel()]
+        if not group:
+            return
+        results: list[tuple[Future, Any, Exception | None]] = []
+        try:
+            # Opened explicitly, a savepoint outside of a transaction would be committed when it is released
+            conn.execute('BEGIN')
+            for rows, statement, future in group:
+                conn.execute('SAVEPOINT submission')
+                try:
+                    result = self._write(conn, rows, statement)
+                except Exception as e:
+                    conn.execute('ROLLBACK TO submission')
+                    results.append((future, None, e))
+                else:
+                    results.append((future, result, None))
+                conn.execute('RELEASE submission')
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            for _, _, future in group:
+                future.set_exception(e)
+            return
+
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def close(self) -> None:
+        """Flush all pending rows and stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+
+class ReadCache():
+    """In-process LRU cache of query results with a time to live, invalidated precisely by tags.
+
+    Each entry is stored with the tags of the data it was built from (e.g. the UID of a series and the patient of a
+    listing), and writes invalidate the entries of the tags they changed. The time to live bounds the staleness after
+    writes this process does not see, e.g. of another server process on the same database. The cache is used from the
+    event loop only and is not thread safe.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        """Initialize an empty cache.
+
+        Args:
+            max_entries (int): Maximum number of entries, the least recently used entry is evicted beyond it.
+            ttl (float): Time in seconds after which an entry expires.
+            clock (Callable[[], float]): The clock the time to live is measured with.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        # Incremented by every invalidation, see `put`
+        self.version = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any, tuple[Hashable, ...]]] = OrderedDict()
+        self._tags: dict[Hashable, set[Hashable]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Any | None:
+        """Return the value of a key, or `None` if it is not cached or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= self.clock():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: Hashable, value: Any, tags: Iterable[Hashable], version: int) -> None:
+        """Cache a value loaded from the database.
+
+        Args:
+            key (Hashable): The key.
+            value (Any): The value.
+            tags (Iterable[Hashable]): The tags whose invalidation removes the entry.
+            version (int): The `version` of the cache read before the value was loaded. If an invalidation happened
+                meanwhile, the value may predate the write and is not cached.
+        """
+        if version != self.version:
+            return
+        if key in self._entries:
+            self._remove(key)
+        tags = tuple(tags)
+        self._entries[key] = (self.clock() + self.ttl, value, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate(self, tags: Iterable[Hashable]) -> None:
+        """Remove all entries with any of the given tags."""
+        self.version += 1
+        for tag in tags:
+            for key in self._tags.pop(tag, ()):
+                self._remove(key)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        self.version += 1
+        self._entries.clear()
+        self._tags.clear()
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
@@ -0,0 +1,191 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any
+import numpy as np
+from pydicom import dcmread
+from pydicom.dataset import Dataset
+from series_analysis import slice_geometry
+
+
+class Extractor:
+    """Base class of the extractors computing a summary of a series from its instance files.
+
+    Extractors run in the worker processes of an `ExtractorPipeline`, which reads every file once for all extractors.
+    `map` is called for batches of the datasets of a series in parallel, `reduce` merges the partial results of all
+    batches, in the order of the files, into the fields of the summary. Both must be static methods of a module level
+    class, so they can be pickled by reference. Extractors which need the pixels set `pixel_data`, otherwise the
+    files are read without them.
+    """
+
+    pixel_data = False
+
+    @staticmethod
+    def map(datasets: list[Dataset]) -> Any:
+        raise NotImplementedError
+
+    @staticmethod
+    def reduce(parts: list[Any]) -> dict:
+        raise NotImplementedError
+
+
+class InstanceUIDExtractor(Extractor):
+    """Lists the SOP Instance UIDs of the series."""
+
+    @staticmethod
+    def map(datasets: list[Dataset]) -> list[str]:
+        return [str(dataset.SOPInstanceUID) for dataset in datasets]
+
+    @staticmethod
+    def reduce(parts: list[list[str]]) -> dict:
+        return {'SOPInstanceUIDs': [uid for part in parts for uid in part]}
+
+
+class SliceGeometryExtractor(Extractor):
+    """Orders the slices along the normal of the image plane.
+
+    The slice spacing and the numbers of duplicate and missing slices are part of the geometry summary of the
+    dispatcher (`SeriesGeometry`), so only the order is extracted.
+    """
+
+    @staticmethod
+    def map(datasets: list[Dataset]) -> list[tuple[str, list[float], list[float]]]:
+        slices = []
+        for dataset in datasets:
+            if 'ImagePositionPatient' in dataset and 'ImageOrientationPatient' in dataset:
+                slices.append((str(dataset.SOPInstanceUID), [float(value) for value in dataset.ImagePositionPatient],
+                               [float(value) for value in dataset.ImageOrientationPatient]))
+        return slices
+
+    @staticmethod
+    def reduce(parts: list[list[tuple[str, list[float], list[float]]]]) -> dict:
+        slices = [item for part in parts for item in part]
+        if len(slices) < 2:
+            return {'SliceOrder': [uid for uid, _, _ in slices]}
+
+        uids = np.array([uid for uid, _, _ in slices])
+        order, _ = slice_geometry(np.array([position for _, position, _ in slices]), np.array(slices[0][2]))
+        return {'SliceOrder': uids[order].tolist()}
+
+
+class PixelStatisticsExtractor(Extractor):
+    """Computes minimum, maximum, mean and standard deviation of the stored pixel values of the series."""
+
+    pixel_data = True
+
+    @staticmethod
+    def map(datasets: list[Dataset]) -> tuple[int, float, float, float, float] | None:
+        count, total, total_squares = 0, 0.0, 0.0
+        minimum, maximum = np.inf, -np.inf
+        for dataset in datasets:
+            if 'PixelData' not in dataset:
+                continue
+            pixels = dataset.pixel_array.astype(np.float64, copy=False)
+            count += pixels.size
+            total += float(pixels.sum())
+            total_squares += float(np.square(pixels).sum())
+            minimum = min(minimum, float(pixels.min()))
+            maximum = max(maximum, float(pixels.max()))
+        return (count, total, total_squares, minimum, maximum) if count else None
+
+    @staticmethod
+    def reduce(parts: list[tuple[int, float, float, float, float] | None]) -> dict:
+        parts = [part for part in parts if part is not None]
+        if not parts:
+            return {}
+        count = sum(part[0] for part in parts)
+        mean = sum(part[1] for part in parts) / count
+        variance = max(sum(part[2] for part in parts) / count - mean ** 2, 0.0)
+        return {
+            'PixelMin': min(part[3] for part in parts),
+            'PixelMax': max(part[4] for part in parts),
+            'PixelMean': mean,
+            'PixelStd': variance ** 0.5,
+        }
+
+
+DEFAULT_EXTRACTORS = [InstanceUIDExtractor, SliceGeometryExtractor, PixelStatisticsExtractor]
+
+# Datasets held in memory at once by a worker, with their pixels when an extractor needs them
+READ_BATCH = 16
+
+
+def map_chunk(extractors: list[type[Extractor]], paths: list[str]) -> list[list[Any]]:
+    """Read the files of a chunk once, in batches of `READ_BATCH`, and run every extractor's `map` on each batch.
+
+    Args:
+        extractors (list[type[Extractor]]): The extractors to run.
+        paths (list[str]): The paths of the instance files of the chunk.
+
+    Returns:
+        list[list[Any]]: For every extractor, its partial results of the batches in the order of the files.
+    """
+    stop_before_pixels = not any(extractor.pixel_data for extractor in extractors)
+    parts = [[] for _ in extractors]
+    for start in range(0, len(paths), READ_BATCH):
+        datasets = [dcmread(path, stop_before_pixels=stop_before_pixels) for path in paths[start:start + READ_BATCH]]
+        for extractor, extractor_parts in zip(extractors, parts):
+            extractor_parts.append(extractor.map(datasets))
+    return parts
+
+
+class ExtractorPipeline:
+    """Runs extractors on the instance files of a series in a process pool, off the event loop of the dispatcher.
+
+    The files of a series are split into one chunk per worker and the chunks are processed in parallel, so a single
+    large series uses all cores. A worker reads each file of its chunk once and runs all extractors on it. The
+    partial results are merged with `reduce` and the results of all extractors into one summary.
+    """
+
+    def __init__(self, extractors: list[type[Extractor]] | None = None, max_workers: int | None = None,
+                 executor: Executor | None = None) -> None:
+        """Initialize the pipeline. The process pool is started with the first series.
+
+        Args:
+            extractors (list[type[Extractor]] | None): The extractors to run, `DEFAULT_EXTRACTORS` if `None`.
+            max_workers (int | None): Number of worker processes, the number of CPUs if `None`.
+            executor (Executor | None): Executor to run the extractors with instead of an own process pool.
+        """
+        self.extractors = extractors if extractors is not None else DEFAULT_EXTRACTORS
+        self.max_workers = max_workers or multiprocessing.cpu_count()
+        self.executor = executor
+        self._own_executor = executor is None
+
+    def _get_executor(self) -> Executor:
+        if self.executor is None:
+            # Worker processes are spawned instead of forked, the client process runs pynetdicom threads
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                mp_context=multiprocessing.get_context('spawn'))
+        return self.executor
+
+    async def run(self, paths: list[str]) -> dict:
+        """Run all extractors on the files of a series.
+
+        Args:
+            paths (list[str]): The paths of the instance files of the series.
+
+        Returns:
+            dict: The merged summary of all extractors.
+        """
+        if not paths:
+            return {}
+
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        chunk_size = -(-len(paths) // self.max_workers)
+        chunks = [paths[start:start + chunk_size] for start in range(0, len(paths), chunk_size)]
+
+        chunk_parts = await asyncio.gather(*(
+            loop.run_in_executor(executor, map_chunk, self.extractors, chunk) for chunk in chunks
+        ))
+
+        summary = {}
+        for index, extractor in enumerate(self.extractors):
+            summary.update(extractor.reduce([part for parts in chunk_parts for part in parts[index]]))
+        return summary
+
+    def close(self) -> None:
+        """Shut down the process pool if it is owned by the pipeline."""
+        if self._own_executor and self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
@@ -0,0 +1,202 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Default histogram buckets in seconds, from sub-millisecond handler times to slow HTTP requests
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry():
+    """A collection of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, 'Metric'] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: 'Metric') -> None:
+        """Add a metric to the registry.
+
+        Args:
+            metric (Metric): The metric.
+
+        Raises:
+            ValueError: If a metric with the same name is already registered.
+        """
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """Return the current values of all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+# Registry of the metrics of this process
+REGISTRY = Registry()
+
+
+class Metric():
+    """Base class of the metrics. Updates are thread safe, as the C-STORE handlers run in pynetdicom threads."""
+
+    type = 'untyped'
+
+    def __init__(self, name: str, help: str, registry: Registry | None = REGISTRY) -> None:
+        """Create a metric and register it.
+
+        Args:
+            name (str): The metric name.
+            help (str): The description of the metric.
+            registry (Registry | None): The registry to add the metric to, none if `None`.
+        """
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """A monotonically increasing count."""
+
+    type = 'counter'
+
+    def __init__(self, name: str, help: str, registry: Registry | None = REGISTRY) -> None:
+        super().__init__(name, help, registry)
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def samples(self) -> list[str]:
+        return [f"{self.name} {_format(self.value)}"]
+
+
+class Gauge(Metric):
+    """A value which can go up and down."""
+
+    type = 'gauge'
+
+    def __init__(self, name: str, help: str, registry: Registry | None = REGISTRY) -> None:
+        super().__init__(name, help, registry)
+        self.value = 0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.inc(-amount)
+
+    def samples(self) -> list[str]:
+        return [f"{self.name} {_format(self.value)}"]
+
+
+class Histogram(Metric):
+    """Counts observations in cumulative buckets, together with their sum and count."""
+
+    type = 'histogram'
+
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+                 registry: Registry | None = REGISTRY) -> None:
+        """Create a histogram and register it.
+
+        Args:
+            name (str): The metric name.
+            help (str): The description of the metric.
+            buckets (tuple[float, ...]): The sorted upper bounds of the buckets, without `+Inf`.
+            registry (Registry | None): The registry to add the metric to, none if `None`.
+        """
+        super().__init__(name, help, registry)
+        self.buckets = tuple(buckets) + (math.inf,)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observe the duration of the enclosed block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            lines.append(f'{self.name}_bucket{{le="{_format(bound)}"}} {cumulative}')
+        lines.append(f"{self.name}_sum {_format(total)}")
+        lines.append(f"{self.name}_count {count}")
+        return lines
+
+
+def start_http_server(port: int, address: str = '127.0.0.1', registry: Registry = REGISTRY) -> ThreadingHTTPServer:
+    """Serve the metrics of a registry on `/metrics` from a daemon thread, for processes without a web framework.
+
+    Args:
+        port (int): The port to listen on, 0 for any free port.
+        address (str): The address to listen on, only the loopback interface by default, all interfaces if empty.
+        registry (Registry): The registry to serve.
+
+    Returns:
+        ThreadingHTTPServer: The running server, stopped with `shutdown()` and `server_close()`.
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            # Scrapes are not logged
+            pass
+
+    server = ThreadingHTTPServer((address, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
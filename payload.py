@@ -0,0 +1,143 @@
+import gzip
+import json
+import zlib
+from typing import Any
+import msgpack
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Content types of the request bodies understood by the server
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+CONTENT_TYPES = (JSON, MSGPACK)
+
+# Content encodings, zstd only if the optional `zstandard` package is installed
+GZIP = 'gzip'
+ZSTD = 'zstd'
+CONTENT_ENCODINGS = (GZIP, ZSTD) if zstandard is not None else (GZIP,)
+
+# Default maximum size in bytes of a decoded body, after decompression
+MAX_SIZE = 256 * 1024 ** 2
+
+
+class UnsupportedFormat(ValueError):
+    """The content type or content encoding of a body is not supported."""
+
+
+class PayloadTooLarge(ValueError):
+    """A body is larger than the maximum size, before or after decompression."""
+
+
+def _media_type(content_type: str | None) -> str:
+    """Return the media type of a Content-Type header without its parameters, JSON if the header is missing."""
+    if not content_type:
+        return JSON
+    return content_type.split(';', 1)[0].strip().lower()
+
+
+def encode(data: Any, content_type: str = MSGPACK, compress_min_bytes: int | None = 64 * 1024,
+           content_encoding: str = GZIP) -> tuple[bytes, dict[str, str]]:
+    """Encode the body of a request.
+
+    Args:
+        data (Any): The data to encode, made of dictionaries, lists, strings and numbers.
+        content_type (str): `JSON` or `MSGPACK`.
+        compress_min_bytes (int | None): Bodies of at least this size are compressed, none if `None`. Small bodies are
+            sent uncompressed, as compressing them costs more than it saves.
+        content_encoding (str): The compression, `GZIP` or `ZSTD`.
+
+    Returns:
+        tuple[bytes, dict[str, str]]: The body and its `Content-Type` and `Content-Encoding` headers.
+
+    Raises:
+        UnsupportedFormat: If the content type or content encoding is not supported.
+    """
+    if content_type == JSON:
+        body = json.dumps(data, separators=(',', ':')).encode()
+    elif content_type == MSGPACK:
+        body = msgpack.packb(data)
+    else:
+        raise UnsupportedFormat(f"Unsupported content type: {content_type}")
+    headers = {'Content-Type': content_type}
+
+    if compress_min_bytes is not None and len(body) >= compress_min_bytes:
+        if content_encoding == GZIP:
+            # A low level is much faster and compresses the repetitive series records almost as well
+            body = gzip.compress(body, compresslevel=1)
+        elif content_encoding == ZSTD and zstandard is not None:
+            body = zstandard.ZstdCompressor().compress(body)
+        else:
+            raise UnsupportedFormat(f"Unsupported content encoding: {content_encoding}")
+        headers['Content-Encoding'] = content_encoding
+    return body, headers
+
+
+def _decompress(body: bytes, encoding: str, max_size: int) -> bytes:
+    """Decompress a body, producing at most `max_size` bytes so a small body cannot expand without bound.
+
+    Raises:
+        UnsupportedFormat: If the content encoding is not supported.
+        PayloadTooLarge: If the decompressed body is larger than `max_size`.
+        ValueError: If the compressed body is truncated.
+    """
+    if encoding == GZIP:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        data = decompressor.decompress(body, max_size + 1)
+        if len(data) > max_size:
+            raise PayloadTooLarge(f"Decompressed body larger than {max_size} bytes")
+        if not decompressor.eof:
+            raise ValueError("Truncated gzip body")
+        return data
+    if encoding == ZSTD and zstandard is not None:
+        chunks = []
+        size = 0
+        with zstandard.ZstdDecompressor().stream_reader(body) as reader:
+            while chunk := reader.read(max_size + 1 - size):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > max_size:
+                    raise PayloadTooLarge(f"Decompressed body larger than {max_size} bytes")
+        return b''.join(chunks)
+    raise UnsupportedFormat(f"Unsupported content encoding: {encoding}")
+
+
+def decode(body: bytes, content_type: str | None, content_encoding: str | None = None,
+           max_size: int = MAX_SIZE) -> Any:
+    """Decode the body of a request according to its headers.
+
+    Args:
+        body (bytes): The body.
+        content_type (str | None): The `Content-Type` header, JSON if missing.
+        content_encoding (str | None): The `Content-Encoding` header, uncompressed if missing.
+        max_size (int): Maximum size in bytes of the body, after decompression.
+
+    Returns:
+        Any: The decoded data.
+
+    Raises:
+        UnsupportedFormat: If the content type or content encoding is not supported.
+        PayloadTooLarge: If the body is larger than `max_size`, before or after decompression.
+        ValueError: If the body cannot be decoded.
+    """
+    media_type = _media_type(content_type)
+    if media_type not in CONTENT_TYPES:
+        raise UnsupportedFormat(f"Unsupported content type: {media_type}")
+    if len(body) > max_size:
+        raise PayloadTooLarge(f"Body larger than {max_size} bytes")
+
+    encoding = (content_encoding or 'identity').strip().lower()
+    try:
+        if encoding != 'identity':
+            body = _decompress(body, encoding, max_size)
+
+        if media_type == JSON:
+            return json.loads(body)
+        return msgpack.unpackb(body)
+    except (UnsupportedFormat, PayloadTooLarge):
+        raise
+    except Exception as e:
+        # The decoders raise various exceptions for malformed input (OSError, EOFError, msgpack and zstd errors)
+        raise ValueError(f"Invalid {media_type} body: {e!r}") from e
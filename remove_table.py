@@ -1,16 +1,25 @@
+import os
 import sqlite3
 
-def clear_database_contents():
+# Tables of the server, the instances first so deleting the series does not delete them one by one by the trigger
+TABLES = ('instances', 'series', 'studies', 'patients')
+
+def clear_database_contents(path: str = os.environ.get('DICOM_DB_PATH', 'dicom_series.db')):
     """
-    Connects to the SQLite database 'dicom_series.db' and removes all records 
-    from the 'series' table.
+    Connects to the SQLite database of the server (`DICOM_DB_PATH`, default
+    'dicom_series.db') and removes all records from the instances, series,
+    studies and patients tables. Tables missing in databases of older versions
+    are skipped.
     """
 
-    conn = sqlite3.connect('dicom_series.db')
-    
+    conn = sqlite3.connect(path)
+
     cursor = conn.cursor()
-    cursor.execute("DELETE FROM series")
-    conn.commit() 
+    existing = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table in TABLES:
+        if table in existing:
+            cursor.execute(f"DELETE FROM {table}")
+    conn.commit()
 
     conn.close()
 
@@ -1,25 +1,375 @@
+import asyncio
+import contextlib
+import logging
+import os
+import re
+import socket
+import threading
+import time
+from io import BytesIO
+from pydicom import Dataset, dcmread
+from pydicom.datadict import tag_for_keyword
 from pydicom.dataset import FileMetaDataset
-from pynetdicom import AE, events, evt, debug_logger
-from pynetdicom.sop_class import MRImageStorage
-from queue import Queue
+from pydicom.filebase import DicomFileLike
+from pydicom.filereader import read_dataset
+from pydicom.filewriter import write_file_meta_info
+from pynetdicom import AE, events, evt
+from pynetdicom.transport import ThreadedAssociationServer
+from pynetdicom.sop_class import (CTImageStorage, EnhancedCTImageStorage, EnhancedMRImageStorage, MRImageStorage,
+                                  SecondaryCaptureImageStorage)
+from metrics import Counter, Gauge, Histogram
 
-debug_logger()
+logger = logging.getLogger(__name__)
+
+STORE_HANDLER_SECONDS = Histogram('dicom_scp_store_handler_seconds', "Time spent in the C-STORE handler.")
+INSTANCES_RECEIVED = Counter('dicom_scp_instances_received_total', "Instances accepted by the SCP.")
+INSTANCES_REJECTED = Counter('dicom_scp_instances_rejected_total', "Instances refused because the queue was full.")
+QUEUE_DEPTH = Gauge('dicom_scp_queue_depth', "Instances queued towards the consumer.")
+
+# DICOM status returned when the queue is full: "Refused: Out of Resources"
+STATUS_OUT_OF_RESOURCES = 0xA700
+# DICOM status returned for an instance whose SOP Instance UID cannot be used as file name: "Error: Cannot understand"
+STATUS_CANNOT_UNDERSTAND = 0xC000
+
+# Characters of a UID (value representation UI), the only ones allowed in the file names of the stored instances
+UID_PATTERN = re.compile(r'[0-9.]{1,64}')
+
+# Interval in seconds in which the server checks for a shutdown request, bounding the time `stop()` takes
+SERVER_POLL_INTERVAL = 0.05
+
+BACKPRESSURE_BLOCK = 'block'
+BACKPRESSURE_REJECT = 'reject'
+
+# Storage SOP classes supported by default
+DEFAULT_STORAGE_SOP_CLASSES = [
+    MRImageStorage,
+    EnhancedMRImageStorage,
+    CTImageStorage,
+    EnhancedCTImageStorage,
+    SecondaryCaptureImageStorage,
+]
+
+
+# Header elements parsed from the received datasets if the pixel data is not kept
+HEADER_KEYWORDS = [
+    'SpecificCharacterSet',
+    'SOPClassUID',
+    'SOPInstanceUID',
+    'PatientName',
+    'PatientID',
+    'StudyInstanceUID',
+    'SeriesInstanceUID',
+    'InstanceNumber',
+    # Geometry and timing checked by `series_analysis.SeriesGeometry`
+    'AcquisitionTime',
+    'ImagePositionPatient',
+    'ImageOrientationPatient',
+]
+
+
+def instance_path(store_dir: str, sop_instance_uid: str) -> str:
+    """Return the path the instance with the given SOP Instance UID is written to in `store_dir`.
+
+    Raises:
+        ValueError: If the UID contains other characters than digits and dots (e.g. `/`), so the file name could
+            point outside of `store_dir`.
+    """
+    if not UID_PATTERN.fullmatch(str(sop_instance_uid)):
+        raise ValueError(f"Invalid SOP Instance UID: {sop_instance_uid!r}")
+    return os.path.join(store_dir, f"{sop_instance_uid}.dcm")
+
+
+def read_header(event: events.Event, keywords: list[str]) -> Dataset:
+    """Parse only the given elements of the dataset of a C-STORE request.
+
+    The encoded dataset received by pynetdicom is scanned in place: the values of all other elements are skipped and
+    the scan stops after the last requested element, so neither the pixel data nor any other large value is read.
+
+    Args:
+        event (Event): Representation of a C-STORE event.
+        keywords (list[str]): The keywords of the elements to parse.
+
+    Returns:
+        Dataset: A dataset holding only the requested elements, without file meta information.
+    """
+    tags = [tag_for_keyword(keyword) for keyword in keywords]
+    transfer_syntax = event.context.transfer_syntax
+    if transfer_syntax.is_deflated:
+        # The deflated stream has to be decompressed as a whole, pydicom handles that when reading a file
+        return dcmread(BytesIO(event.encoded_dataset()), stop_before_pixels=True, specific_tags=tags)
+
+    last_tag = max(tags)
+    fp = event.request.DataSet
+    fp.seek(0)
+    try:
+        return read_dataset(fp, transfer_syntax.is_implicit_VR, transfer_syntax.is_little_endian,
+                            stop_when=lambda tag, vr, length: tag > last_tag, specific_tags=tags)
+    finally:
+        fp.seek(0)
+
+
+class StoreHandlerStats():
+    """Statistics about the C-STORE handler and the queue towards the consumer, used to size the queue bounds.
+    All attributes are updated under the lock of the owning `ModalityStoreSCP`.
+    """
 
-class ModalityStoreSCP():
     def __init__(self) -> None:
-        self.ae = AE(ae_title=b'STORESCP')
+        self.handled = 0
+        self.rejected = 0
+        self.queue_depth = 0
+        self.queued_bytes = 0
+        self.max_queue_depth = 0
+        self.max_queued_bytes = 0
+        self.handler_time_total = 0.0
+        self.handler_time_max = 0.0
+        self.blocked_time_total = 0.0
+
+    def snapshot(self) -> dict:
+        """Return the current statistics.
+
+        Returns:
+            dict: The statistics including the mean handler time in seconds.
+        """
+        handled = self.handled + self.rejected
+        return {
+            'handled': self.handled,
+            'rejected': self.rejected,
+            'queue_depth': self.queue_depth,
+            'queued_bytes': self.queued_bytes,
+            'max_queue_depth': self.max_queue_depth,
+            'max_queued_bytes': self.max_queued_bytes,
+            'handler_time_mean': self.handler_time_total / handled if handled else 0.0,
+            'handler_time_max': self.handler_time_max,
+            'blocked_time_total': self.blocked_time_total,
+        }
+
+
+class ReusePortAssociationServer(ThreadedAssociationServer):
+    """Association server which binds its socket with `SO_REUSEPORT`, so several processes can listen on the same
+    port and the kernel distributes the incoming associations between them.
+    """
+
+    def server_bind(self) -> None:
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+
+class ModalityStoreSCP():
+    def __init__(self, max_queued_instances: int = 1000, max_queued_bytes: int = 1024 ** 3,
+                 backpressure: str = BACKPRESSURE_BLOCK, block_timeout: float = 5.0,
+                 keep_pixel_data: bool = True, store_dir: str | None = None,
+                 address: tuple[str, int] = ('127.0.0.1', 6667), ae_title: str = 'STORESCP',
+                 sop_classes: list[str] | None = None, transfer_syntaxes: list[str] | None = None,
+                 max_associations: int = 10, spool=None, header_keywords: list[str] | None = None,
+                 reuse_port: bool = False) -> None:
+        """Initialize the SCP. The server is not started (and its port not bound) until `start()` is called.
+
+        Args:
+            max_queued_instances (int): Maximum number of received but not yet consumed datasets.
+            max_queued_bytes (int): Maximum encoded size in bytes of received but not yet consumed datasets.
+            backpressure (str): Policy if the queue is full. `'block'` holds the association for up to
+                `block_timeout` seconds until the consumer catches up, `'reject'` answers immediately. In both cases
+                the C-STORE is refused with status 0xA700 (Out of Resources) if there is no space left.
+            block_timeout (float): Maximum time in seconds a C-STORE is held with the `'block'` policy.
+            keep_pixel_data (bool): If `False` only the `HEADER_KEYWORDS` elements of the received datasets are parsed
+                (see `read_header`), so the queued datasets neither hold nor decode the pixel data.
+            store_dir (str | None): Optional directory each received instance is written to in the DICOM file format,
+                named after its SOP Instance UID. Created by `start()`.
+            address (tuple[str, int]): The address and port the server listens on.
+            ae_title (str): The AE title of the SCP.
+            sop_classes (list[str] | None): The storage SOP classes to support, `DEFAULT_STORAGE_SOP_CLASSES` if
+                `None`.
+            transfer_syntaxes (list[str] | None): The transfer syntaxes accepted for every SOP class, the pynetdicom
+                default (uncompressed) transfer syntaxes if `None`.
+            max_associations (int): Maximum number of concurrent associations, each handled in its own thread.
+            spool (InstanceSpool | None): Optional spool every accepted instance is appended to before the C-STORE is
+                acknowledged.
+            header_keywords (list[str] | None): The elements parsed if the pixel data is not kept, `HEADER_KEYWORDS`
+                if `None`.
+            reuse_port (bool): Bind the port with `SO_REUSEPORT`, so further SCPs (processes) can share it.
+        """
+        if backpressure not in (BACKPRESSURE_BLOCK, BACKPRESSURE_REJECT):
+            raise ValueError(f"Unknown backpressure policy: {backpressure}")
+
+        self.ae = AE(ae_title=ae_title)
+        self.ae.maximum_associations = max_associations
         self.scp = None
-        self.queue = Queue()
+        self.address = address
+        self.sop_classes = sop_classes if sop_classes is not None else DEFAULT_STORAGE_SOP_CLASSES
+        self.transfer_syntaxes = transfer_syntaxes
+        self.max_queued_instances = max_queued_instances
+        self.max_queued_bytes = max_queued_bytes
+        self.backpressure = backpressure
+        self.block_timeout = block_timeout
+        self.keep_pixel_data = keep_pixel_data
+        self.store_dir = store_dir
+        self.spool = spool
+        self.header_keywords = header_keywords if header_keywords is not None else HEADER_KEYWORDS
+        self.reuse_port = reuse_port
+        self.stats = StoreHandlerStats()
+        # Datasets are handed over from the pynetdicom handler threads to the asyncio event loop of the consumer
+        # together with their encoded size and their source, the calling AE title and an association identifier.
+        # The release of an association is announced with the dataset `None`, after all datasets of the association.
+        # Until a loop is attached (see `attach_loop`) the items are buffered in `_pending`.
+        self.queue: asyncio.Queue[tuple[Dataset | None, int, tuple[str, int]]] = asyncio.Queue()
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self._pending: list[tuple[Dataset | None, int, tuple[str, int]]] = []
+        self._lock = threading.Condition()
         self._configure_ae()
 
     def _configure_ae(self) -> None:
-        """Configure the Application Entity with the presentation context(s) which should be supported and start the SCP server.
+        """Configure the Application Entity with the presentation context(s) which should be supported.
+        """
+        for sop_class in self.sop_classes:
+            if self.transfer_syntaxes is None:
+                self.ae.add_supported_context(sop_class)
+            else:
+                self.ae.add_supported_context(sop_class, self.transfer_syntaxes)
+
+    def start(self) -> None:
+        """Create the `store_dir` and open the spool, then start the SCP server, which accepts associations in its own
+        threads. Does nothing if it is running.
+        """
+        if self.scp is not None:
+            return
+
+        if self.store_dir is not None:
+            os.makedirs(self.store_dir, exist_ok=True)
+        if self.spool is not None:
+            self.spool.open()
+        handlers = [(evt.EVT_C_STORE, self.handle_store), (evt.EVT_RELEASED, self.handle_released)]
+        server_class = ReusePortAssociationServer if self.reuse_port else ThreadedAssociationServer
+        self.scp = self.ae.make_server(self.address, evt_handlers=handlers, server_class=server_class)
+        # Served like by `start_server`, but polling more often than every 0.5 s so `stop()` returns quickly
+        threading.Thread(target=self.scp.serve_forever, args=(SERVER_POLL_INTERVAL,), name='AcceptorServer',
+                         daemon=True).start()
+        # Registered like the servers of `start_server`, which `shutdown()` of the server expects
+        self.ae._servers.append(self.scp)
+        logger.info("SCP server started on %s:%d as %s", *self.address, self.ae.ae_title)
+
+    def stop(self) -> None:
+        """Stop the SCP server and close its port. Does nothing if it is not running.
+        """
+        scp, self.scp = self.scp, None
+        if scp is not None:
+            scp.shutdown()
+            logger.info("SCP server on %s:%d stopped", *self.address)
+
+    def attach_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Attach the event loop which consumes `queue`. Must be called from within that loop.
+
+        Datasets received before the loop was attached are moved to the queue.
+
+        Args:
+            loop (AbstractEventLoop): The running event loop of the consumer.
         """
-        handlers = [(evt.EVT_C_STORE, self.handle_store)]
+        with self._lock:
+            self.loop = loop
+            pending, self._pending = self._pending, []
 
-        self.ae.add_supported_context(MRImageStorage)
-        self.scp = self.ae.start_server(('127.0.0.1', 6667), block=False, evt_handlers=handlers)
-        print("SCP Server started")
+        for item in pending:
+            self.queue.put_nowait(item)
+
+    async def get(self) -> tuple[Dataset | None, tuple[str, int]]:
+        """Wait for the next received dataset and release its space in the queue.
+
+        Returns:
+            tuple[Dataset | None, tuple[str, int]]: The received dataset, or `None` if the association was released,
+            and the source as calling AE title and association identifier.
+        """
+        dataset, size, source = await self.queue.get()
+        if dataset is not None:
+            self._release(size)
+        return dataset, source
+
+    def get_nowait(self) -> tuple[Dataset | None, tuple[str, int]]:
+        """Return the next received dataset without waiting and release its space in the queue.
+
+        Raises:
+            asyncio.QueueEmpty: If no dataset is available.
+
+        Returns:
+            tuple[Dataset | None, tuple[str, int]]: The received dataset, or `None` if the association was released,
+            and the source as calling AE title and association identifier.
+        """
+        dataset, size, source = self.queue.get_nowait()
+        if dataset is not None:
+            self._release(size)
+        return dataset, source
+
+    def _put(self, item: tuple[Dataset | None, int, tuple[str, int]]) -> None:
+        """Hand an item over to the event loop. The lock must be held.
+
+        The handlers run in pynetdicom threads, so the `asyncio.Queue` must only be touched from the loop itself via
+        `call_soon_threadsafe`, which also wakes up the waiting consumer immediately.
+        """
+        if self.loop is None:
+            self._pending.append(item)
+        else:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+
+    def _hand_over(self, item: tuple[Dataset | None, int, tuple[str, int]]) -> bool:
+        """Hand a received dataset, or the release of an association, over to its consumer without holding the lock.
+
+        Returns:
+            bool: Whether the item was handed over. The queue of the event loop always takes it, its space was
+            reserved before.
+        """
+        with self._lock:
+            self._put(item)
+        return True
+
+    @staticmethod
+    def _source(event: events.Event) -> tuple[str, int]:
+        """Return the calling AE title and an identifier of the association of an event."""
+        return event.assoc.requestor.ae_title, id(event.assoc)
+
+    def _release(self, size: int) -> None:
+        """Account for a dataset taken from the queue and wake up handlers waiting for space.
+
+        Args:
+            size (int): The encoded size of the dataset in bytes.
+        """
+        with self._lock:
+            self.stats.queue_depth -= 1
+            self.stats.queued_bytes -= size
+            QUEUE_DEPTH.set(self.stats.queue_depth)
+            self._lock.notify_all()
+
+    def _has_space(self, size: int) -> bool:
+        """Check whether a dataset of the given size fits into the queue. The lock must be held.
+
+        Args:
+            size (int): The encoded size of the dataset in bytes.
+
+        Returns:
+            bool: `True` if the dataset can be queued. An empty queue always accepts a dataset, so a single dataset
+            larger than `max_queued_bytes` is never refused.
+        """
+        if self.stats.queue_depth == 0:
+            return True
+        return (self.stats.queue_depth < self.max_queued_instances
+                and self.stats.queued_bytes + size <= self.max_queued_bytes)
+
+    def instance_path(self, sop_instance_uid: str) -> str:
+        """Return the path the instance with the given SOP Instance UID is written to in `store_dir`, see
+        `instance_path`."""
+        return instance_path(self.store_dir, sop_instance_uid)
+
+    @staticmethod
+    def write_instance(event: events.Event, path: str) -> None:
+        """Write the instance of a C-STORE request in the DICOM file format. The encoded dataset is written as
+        received, directly from the receive buffer without copying or decoding it.
+
+        Args:
+            event (Event): Representation of a C-STORE event.
+            path (str): The path of the file.
+        """
+        with open(path, 'wb') as f:
+            f.write(b'\x00' * 128 + b'DICM')
+            write_file_meta_info(DicomFileLike(f), FileMetaDataset(event.file_meta), enforce_standard=True)
+            with event.request.DataSet.getbuffer() as view:
+                f.write(view)
 
     def handle_store(self, event: events.Event) -> int:
         """Callable handler function used to handle a C-STORE event.
@@ -30,14 +380,100 @@ class ModalityStoreSCP():
         Returns:
             int: Status Code
         """
-        dataset = event.dataset
+        start = time.perf_counter()
+        if self.keep_pixel_data:
+            dataset = event.dataset
+        else:
+            dataset = read_header(event, self.header_keywords)
         dataset.file_meta = FileMetaDataset(event.file_meta)
+        path = None
+        if self.store_dir is not None:
+            try:
+                path = self.instance_path(dataset.SOPInstanceUID)
+            except ValueError:
+                logger.warning("Refusing dataset with invalid SOP Instance UID %r", dataset.SOPInstanceUID)
+                return STATUS_CANNOT_UNDERSTAND
+        size = event.request.DataSet.getbuffer().nbytes
 
-        # TODO: Do something with the dataset. Think about how you can transfer the dataset from this place 
+        source = self._source(event)
 
-        # Add the received dataset to the queue for thread-safe and asynchronous processing.
-        # This allows the dataset to be handled later while ensuring multiple datasets can be processed concurrently.
-        self.queue.put(dataset)
-        print(f"Dataset with SeriesInstanceUID {dataset.SeriesInstanceUID} received and added to the queue.")
+        # Reserve space in the queue for the received dataset
+        with self._lock:
+            if not self._has_space(size) and self.backpressure == BACKPRESSURE_BLOCK:
+                blocked_start = time.perf_counter()
+                self._lock.wait_for(lambda: self._has_space(size), timeout=self.block_timeout)
+                self.stats.blocked_time_total += time.perf_counter() - blocked_start
 
-        return 0x0000
+            accepted = self._has_space(size)
+            if accepted:
+                self.stats.queue_depth += 1
+                self.stats.queued_bytes += size
+                self.stats.max_queue_depth = max(self.stats.max_queue_depth, self.stats.queue_depth)
+                self.stats.max_queued_bytes = max(self.stats.max_queued_bytes, self.stats.queued_bytes)
+                QUEUE_DEPTH.set(self.stats.queue_depth)
+
+        # Write the instance file and persist the instance in the spool before it is acknowledged, without holding
+        # the lock while waiting. Refused instances are never written, so they leave no file behind.
+        written = False
+        if accepted and (path is not None or self.spool is not None):
+            try:
+                if path is not None:
+                    self.write_instance(event, path)
+                    written = True
+                if self.spool is not None:
+                    # A stalled spool must not hold the association forever, the instance is refused instead
+                    appended = self.spool.append(dataset, source[0])
+                    try:
+                        appended.result(timeout=self.block_timeout)
+                    except TimeoutError:
+                        appended.cancel()
+                        raise
+            except Exception:
+                logger.exception("Failed to store dataset with SeriesInstanceUID %s", dataset.SeriesInstanceUID)
+                if written:
+                    with contextlib.suppress(OSError):
+                        os.remove(path)
+                    written = False
+                self._release(size)
+                accepted = False
+
+        # Hand the received dataset over to its consumer. If that fails, the instance is refused and its file removed;
+        # a spooled copy is only replayed and collected again, as the modality resends it.
+        if accepted and not self._hand_over((dataset, size, source)):
+            if written:
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+            accepted = False
+
+        with self._lock:
+            if accepted:
+                self.stats.handled += 1
+                status = 0x0000
+            else:
+                self.stats.rejected += 1
+                status = STATUS_OUT_OF_RESOURCES
+
+            elapsed = time.perf_counter() - start
+            self.stats.handler_time_total += elapsed
+            self.stats.handler_time_max = max(self.stats.handler_time_max, elapsed)
+
+        STORE_HANDLER_SECONDS.observe(elapsed)
+        if status == 0x0000:
+            INSTANCES_RECEIVED.inc()
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Dataset with SeriesInstanceUID %s received and added to the queue.",
+                             dataset.SeriesInstanceUID)
+        else:
+            INSTANCES_REJECTED.inc()
+            logger.warning("Queue full, refusing dataset with SeriesInstanceUID %s.", dataset.SeriesInstanceUID)
+
+        return status
+
+    def handle_released(self, event: events.Event) -> None:
+        """Callable handler function used to handle the release of an association. The release is queued after the
+        datasets received with the association, as it is a strong hint that the sent series are complete.
+
+        Args:
+            event (Event): Representation of an association release event.
+        """
+        self._hand_over((None, 0, self._source(event)))
@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import zlib
+from pynetdicom import events
+from scp import BACKPRESSURE_BLOCK, ModalityStoreSCP, instance_path
+from spool import InstanceSpool
+
+logger = logging.getLogger(__name__)
+
+
+def shard_index(series_instance_uid: str, num_shards: int) -> int:
+    """Return the index of the collector shard of a series. The index is stable across processes.
+
+    Args:
+        series_instance_uid (str): The Series Instance UID.
+        num_shards (int): The number of shards.
+
+    Returns:
+        int: The shard index.
+    """
+    return zlib.crc32(str(series_instance_uid).encode()) % num_shards
+
+
+class WorkerStoreSCP(ModalityStoreSCP):
+    """The SCP of a worker process. Instead of the queue of an event loop, each received dataset is put on the
+    multiprocessing queue of the collector shard of its series; the release of an association is put on the queues of
+    all shards, behind the datasets of the association.
+    """
+
+    def __init__(self, shard_queues: list, **kwargs) -> None:
+        """Initialize the SCP, whose server listens on a port shared with the other workers once started.
+
+        Args:
+            shard_queues (list[multiprocessing.Queue]): The queues of the collector shards.
+            **kwargs: Further keyword arguments of the `ModalityStoreSCP`.
+        """
+        self.shard_queues = shard_queues
+        super().__init__(reuse_port=True, **kwargs)
+
+    @staticmethod
+    def _source(event: events.Event) -> tuple[str, tuple[int, int]]:
+        # The associations of different workers may have the same id, the process id makes the identifier unique
+        return event.assoc.requestor.ae_title, (os.getpid(), id(event.assoc))
+
+    def _hand_over(self, item: tuple) -> bool:
+        """Put a dataset on the queue of its shard, or a release on the queues of all shards, outside of the lock.
+
+        A full shard queue is handled by the backpressure policy: with `'block'` the put waits up to `block_timeout`
+        seconds for the collectors to catch up, with `'reject'` it fails immediately, and the C-STORE is refused. The
+        dataset leaves the accounting of this process once it is handed over or refused.
+        """
+        dataset, size, source = item
+        block = self.backpressure == BACKPRESSURE_BLOCK
+        if dataset is None:
+            try:
+                for shard_queue in self.shard_queues:
+                    shard_queue.put((None, source), block, self.block_timeout)
+            except queue.Full:
+                # The release only shortens the wait for the series of the association
+                logger.warning("Shard queue full, dropping the release of association %s", source[1])
+            return True
+
+        try:
+            self.shard_queues[shard_index(dataset.SeriesInstanceUID, len(self.shard_queues))].put(
+                (dataset, source), block, self.block_timeout)
+        except queue.Full:
+            return False
+        finally:
+            self._release(size)
+        return True
+
+
+def run_worker(scp_options: dict, shard_queues: list, spool_path: str | None, ready, stop) -> None:
+    """Entry point of a worker process: runs a `WorkerStoreSCP` until `stop` is set.
+
+    Args:
+        scp_options (dict): Keyword arguments of the `ModalityStoreSCP`.
+        shard_queues (list[multiprocessing.Queue]): The queues of the collector shards.
+        spool_path (str | None): Optional path of the `InstanceSpool` shared by all workers.
+        ready (multiprocessing.Queue): Receives `None` once the SCP is listening, or the error if it failed.
+        stop (multiprocessing.Event): Set to shut the worker down.
+    """
+    spool = InstanceSpool(spool_path) if spool_path is not None else None
+    try:
+        worker = WorkerStoreSCP(shard_queues, spool=spool, **scp_options)
+        worker.start()
+    except Exception as e:
+        ready.put(repr(e))
+        return
+
+    ready.put(None)
+    stop.wait()
+    worker.stop()
+    if spool is not None:
+        spool.close()
+
+
+class ScpWorkerPool():
+    """Several SCP processes listening on the same port (`SO_REUSEPORT`), so parsing and acknowledging the received
+    instances is not limited by the GIL of one process.
+
+    The kernel distributes the associations between the workers, so the instances of one series may be received by
+    different workers. Each worker therefore routes every dataset by a hash of its Series Instance UID to the
+    multiprocessing queue of one collector shard, and all instances of a series are collected by the same shard of the
+    `SeriesDispatcher`, in the order they were received by each worker.
+    """
+
+    def __init__(self, num_workers: int, num_shards: int, scp_options: dict | None = None,
+                 spool_path: str | None = None, start_timeout: float = 30.0) -> None:
+        """Initialize the pool. The worker processes are not spawned until `start()` is called.
+
+        Args:
+            num_workers (int): Number of worker processes.
+            num_shards (int): Number of collector shards.
+            scp_options (dict | None): Keyword arguments of the `ModalityStoreSCP` of each worker. The
+                `max_queued_instances` also bound each shard queue.
+            spool_path (str | None): Optional path of an `InstanceSpool` each worker appends its instances to.
+            start_timeout (float): Maximum time in seconds to wait for a worker to start.
+        """
+        self.num_workers = num_workers
+        self.scp_options = dict(scp_options or {})
+        self.spool_path = spool_path
+        self.start_timeout = start_timeout
+        self.store_dir = self.scp_options.get('store_dir')
+        # Workers are spawned, forking a process running pynetdicom threads is unsafe
+        self._context = multiprocessing.get_context('spawn')
+        self.shard_queues = [self._context.Queue(maxsize=self.scp_options.get('max_queued_instances', 1000))
+                             for _ in range(num_shards)]
+        self._stop = self._context.Event()
+        self._readers: list[threading.Thread] = []
+        self.processes: list[multiprocessing.Process] = []
+
+    def start(self) -> None:
+        """Start the worker processes and wait until all of them are listening. Does nothing if they are running.
+
+        Raises:
+            RuntimeError: If a worker could not start its SCP.
+        """
+        if self.processes:
+            return
+
+        self._stop.clear()
+        ready = self._context.Queue()
+        self.processes = [self._context.Process(target=run_worker, name=f'scp-worker-{index}', daemon=True,
+                                                args=(self.scp_options, self.shard_queues, self.spool_path, ready,
+                                                      self._stop))
+                          for index in range(self.num_workers)]
+        for process in self.processes:
+            process.start()
+
+        for _ in self.processes:
+            try:
+                error = ready.get(timeout=self.start_timeout)
+            except queue.Empty:
+                error = "timeout"
+            if error is not None:
+                self.stop()
+                raise RuntimeError(f"SCP worker failed to start: {error}")
+        logger.info("Started %d SCP worker processes", self.num_workers)
+
+    def attach_shards(self, loop: asyncio.AbstractEventLoop, shards: list[asyncio.Queue]) -> None:
+        """Forward the datasets of each shard queue to the asyncio queue of the shard, from one thread per shard.
+
+        Args:
+            loop (AbstractEventLoop): The running event loop of the collectors.
+            shards (list[Queue]): The asyncio queues of the shards, one per shard queue.
+        """
+        for shard_queue, shard in zip(self.shard_queues, shards):
+            reader = threading.Thread(target=self._forward, args=(shard_queue, loop, shard), daemon=True)
+            reader.start()
+            self._readers.append(reader)
+
+    @staticmethod
+    def _forward(shard_queue, loop: asyncio.AbstractEventLoop, shard: asyncio.Queue) -> None:
+        while True:
+            item = shard_queue.get()
+            if item is None:
+                return
+            try:
+                loop.call_soon_threadsafe(shard.put_nowait, item)
+            except RuntimeError:
+                # The loop has been closed
+                return
+
+    def instance_path(self, sop_instance_uid: str) -> str:
+        """Return the path the instance with the given SOP Instance UID is written to in `store_dir`, see
+        `scp.instance_path`."""
+        return instance_path(self.store_dir, sop_instance_uid)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the worker processes and the forwarding threads.
+
+        Args:
+            timeout (float): Maximum time in seconds to wait for each worker before it is terminated.
+        """
+        self._stop.set()
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+        if self._readers:
+            # Only forwarding threads consume the sentinels, without them they would be left in the queues
+            for shard_queue in self.shard_queues:
+                shard_queue.put(None)
+            for reader in self._readers:
+                reader.join(timeout)
+            self._readers = []
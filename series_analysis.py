@@ -0,0 +1,133 @@
+import math
+import numpy as np
+from pydicom import Dataset
+
+_NO_POSITION = (math.nan,) * 3
+
+
+def dicom_time_seconds(value: object) -> float:
+    """Convert a DICOM TM value (`HHMMSS.FFFFFF`, trailing components optional) to seconds since midnight.
+
+    Args:
+        value (object): The TM value.
+
+    Returns:
+        float: The seconds since midnight, NaN if the value is empty or invalid.
+    """
+    value = str(value or '').strip().replace(':', '')
+    try:
+        return int(value[0:2]) * 3600 + int(value[2:4] or 0) * 60 + float(value[4:] or 0)
+    except ValueError:
+        return math.nan
+
+
+def _floats(value: object, count: int, missing: tuple[float, ...] | None) -> tuple[float, ...] | None:
+    """Return a multi-valued attribute as tuple of `count` floats, `missing` if it is absent or malformed."""
+    try:
+        values = tuple(map(float, value))
+    except (TypeError, ValueError):
+        return missing
+    return values if len(values) == count else missing
+
+
+def slice_geometry(positions: np.ndarray, orientation: np.ndarray) -> tuple[np.ndarray, dict]:
+    """Order slices along the normal of their image plane and detect duplicate and missing slices.
+
+    Slices closer than 1 µm are duplicates. The slice spacing is the median distance of neighbouring distinct slices,
+    a gap of n spacings counts as n - 1 missing slices.
+
+    Args:
+        positions (ndarray): The Image Position (Patient) of the slices, shape `(n, 3)`.
+        orientation (ndarray): The Image Orientation (Patient) shared by the slices, shape `(6,)`.
+
+    Returns:
+        tuple[ndarray, dict]: The indices of the slices in spatial order, and the `SliceSpacing`, `DuplicateSlices`
+            and `MissingSlices`.
+    """
+    normal = np.cross(orientation[:3], orientation[3:])
+    locations = positions @ normal
+    order = np.argsort(locations, kind='stable')
+    spacings = np.diff(locations[order])
+
+    duplicates = spacings < 1e-3
+    distinct = spacings[~duplicates]
+    spacing = float(np.median(distinct)) if distinct.size else 0.0
+    missing = int(np.sum(np.maximum(np.rint(distinct / spacing) - 1, 0))) if spacing > 0 else 0
+    return order, {'SliceSpacing': spacing, 'DuplicateSlices': int(np.sum(duplicates)), 'MissingSlices': missing}
+
+
+class SeriesGeometry:
+    """Per-instance geometry and ordering attributes of a series, checked for consistency once it is complete.
+
+    The attributes are appended to flat lists as the instances arrive, so no dataset has to be kept or visited again;
+    `analyze` converts them to NumPy arrays once and runs all checks vectorized. Missing attributes are NaN, the
+    positions are flattened to 3 values per instance. Only the first image orientation is kept, instances with a
+    different orientation are counted.
+    """
+
+    __slots__ = ('sop_instance_uids', 'instance_numbers', 'acquisition_times', 'positions', 'orientation',
+                 'mixed_orientations')
+
+    def __init__(self) -> None:
+        self.sop_instance_uids: list[str] = []
+        self.instance_numbers: list[float] = []
+        self.acquisition_times: list[float] = []
+        self.positions: list[float] = []
+        self.orientation: tuple[float, ...] | None = None
+        self.mixed_orientations = 0
+
+    def add(self, dataset: Dataset) -> None:
+        """Record the attributes of an instance.
+
+        Args:
+            dataset (Dataset): The dataset of the instance.
+        """
+        self.sop_instance_uids.append(str(dataset.get('SOPInstanceUID', '')))
+        number = dataset.get('InstanceNumber')
+        self.instance_numbers.append(float(number) if number not in (None, '') else math.nan)
+        self.acquisition_times.append(dicom_time_seconds(dataset.get('AcquisitionTime')))
+        self.positions.extend(_floats(dataset.get('ImagePositionPatient'), 3, _NO_POSITION))
+        orientation = _floats(dataset.get('ImageOrientationPatient'), 6, None)
+        if self.orientation is None:
+            self.orientation = orientation
+        elif orientation is not None and orientation != self.orientation:
+            self.mixed_orientations += 1
+
+    def analyze(self) -> dict:
+        """Check the recorded instances. Only the results which can be computed from the present attributes are
+        returned.
+
+        Returns:
+            dict: `DuplicateSOPInstanceUIDs`, and if available `MissingInstanceNumbers`, `AcquisitionDuration` (in
+                seconds), `MixedOrientations`, `SliceSpacing`, `DuplicateSlices`, `MissingSlices` and
+                `InstanceNumberOrder` (`ascending`, `descending` or `unordered` along the slice normal).
+        """
+        # Hashing the UIDs is considerably faster than sorting them as NumPy strings
+        summary = {'DuplicateSOPInstanceUIDs': len(self.sop_instance_uids) - len(set(self.sop_instance_uids))}
+
+        numbers = np.array(self.instance_numbers, dtype=np.float64)
+        unique_numbers = np.unique(numbers[~np.isnan(numbers)])
+        if unique_numbers.size:
+            summary['MissingInstanceNumbers'] = int(unique_numbers[-1] - unique_numbers[0] + 1 - unique_numbers.size)
+
+        times = np.array(self.acquisition_times, dtype=np.float64)
+        times = times[~np.isnan(times)]
+        if times.size:
+            summary['AcquisitionDuration'] = float(times.max() - times.min())
+
+        if self.orientation is None:
+            return summary
+        summary['MixedOrientations'] = self.mixed_orientations
+
+        positions = np.array(self.positions, dtype=np.float64).reshape(-1, 3)
+        located = ~np.isnan(positions).any(axis=1)
+        if np.count_nonzero(located) >= 2:
+            order, geometry = slice_geometry(positions[located], np.array(self.orientation))
+            summary.update(geometry)
+
+            ordered_numbers = numbers[located][order]
+            if not np.isnan(ordered_numbers).any():
+                steps = np.diff(ordered_numbers)
+                summary['InstanceNumberOrder'] = ('ascending' if (steps > 0).all() else
+                                                  'descending' if (steps < 0).all() else 'unordered')
+        return summary
@@ -1,72 +1,667 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, ConfigDict, ValidationError
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
 import sqlite3
+import time
+from typing import Awaitable, Callable, NamedTuple
+from database import ConnectionPool, GroupCommitWriter, ReadCache
+from metrics import CONTENT_TYPE, REGISTRY, Counter, Histogram
+from uid_codec import decode_uids
+import payload
 
-app = FastAPI()
+# Path of the database and number of pooled connections, configurable through the environment
+DB_PATH = os.environ.get('DICOM_DB_PATH', 'dicom_series.db')
+DB_POOL_SIZE = int(os.environ.get('DICOM_DB_POOL_SIZE', '4'))
+# Durability of the commits of all writes (`synchronous` pragma): NORMAL may lose the last commits on power loss in
+# WAL mode, FULL syncs every commit
+DB_SYNCHRONOUS = os.environ.get('DICOM_DB_SYNCHRONOUS', 'NORMAL').upper()
+# Optional write-behind mode: series are committed in groups every DB_FLUSH_INTERVAL_MS or DB_FLUSH_MAX_RECORDS
+DB_WRITE_BEHIND = os.environ.get('DICOM_DB_WRITE_BEHIND', '0') == '1'
+DB_FLUSH_INTERVAL_MS = float(os.environ.get('DICOM_DB_FLUSH_INTERVAL_MS', '10'))
+DB_FLUSH_MAX_RECORDS = int(os.environ.get('DICOM_DB_FLUSH_MAX_RECORDS', '500'))
+# Cache of the read endpoints: maximum number of cached responses (0 disables the cache) and their time to live
+READ_CACHE_SIZE = int(os.environ.get('DICOM_READ_CACHE_SIZE', '10000'))
+READ_CACHE_TTL = float(os.environ.get('DICOM_READ_CACHE_TTL', '30'))
+# Maximum size in bytes of a request body after decompression, larger bodies are answered with 413
+MAX_BODY_BYTES = int(os.environ.get('DICOM_MAX_BODY_BYTES', str(payload.MAX_SIZE)))
 
-# Define the schema for the incoming request
+db = ConnectionPool(DB_PATH, DB_POOL_SIZE, synchronous=DB_SYNCHRONOUS)
+
+SERIES_RECEIVED = Counter('dicom_server_series_received_total', "Series received by the server.")
+DB_WRITE_SECONDS = Histogram('dicom_server_db_write_seconds',
+                             "Time until the series of a request are committed to the database.")
+READ_CACHE_HITS = Counter('dicom_server_read_cache_hits_total', "Reads answered from the read cache.")
+READ_CACHE_MISSES = Counter('dicom_server_read_cache_misses_total', "Reads of the database on a read cache miss.")
+NOT_MODIFIED = Counter('dicom_server_not_modified_total', "Reads answered with 304 Not Modified.")
+
+# Summary of a series computed by the consistency checks and extractors of the client, further fields of custom
+# extractors are kept
+class SeriesSummary(BaseModel):
+    model_config = ConfigDict(extra='allow')
+
+    SOPInstanceUIDs: list[str] | None = None
+    DuplicateSOPInstanceUIDs: int | None = None
+    MissingInstanceNumbers: int | None = None
+    InstanceNumberOrder: str | None = None
+    AcquisitionDuration: float | None = None
+    MixedOrientations: int | None = None
+    SliceOrder: list[str] | None = None
+    SliceSpacing: float | None = None
+    DuplicateSlices: int | None = None
+    MissingSlices: int | None = None
+    PixelMin: float | None = None
+    PixelMax: float | None = None
+    PixelMean: float | None = None
+    PixelStd: float | None = None
+
+# Define the schema for the incoming request of `POST /series`. The batch endpoint checks its records directly
+# (see `series_row`), as building a model object per series would dominate the CPU time of large batches.
 class SeriesData(BaseModel):
     PatientID: str
     PatientName: str
     StudyInstanceUID: str
     SeriesInstanceUID: str
     InstanceInSeries: int
+    Summary: SeriesSummary | None = None
+    # SOP Instance UIDs of the series encoded with `uid_codec.encode_uids`, stored in the instances table
+    EncodedSOPInstanceUIDs: str | None = None
+
+# Fields of a series in the request body with their types, in the order of the row of a series (see `series_row`).
+# Optional are `Summary`, the summary of the consistency checks and extractors of the client (an object stored as
+# JSON), and `EncodedSOPInstanceUIDs`, the SOP Instance UIDs of the series encoded with `uid_codec.encode_uids`.
+SERIES_FIELDS = (('SeriesInstanceUID', str), ('PatientID', str), ('PatientName', str), ('StudyInstanceUID', str),
+                 ('InstanceInSeries', int))
 
-# Create the SQLite database and table (if not already existing)
+# Create the SQLite database and tables (if not already existing)
 def init_db():
-    conn = sqlite3.connect('dicom_series.db')
+    conn = db.connect()
     cursor = conn.cursor()
+    # Normalized hierarchy keyed by the UIDs: a series references its study, a study its patient
+    cursor.execute('CREATE TABLE IF NOT EXISTS patients (PatientID TEXT PRIMARY KEY, PatientName TEXT)')
+    cursor.execute('CREATE TABLE IF NOT EXISTS studies (StudyInstanceUID TEXT PRIMARY KEY, PatientID TEXT)')
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS series (
             SeriesInstanceUID TEXT PRIMARY KEY,
-            PatientID TEXT,
-            PatientName TEXT,
             StudyInstanceUID TEXT,
-            InstanceInSeries INTEGER
+            InstanceInSeries INTEGER,
+            Summary TEXT,
+            StoredInstances INTEGER NOT NULL DEFAULT 0
         )
     ''')
+    # Databases created before the series summaries and the instances table lack the newer columns
+    columns = [row[1] for row in cursor.execute('PRAGMA table_info(series)')]
+    if 'Summary' not in columns:
+        cursor.execute('ALTER TABLE series ADD COLUMN Summary TEXT')
+    if 'StoredInstances' not in columns:
+        cursor.execute('ALTER TABLE series ADD COLUMN StoredInstances INTEGER NOT NULL DEFAULT 0')
+    # Databases created before the normalized hierarchy store the patient in every series: it is moved to the
+    # patients and studies tables (one series wins where they disagree) and dropped from the series
+    if 'PatientID' in columns:
+        cursor.execute('INSERT OR REPLACE INTO patients SELECT PatientID, PatientName FROM series')
+        cursor.execute('INSERT OR REPLACE INTO studies SELECT StudyInstanceUID, PatientID FROM series')
+        for trigger in ('series_hierarchy_insert', 'series_hierarchy_update'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        cursor.execute('DROP INDEX IF EXISTS idx_series_patient')
+        cursor.execute('ALTER TABLE series DROP COLUMN PatientName')
+        cursor.execute('ALTER TABLE series DROP COLUMN PatientID')
+    # Secondary indexes for the lookups by patient and study, including the primary key for the keyset pagination
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_studies_patient ON studies (PatientID, StudyInstanceUID)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_series_study ON series (StudyInstanceUID, SeriesInstanceUID)')
+
+    # One row per instance, clustered by its UID (no separate rowid table), so the idempotent upsert of an instance
+    # is a single B-tree lookup. The index by series contains the primary key and covers listing the instances of a
+    # series in UID order. The number of instances of a series is kept in StoredInstances by the triggers, so it is
+    # never counted at query time.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS instances (
+            SOPInstanceUID TEXT PRIMARY KEY,
+            SeriesInstanceUID TEXT NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_instances_series ON instances (SeriesInstanceUID)')
+    cursor.executescript('''
+        CREATE TRIGGER IF NOT EXISTS instances_insert AFTER INSERT ON instances
+        BEGIN
+            UPDATE series SET StoredInstances = StoredInstances + 1 WHERE SeriesInstanceUID = NEW.SeriesInstanceUID;
+        END;
+        CREATE TRIGGER IF NOT EXISTS instances_delete AFTER DELETE ON instances
+        BEGIN
+            UPDATE series SET StoredInstances = StoredInstances - 1 WHERE SeriesInstanceUID = OLD.SeriesInstanceUID;
+        END;
+        CREATE TRIGGER IF NOT EXISTS instances_move AFTER UPDATE OF SeriesInstanceUID ON instances
+        BEGIN
+            UPDATE series SET StoredInstances = StoredInstances - 1 WHERE SeriesInstanceUID = OLD.SeriesInstanceUID;
+            UPDATE series SET StoredInstances = StoredInstances + 1 WHERE SeriesInstanceUID = NEW.SeriesInstanceUID;
+        END;
+        CREATE TRIGGER IF NOT EXISTS series_delete AFTER DELETE ON series
+        BEGIN
+            DELETE FROM instances WHERE SeriesInstanceUID = OLD.SeriesInstanceUID;
+        END;
+    ''')
     conn.commit()
     conn.close()
 
-# Initialize the database
-init_db()
+# Upserts of the patient, the study and the series sent with a series. Each inserts a new row or updates an existing
+# one only if it has changed, so resending a series writes nothing.
+UPSERT_PATIENT = '''
+    INSERT INTO patients (PatientID, PatientName) VALUES (?, ?)
+    ON CONFLICT(PatientID) DO UPDATE SET PatientName = excluded.PatientName
+    WHERE PatientName IS NOT excluded.PatientName
+'''
+UPSERT_STUDY = '''
+    INSERT INTO studies (StudyInstanceUID, PatientID) VALUES (?, ?)
+    ON CONFLICT(StudyInstanceUID) DO UPDATE SET PatientID = excluded.PatientID
+    WHERE PatientID IS NOT excluded.PatientID
+'''
+UPSERT_SERIES = '''
+    INSERT INTO series (SeriesInstanceUID, StudyInstanceUID, InstanceInSeries, Summary) VALUES (?, ?, ?, ?)
+    ON CONFLICT(SeriesInstanceUID) DO UPDATE SET
+        StudyInstanceUID = excluded.StudyInstanceUID,
+        InstanceInSeries = excluded.InstanceInSeries,
+        Summary = excluded.Summary
+    WHERE StudyInstanceUID IS NOT excluded.StudyInstanceUID OR InstanceInSeries != excluded.InstanceInSeries
+        OR Summary IS NOT excluded.Summary
+'''
+
+# Idempotent upsert of an instance: a resent instance changes nothing, an instance sent with another series is moved
+UPSERT_INSTANCE = '''
+    INSERT INTO instances (SOPInstanceUID, SeriesInstanceUID) VALUES (?, ?)
+    ON CONFLICT(SOPInstanceUID) DO UPDATE SET SeriesInstanceUID = excluded.SeriesInstanceUID
+    WHERE SeriesInstanceUID != excluded.SeriesInstanceUID
+'''
+
+# Group commit writer used instead of the pool for writing series in write-behind mode
+writer = GroupCommitWriter(db, UPSERT_SERIES, DB_FLUSH_INTERVAL_MS / 1000, DB_FLUSH_MAX_RECORDS) if DB_WRITE_BEHIND else None
+
+# Cache of the responses of the read endpoints, invalidated by the writes of this process
+read_cache = ReadCache(READ_CACHE_SIZE, READ_CACHE_TTL) if READ_CACHE_SIZE > 0 else None
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the database when the app starts instead of when the module is imported, and flush the pending writes
+    and close the connections when it stops.
+    """
+    init_db()
+    yield
+    if writer is not None:
+        writer.close()
+    db.close()
+
+app = FastAPI(lifespan=lifespan)
+
+def series_row(series: dict) -> tuple:
+    """Return the row of a series as written by `upsert_series`: its `SERIES_FIELDS` and the summary as JSON.
+
+    The records are checked directly instead of building a model object per series, which would dominate the CPU time
+    of large batches.
+
+    Raises:
+        ValueError: If a field is missing or has the wrong type.
+    """
+    row = []
+    for name, kind in SERIES_FIELDS:
+        value = series.get(name)
+        if not isinstance(value, kind) or isinstance(value, bool):
+            raise ValueError(f"Field {name} is missing or not of type {kind.__name__}")
+        row.append(value)
+
+    summary = series.get('Summary')
+    if summary is not None:
+        if not isinstance(summary, dict):
+            raise ValueError("Field Summary is not an object")
+        try:
+            # Stored as valid JSON only: no binary msgpack values, no NaN or infinite numbers
+            summary = json.dumps({key: value for key, value in summary.items() if value is not None},
+                                 separators=(',', ':'), allow_nan=False)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Field Summary cannot be stored as JSON: {e}")
+    row.append(summary)
+    return tuple(row)
+
+def instance_rows(series: dict) -> list[tuple]:
+    """Return the parameters of `UPSERT_INSTANCE` for the instances sent with a series, in UID order so the inserts
+    into the instances table are local.
+
+    Raises:
+        ValueError: If the encoded SOP Instance UIDs are not valid.
+    """
+    encoded = series.get('EncodedSOPInstanceUIDs')
+    if encoded is None:
+        return []
+    if not isinstance(encoded, str):
+        raise ValueError("Field EncodedSOPInstanceUIDs is not a string")
+    return [(uid, series['SeriesInstanceUID']) for uid in decode_uids(encoded)]
+
+def series_record(series: dict) -> tuple[tuple, list[tuple]]:
+    """Return the row of a series and the rows of its instances, as written by `upsert_series`.
+
+    Raises:
+        ValueError: If the series is not valid.
+    """
+    if not isinstance(series, dict):
+        raise ValueError("A series is not an object")
+    return series_row(series), instance_rows(series)
 
-@app.post("/series")
-async def receive_series(data: SeriesData):
-    """Endpoint to receive DICOM series data and store it in the database."""
+# Number of keys looked up per query by `fetch_stored`
+LOOKUP_CHUNK = 500
+
+class WriteResult(NamedTuple):
+    """The outcome of `upsert_series`."""
+    # Number of series which were inserted or updated or received new instances
+    changed: int
+    # (SeriesInstanceUID, PatientID, StudyInstanceUID) of the series instances were moved away from
+    previous: set[tuple[str, str, str]]
+    # Cache tags of the patients and studies which were updated, see `series_tags`
+    parents: set[tuple[str, str]]
+
+def fetch_stored(conn: sqlite3.Connection, query: str, keys: list) -> dict[str, tuple]:
+    """Return the stored rows of the given keys, looked up in chunks of `LOOKUP_CHUNK` keys per query.
+
+    Args:
+        conn (Connection): The connection.
+        query (str): Selects the key and further columns, with the placeholder `{keys}` for the list of keys.
+        keys (list): The keys to look up.
+
+    Returns:
+        dict[str, tuple]: The further columns of each stored key.
+    """
+    stored = {}
+    for offset in range(0, len(keys), LOOKUP_CHUNK):
+        chunk = keys[offset:offset + LOOKUP_CHUNK]
+        for row in conn.execute(query.format(keys=', '.join('?' * len(chunk))), chunk):
+            stored[row[0]] = row[1:]
+    return stored
+
+def upsert_series(conn: sqlite3.Connection, records: list[tuple[tuple, list[tuple]]]) -> WriteResult:
+    """Upsert the given series with their patients, studies and instances without committing.
+
+    The stored patients, studies, series and instances of the whole batch are looked up in chunks, and only the new
+    and changed rows are written, with one `executemany` per table. An idempotent resend therefore only reads. Within
+    the batch, the last series sent with a patient, study, series or instance wins, as if they were written one by
+    one.
+
+    Args:
+        conn (Connection): The connection, in a transaction which is not committed.
+        records (list[tuple[tuple, list[tuple]]]): The row of each series (see `series_row`) together with the
+            parameters of `UPSERT_INSTANCE` for its instances.
+
+    Returns:
+        WriteResult: The number of changed series, the series instances were moved away from and the updated
+        patients and studies.
+    """
+    patients, studies, series, instances = {}, {}, {}, {}
+    for (series_instance_uid, patient_id, patient_name, study_instance_uid, instance_count, summary), rows in records:
+        patients[patient_id] = (patient_name,)
+        studies[study_instance_uid] = (patient_id,)
+        series[series_instance_uid] = (study_instance_uid, instance_count, summary)
+        instances.update(rows)
+
+    stored = fetch_stored(conn, 'SELECT PatientID, PatientName FROM patients WHERE PatientID IN ({keys})',
+                          list(patients))
+    changed_patients = {key for key, value in patients.items() if stored.get(key) != value}
+    conn.executemany(UPSERT_PATIENT, [(key, *patients[key]) for key in changed_patients])
+
+    stored = fetch_stored(conn, 'SELECT StudyInstanceUID, PatientID FROM studies WHERE StudyInstanceUID IN ({keys})',
+                          list(studies))
+    changed_studies = {key for key, value in studies.items() if stored.get(key) != value}
+    conn.executemany(UPSERT_STUDY, [(key, *studies[key]) for key in changed_studies])
+
+    # The series are written before their instances, whose triggers count them in the series
+    stored = fetch_stored(conn, 'SELECT SeriesInstanceUID, StudyInstanceUID, InstanceInSeries, Summary FROM series '
+                                'WHERE SeriesInstanceUID IN ({keys})', list(series))
+    changed_series = {key for key, value in series.items() if stored.get(key) != value}
+    conn.executemany(UPSERT_SERIES, [(key, *series[key]) for key in changed_series])
+
+    # New instances and instances sent with another series than they are stored with, in UID order so the writes
+    # into the instances table are local
+    stored = fetch_stored(conn, 'SELECT SOPInstanceUID, SeriesInstanceUID FROM instances '
+                                'WHERE SOPInstanceUID IN ({keys})', list(instances))
+    moved = sorted((uid, key) for uid, key in instances.items() if stored.get(uid) != (key,))
+    conn.executemany(UPSERT_INSTANCE, moved)
+    changed_series.update(key for _, key in moved)
+
+    # The series instances were moved away from, whose instance counts changed
+    previous_uids = list({stored[uid][0] for uid, _ in moved if uid in stored})
+    previous = fetch_stored(conn, 'SELECT series.SeriesInstanceUID, studies.PatientID, series.StudyInstanceUID '
+                                  'FROM series LEFT JOIN studies ON studies.StudyInstanceUID = series.StudyInstanceUID '
+                                  'WHERE series.SeriesInstanceUID IN ({keys})', previous_uids)
+
+    changed = sum(key in changed_series or study_instance_uid in changed_studies
+                  or studies[study_instance_uid][0] in changed_patients
+                  for key, (study_instance_uid, _, _) in series.items())
+    parents = {('patient', key) for key in changed_patients} | {('study', key) for key in changed_studies}
+    return WriteResult(changed, {(key, *value) for key, value in previous.items()}, parents)
+
+def store_series(conn: sqlite3.Connection, records: list[tuple[tuple, list[tuple]]]) -> WriteResult:
+    """Upsert the given series and their instances in one transaction. Runs in a thread of the connection pool.
+
+    Args:
+        conn (Connection): The pooled connection.
+        records (list[tuple[tuple, list[tuple]]]): The series and instance rows of each series, see `upsert_series`.
+
+    Returns:
+        WriteResult: The number of changed series and the series instances were moved away from.
+    """
+    # The write lock is taken before the stored rows are looked up, so they cannot change until the commit
+    conn.execute('BEGIN IMMEDIATE')
+    result = upsert_series(conn, records)
+    conn.commit()
+    return result
+
+async def write_series(records: list[tuple[tuple, list[tuple]]]) -> int:
+    """Upsert the given series, either directly through the pool or with the next group commit in write-behind mode.
+    Returns once the series are committed.
+
+    Args:
+        records (list[tuple[tuple, list[tuple]]]): The series and instance rows of each series, see `upsert_series`.
+
+    Returns:
+        int: The number of changed series.
+    """
+    SERIES_RECEIVED.inc(len(records))
+    start = time.perf_counter()
     try:
-        conn = sqlite3.connect('dicom_series.db')
-        cursor = conn.cursor()
-
-        # Check if the series with the given SeriesInstanceUID already exists
-        cursor.execute('SELECT * FROM series WHERE SeriesInstanceUID = ?', (data.SeriesInstanceUID,))
-        existing_series = cursor.fetchone()
-
-        if existing_series:
-            existing_instances = existing_series[4]  # InstanceInSeries
-            if data.InstanceInSeries != existing_instances:
-                 # Update the series information if the instance count has changed
-                cursor.execute('''
-                    UPDATE series
-                    SET PatientID = ?, PatientName = ?, StudyInstanceUID = ?, InstanceInSeries = ?
-                    WHERE SeriesInstanceUID = ?
-                ''', (data.PatientID, data.PatientName, data.StudyInstanceUID, data.InstanceInSeries, data.SeriesInstanceUID))
-                conn.commit()
-                message = f"Updated series {data.SeriesInstanceUID} with new instance count."
-            else:
-                message = f"Series {data.SeriesInstanceUID} already exists with the same instance count. No update needed."
+        if writer is not None:
+            changed, previous, parents = await asyncio.wrap_future(writer.submit(records, upsert_series))
         else:
-            # Insert the new series into the database if it doesn't exist
-            cursor.execute('''
-                INSERT INTO series (SeriesInstanceUID, PatientID, PatientName, StudyInstanceUID, InstanceInSeries)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (data.SeriesInstanceUID, data.PatientID, data.PatientName, data.StudyInstanceUID, data.InstanceInSeries))
-            conn.commit()
-            message = f"Inserted new series {data.SeriesInstanceUID}."
+            changed, previous, parents = await db.run(store_series, records)
+    finally:
+        DB_WRITE_SECONDS.observe(time.perf_counter() - start)
+
+    if changed and read_cache is not None:
+        # The series instances were moved away from changed as well, their instance count dropped
+        series = [(row[0], row[1], row[3]) for row, _ in records] + list(previous)
+        # Responses containing other series of an updated patient or study are stale as well, see `contained_tags`
+        read_cache.invalidate([tag for uid, patient, study in series for tag in series_tags(uid, patient, study)]
+                              + list(parents))
+    return changed
 
-        conn.close()
+async def read_body(request: Request) -> object:
+    """Decode the body of a request by its `Content-Type` (JSON or msgpack) and `Content-Encoding` (gzip, zstd).
 
+    Raises:
+        HTTPException: 413 if the body is larger than `MAX_BODY_BYTES` (before or after decompression), 415 if the
+            content type or encoding is not supported, 422 if the body cannot be decoded.
+    """
+    content_length = request.headers.get('content-length', '')
+    if content_length.isdigit() and int(content_length) > MAX_BODY_BYTES:
+        raise HTTPException(status_code=413, detail=f"Body larger than {MAX_BODY_BYTES} bytes")
+    body = await request.body()
+    try:
+        return payload.decode(body, request.headers.get('content-type'), request.headers.get('content-encoding'),
+                              MAX_BODY_BYTES)
+    except payload.UnsupportedFormat as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except payload.PayloadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+def request_body_schema(model: type[BaseModel]) -> dict:
+    """Return the OpenAPI request body of an endpoint reading its body with `read_body`, for `openapi_extra`.
+
+    The JSON schema of the model is the same for all content types; the definitions of nested models are inlined,
+    as references are resolved against the whole OpenAPI document.
+    """
+    schema = model.model_json_schema()
+    definitions = schema.pop('$defs', {})
+
+    def inline(node):
+        if isinstance(node, dict):
+            if '$ref' in node:
+                return inline(definitions[node['$ref'].rsplit('/', 1)[-1]])
+            return {key: inline(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [inline(value) for value in node]
+        return node
+
+    schema = inline(schema)
+    return {'requestBody': {'required': True,
+                            'content': {content_type: {'schema': schema} for content_type in payload.CONTENT_TYPES}}}
+
+def decode_records(batch: list) -> list[tuple[tuple, list[tuple]]]:
+    """Return the records of the given series, see `upsert_series`.
+
+    Raises:
+        HTTPException: 422 if a series is not valid.
+    """
+    try:
+        return [series_record(series) for series in batch]
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.post("/series", openapi_extra=request_body_schema(SeriesData))
+async def receive_series(request: Request):
+    """Endpoint to receive DICOM series data and store it in the database. The body is a series object as JSON or
+    msgpack, validated (and coerced) with the `SeriesData` model.
+    """
+    try:
+        data = SeriesData.model_validate(await read_body(request))
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
+    records = decode_records([data.model_dump()])
+    series_instance_uid = records[0][0][0]
+    try:
+        changed = await write_series(records)
+
+        if changed:
+            message = f"Stored series {series_instance_uid}."
+        else:
+            message = f"Series {series_instance_uid} already exists with the same instances. No update needed."
         return {"status": "success", "message": message}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to store data: {e}")
+
+@app.post("/series/batch")
+async def receive_series_batch(request: Request):
+    """Endpoint to receive the data of several DICOM series and store them in the database in one transaction. The
+    body is a list of series objects as JSON or msgpack, large batches are best sent as gzip compressed msgpack.
+    """
+    batch = await read_body(request)
+    if not isinstance(batch, list):
+        raise HTTPException(status_code=422, detail="The batch is not a list")
+    records = decode_records(batch)
+    try:
+        changed = await write_series(records)
+
+        return {"status": "success", "message": f"Stored {changed} of {len(batch)} series."}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to store data: {e}")
+
+SERIES_COLUMNS = ('SeriesInstanceUID', 'PatientID', 'PatientName', 'StudyInstanceUID', 'InstanceInSeries', 'Summary',
+                  'StoredInstances')
+# The series with their patient, joined through the study
+SELECT_SERIES = '''
+    SELECT series.SeriesInstanceUID, studies.PatientID, patients.PatientName, series.StudyInstanceUID,
+        series.InstanceInSeries, series.Summary, series.StoredInstances
+    FROM series
+    LEFT JOIN studies ON studies.StudyInstanceUID = series.StudyInstanceUID
+    LEFT JOIN patients ON patients.PatientID = studies.PatientID
+'''
+# Qualified columns of `SELECT_SERIES` the listings are filtered by
+FILTER_COLUMNS = {'PatientID': 'studies.PatientID', 'StudyInstanceUID': 'series.StudyInstanceUID'}
+# Maximum number of series and of instances returned in one page
+MAX_PAGE_SIZE = 1000
+MAX_INSTANCE_PAGE_SIZE = 10000
+
+def series_dict(row: tuple) -> dict:
+    """Return a row of `SELECT_SERIES` as dictionary. The summary and the number of stored instances are only included
+    if the series has a summary and instances were sent with it.
+    """
+    series = dict(zip(SERIES_COLUMNS, row))
+    summary = series.pop('Summary')
+    if summary is not None:
+        series['Summary'] = json.loads(summary)
+    if not series['StoredInstances']:
+        del series['StoredInstances']
+    return series
+
+def fetch_series(conn: sqlite3.Connection, series_instance_uid: str) -> dict | None:
+    """Return the series with the given UID. Runs in a thread of the connection pool."""
+    row = conn.execute(f"{SELECT_SERIES} WHERE series.SeriesInstanceUID = ?", (series_instance_uid,)).fetchone()
+    return series_dict(row) if row else None
+
+def fetch_series_page(conn: sqlite3.Connection, column: str | None, value: str | None, after: str,
+                      limit: int) -> list[tuple]:
+    """Return one page of series ordered by their UID, optionally filtered by a column. Runs in a thread of the
+    connection pool.
+
+    Args:
+        conn (Connection): The pooled connection.
+        column (str | None): The column to filter by, `PatientID` or `StudyInstanceUID`, or `None` for all series.
+        value (str | None): The value of the filter column.
+        after (str): Only series with a greater UID are returned (keyset pagination).
+        limit (int): The maximum number of series.
+
+    Returns:
+        list[tuple]: The rows of the page.
+    """
+    if column is None:
+        query = f"{SELECT_SERIES} WHERE series.SeriesInstanceUID > ? ORDER BY series.SeriesInstanceUID LIMIT ?"
+        params = (after, limit)
+    else:
+        query = (f"{SELECT_SERIES} WHERE {FILTER_COLUMNS[column]} = ? AND series.SeriesInstanceUID > ? "
+                 "ORDER BY series.SeriesInstanceUID LIMIT ?")
+        params = (value, after, limit)
+    return conn.execute(query, params).fetchall()
+
+def series_tags(series_instance_uid: str, patient_id: str, study_instance_uid: str) -> tuple:
+    """Return the tags of the cached responses which contain a series or would contain it after an upsert: the
+    series itself, and the listings of all series, of its patient and of its study. A series which was moved to
+    another patient or study is removed from the listings of the old one by its own tag.
+
+    Cached responses are also tagged with the patient and study of each series they contain (`contained_tags`), so
+    they are invalidated when the patient name changes or the study is moved to another patient.
+    """
+    return (('series', series_instance_uid), ('PatientID', patient_id), ('StudyInstanceUID', study_instance_uid),
+            ('all', None))
+
+def contained_tags(series: dict) -> tuple:
+    """Return the tags of a cached response containing the given series, see `series_tags`."""
+    return (('series', series['SeriesInstanceUID']), ('patient', series['PatientID']),
+            ('study', series['StudyInstanceUID']))
+
+class CachedBody(NamedTuple):
+    """A response body of a read endpoint with its entity tag and further headers, as kept in the read cache."""
+    body: bytes
+    etag: str
+    headers: dict
+
+async def read_cached(key: tuple, load: Callable[[], Awaitable[tuple[bytes, dict, tuple] | None]]) -> CachedBody | None:
+    """Return a response body from the read cache, or load it and cache it.
+
+    Args:
+        key (tuple): The cache key.
+        load (Callable): Loads the body, its headers and the tags of the data it contains, or `None` if not found.
+
+    Returns:
+        CachedBody | None: The body, or `None` if not found.
+    """
+    if read_cache is not None:
+        cached = read_cache.get(key)
+        if cached is not None:
+            READ_CACHE_HITS.inc()
+            return cached
+        READ_CACHE_MISSES.inc()
+        version = read_cache.version
+
+    loaded = await load()
+    if loaded is None:
+        return None
+    body, headers, tags = loaded
+    cached = CachedBody(body, f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"', headers)
+    if read_cache is not None:
+        read_cache.put(key, cached, tags, version)
+    return cached
+
+def cached_response(request: Request, cached: CachedBody, media_type: str) -> Response:
+    """Return a cached body as response, or 304 Not Modified if the client has it already (`If-None-Match`)."""
+    headers = dict(cached.headers, ETag=cached.etag)
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+        if cached.etag in tags or '*' in tags:
+            NOT_MODIFIED.inc()
+            return Response(status_code=304, headers=headers)
+    return Response(cached.body, media_type=media_type, headers=headers)
+
+async def series_page_response(request: Request, column: str | None, value: str | None, after: str,
+                               limit: int) -> Response:
+    """Return one page of series as NDJSON, one series per line.
+    If there may be further series, the `X-Next-After` header holds the value of `after` for the next page.
+    """
+    async def load() -> tuple[bytes, dict, tuple]:
+        rows = await db.run(fetch_series_page, column, value, after, limit)
+        headers = {'X-Next-After': rows[-1][0]} if len(rows) == limit else {}
+        series = [series_dict(row) for row in rows]
+        body = ''.join(json.dumps(item) + '\n' for item in series).encode()
+        # The page changes if one of its series or a series of the listing changes
+        tags = ((column or 'all', value),) + tuple({tag for item in series for tag in contained_tags(item)})
+        return body, headers, tags
+
+    cached = await read_cached(('page', column, value, after, limit), load)
+    return cached_response(request, cached, 'application/x-ndjson')
+
+def fetch_instance_page(conn: sqlite3.Connection, series_instance_uid: str, after: str, limit: int) -> list[str]:
+    """Return one page of the SOP Instance UIDs of a series in UID order. Runs in a thread of the connection pool."""
+    rows = conn.execute('SELECT SOPInstanceUID FROM instances WHERE SeriesInstanceUID = ? AND SOPInstanceUID > ? '
+                        'ORDER BY SOPInstanceUID LIMIT ?', (series_instance_uid, after, limit)).fetchall()
+    return [row[0] for row in rows]
+
+@app.get("/series/{series_instance_uid}")
+async def get_series(series_instance_uid: str, request: Request):
+    """Endpoint to look up a DICOM series by its Series Instance UID. Supports `If-None-Match`."""
+    async def load() -> tuple[bytes, dict, tuple] | None:
+        series = await db.run(fetch_series, series_instance_uid)
+        if series is None:
+            return None
+        return json.dumps(series).encode(), {}, contained_tags(series)
+
+    cached = await read_cached(('series', series_instance_uid), load)
+    if cached is None:
+        raise HTTPException(status_code=404, detail=f"Series {series_instance_uid} not found")
+    return cached_response(request, cached, 'application/json')
+
+@app.get("/series/{series_instance_uid}/instances")
+async def list_instances(series_instance_uid: str, after: str = '',
+                         limit: int = Query(1000, ge=1, le=MAX_INSTANCE_PAGE_SIZE)):
+    """Endpoint to list the SOP Instance UIDs stored for a series as NDJSON ordered by SOP Instance UID."""
+    uids = await db.run(fetch_instance_page, series_instance_uid, after, limit)
+    headers = {'X-Next-After': uids[-1]} if len(uids) == limit else {}
+
+    def lines():
+        for uid in uids:
+            yield json.dumps({'SOPInstanceUID': uid}) + '\n'
+
+    return StreamingResponse(lines(), media_type='application/x-ndjson', headers=headers)
+
+@app.get("/series")
+async def list_series(request: Request, PatientID: str | None = None, after: str = '',
+                      limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE)):
+    """Endpoint to list the DICOM series, optionally of one patient, as NDJSON ordered by Series Instance UID.
+    Supports `If-None-Match`.
+    """
+    return await series_page_response(request, 'PatientID' if PatientID is not None else None, PatientID, after,
+                                      limit)
+
+@app.get("/studies/{study_instance_uid}/series")
+async def list_study_series(study_instance_uid: str, request: Request, after: str = '',
+                            limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE)):
+    """Endpoint to list the DICOM series of a study as NDJSON ordered by Series Instance UID. Supports
+    `If-None-Match`.
+    """
+    return await series_page_response(request, 'StudyInstanceUID', study_instance_uid, after, limit)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Endpoint to scrape the metrics of the server in the Prometheus text format."""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
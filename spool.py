@@ -0,0 +1,115 @@
+import sqlite3
+import time
+from concurrent.futures import Future
+from typing import Iterator
+from pydicom import Dataset
+from database import ConnectionPool, GroupCommitWriter
+
+# Header fields of an instance kept in the spool, enough to rebuild the series collectors
+SPOOL_COLUMNS = ('SOPInstanceUID', 'SeriesInstanceUID', 'PatientID', 'PatientName', 'StudyInstanceUID')
+
+INSERT_INSTANCE = '''
+    INSERT OR REPLACE INTO instances (SOPInstanceUID, SeriesInstanceUID, PatientID, PatientName, StudyInstanceUID,
+                                      CallingAE, ReceivedTime)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+DELETE_INSTANCE = 'DELETE FROM instances WHERE SOPInstanceUID = ?'
+
+
+class InstanceSpool():
+    """Crash-safe journal of the received instances of the client, kept in a local SQLite database.
+
+    Every instance accepted by the SCP is appended before the C-STORE is acknowledged; the appends of concurrent
+    associations are committed together by a single writer thread (group commit), so the journal is written
+    sequentially and synced once per batch. Once the server acknowledged a series, the instances sent with it are
+    removed (compaction); instances of the series received while it was sent stay until it is sent again. On startup
+    the instances of all series which were not acknowledged are replayed into the dispatcher, so neither a restart in
+    the middle of a series nor a failed POST loses data.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 0.002, max_records: int = 500) -> None:
+        """Initialize the spool. The database is not touched until `open()` is called.
+
+        Args:
+            path (str): Path of the spool database.
+            flush_interval (float): Maximum time in seconds an append waits for further appends before it is synced.
+            max_records (int): Number of pending appends which triggers a sync immediately.
+        """
+        self.path = path
+        self.pool = ConnectionPool(path, size=1, synchronous='FULL')
+        self.writer = GroupCommitWriter(self.pool, INSERT_INSTANCE, flush_interval, max_records)
+        self.opened = False
+
+    def open(self) -> None:
+        """Create the spool database and its table if they do not exist yet. Does nothing if the spool is open.
+        """
+        if self.opened:
+            return
+
+        conn = self.pool.connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS instances (
+                SOPInstanceUID TEXT PRIMARY KEY,
+                SeriesInstanceUID TEXT,
+                PatientID TEXT,
+                PatientName TEXT,
+                StudyInstanceUID TEXT,
+                CallingAE TEXT,
+                ReceivedTime REAL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_instances_series ON instances (SeriesInstanceUID)')
+        conn.commit()
+        conn.close()
+        self.opened = True
+
+    def append(self, dataset: Dataset, calling_ae: str = '') -> Future:
+        """Append a received instance to the spool.
+
+        Args:
+            dataset (Dataset): The received dataset.
+            calling_ae (str): The AE title of the sender.
+
+        Returns:
+            Future: Resolves once the instance is synced to disk.
+        """
+        row = tuple(str(dataset.get(keyword, '')) for keyword in SPOOL_COLUMNS) + (calling_ae, time.time())
+        return self.writer.submit([row])
+
+    def acknowledge(self, sop_instance_uids: list[str]) -> Future:
+        """Remove instances which have been stored by the server with their series.
+
+        Only the instances which were sent are removed, not the whole series: an instance arriving while its series
+        is sent (a reopened series) must stay spooled until the series is sent again.
+
+        Args:
+            sop_instance_uids (list[str]): The SOP Instance UIDs of the instances sent with the acknowledged series.
+
+        Returns:
+            Future: Resolves to the number of removed instances.
+        """
+        return self.writer.submit([(str(uid),) for uid in sop_instance_uids], DELETE_INSTANCE)
+
+    def replay(self) -> Iterator[tuple[Dataset, str]]:
+        """Yield the spooled instances of all series which have not been acknowledged, in the order of arrival.
+
+        Yields:
+            tuple[Dataset, str]: A dataset with the spooled header fields and the calling AE title.
+        """
+        conn = sqlite3.connect(self.path)
+        try:
+            cursor = conn.execute(f"SELECT {', '.join(SPOOL_COLUMNS)}, CallingAE FROM instances "
+                                  "ORDER BY ReceivedTime, rowid")
+            for row in cursor:
+                dataset = Dataset()
+                for keyword, value in zip(SPOOL_COLUMNS, row):
+                    setattr(dataset, keyword, value)
+                yield dataset, row[-1]
+        finally:
+            conn.close()
+
+    def close(self) -> None:
+        """Sync all pending changes and close the spool."""
+        self.writer.close()
+        self.pool.close()
@@ -1,7 +1,23 @@
+import asyncio
+import copy
+import io
+import os
+import tempfile
+import threading
 import unittest
-from unittest.mock import patch, AsyncMock
-from pydicom.dataset import Dataset
-from client import SeriesCollector, SeriesDispatcher
+from unittest.mock import patch, AsyncMock, MagicMock
+from pydicom import dcmread, dcmwrite
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import CTImageStorage, ExplicitVRLittleEndian, MRImageStorage
+from pynetdicom import AE
+from concurrent.futures import Future, ThreadPoolExecutor
+import client
+from client import CompactSeriesCollector, SeriesCollector, SeriesDispatcher
+from extractors import ExtractorPipeline, InstanceUIDExtractor
+from scp import BACKPRESSURE_REJECT, STATUS_CANNOT_UNDERSTAND, STATUS_OUT_OF_RESOURCES
+from spool import InstanceSpool
+from uid_codec import encode_uids
+import payload
 import time
 
 
@@ -42,6 +58,40 @@ class TestSeriesCollector(unittest.TestCase):
         self.assertEqual(len(collector.series), 2)  # No new instance added
 
 
+class TestCompactSeriesCollector(unittest.TestCase):
+
+    def setUp(self):
+        """Create mock dataset for testing."""
+        self.dataset1 = Dataset()
+        self.dataset1.PatientID = '12345'
+        self.dataset1.PatientName = 'Hanwool Park'
+        self.dataset1.StudyInstanceUID = '1.2.3'
+        self.dataset1.SeriesInstanceUID = '4.5.6'
+        self.dataset1.SOPInstanceUID = '1.1.1'
+
+    def test_add_instance(self):
+        """Test that a compact series collector records only the header and the SOP Instance UIDs."""
+        collector = CompactSeriesCollector(self.dataset1)
+        self.assertEqual(collector.series_instance_uid, '4.5.6')
+        self.assertEqual(collector.header, ('12345', 'Hanwool Park', '1.2.3'))
+
+        dataset2 = Dataset()
+        dataset2.SeriesInstanceUID = '4.5.6'
+        dataset2.SOPInstanceUID = '1.1.2'
+        self.assertTrue(collector.add_instance(dataset2))
+
+        dataset3 = Dataset()
+        dataset3.SeriesInstanceUID = '1.2.840.10008.1.1'
+        dataset3.SOPInstanceUID = '1.1.3'
+        self.assertFalse(collector.add_instance(dataset3))
+
+        self.assertEqual(collector.instance_count, 2)
+        self.assertEqual(collector.sop_instance_uids, ['1.1.1', '1.1.2'])
+        # The UIDs are only kept once, by the geometry of the series
+        self.assertIs(collector.sop_instance_uids, collector.geometry.sop_instance_uids)
+        self.assertFalse(hasattr(collector, '__dict__'))
+
+
 class TestSeriesDispatcher(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self):
@@ -56,6 +106,260 @@ class TestSeriesDispatcher(unittest.IsolatedAsyncioTestCase):
         self.dataset1.SeriesInstanceUID = '4.5.6'
         self.dataset1.SOPInstanceUID = '1.1.1'
 
+    async def asyncTearDown(self):
+        """Stop the dispatcher, which closes the port of the SCP if a test started it."""
+        await self.dispatcher.stop()
+
+    async def test_main_collects_datasets_from_scp(self):
+        """Test that datasets received by the SCP handler thread are collected by the running main loop."""
+        main_task = asyncio.create_task(self.dispatcher.main())
+        await asyncio.sleep(0)
+
+        event = MagicMock()
+        event.dataset = self.dataset1
+        event.file_meta = Dataset()
+        event.request.DataSet = io.BytesIO(b'\x00' * 16)
+        handler = threading.Thread(target=self.dispatcher.modality_scp.handle_store, args=(event,))
+        handler.start()
+        handler.join()
+
+        for _ in range(100):
+            if self.dataset1.SeriesInstanceUID in self.dispatcher.series_collectors:
+                break
+            await asyncio.sleep(0.01)
+
+        main_task.cancel()
+        self.assertIn(self.dataset1.SeriesInstanceUID, self.dispatcher.series_collectors)
+        self.assertEqual(self.dispatcher.modality_scp.stats.queue_depth, 0)
+        self.assertEqual(self.dispatcher.modality_scp.stats.queued_bytes, 0)
+
+    async def test_parallel_associations_collected_by_series(self):
+        """Test that CT and MR series sent over concurrent associations are collected per series."""
+        self.dispatcher.start()
+        main_task = asyncio.create_task(self.dispatcher.main())
+
+        def send(sop_class, series_uid):
+            ae = AE(ae_title='TESTSCU')
+            ae.add_requested_context(sop_class, ExplicitVRLittleEndian)
+            assoc = ae.associate('127.0.0.1', 6667)
+            self.assertTrue(assoc.is_established)
+            for index in range(3):
+                dataset = copy.deepcopy(self.dataset1)
+                dataset.SOPClassUID = sop_class
+                dataset.SeriesInstanceUID = series_uid
+                dataset.SOPInstanceUID = f'{series_uid}.{index}'
+                dataset.file_meta = FileMetaDataset()
+                dataset.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+                self.assertEqual(assoc.send_c_store(dataset).Status, 0x0000)
+            assoc.release()
+
+        await asyncio.gather(asyncio.to_thread(send, CTImageStorage, '4.5.7'),
+                             asyncio.to_thread(send, MRImageStorage, '4.5.8'))
+        for _ in range(100):
+            collectors = self.dispatcher.series_collectors
+            if all(uid in collectors and collectors[uid].instance_count == 3 for uid in ('4.5.7', '4.5.8')):
+                break
+            await asyncio.sleep(0.01)
+
+        main_task.cancel()
+        self.assertEqual(self.dispatcher.series_collectors['4.5.7'].instance_count, 3)
+        self.assertEqual(self.dispatcher.series_collectors['4.5.8'].instance_count, 3)
+
+    async def test_release_shortens_wait_of_series(self):
+        """Test that the release of an association routed through the shards shortens the wait of its series."""
+        shards = [asyncio.Queue() for _ in range(self.dispatcher.num_shards)]
+        tasks = [asyncio.create_task(self.dispatcher.run_shard(shard)) for shard in shards]
+
+        async def collect(dataset):
+            self.dispatcher.route(shards, dataset, ('TESTSCU', 7))
+            while any(not shard.empty() for shard in shards):
+                await asyncio.sleep(0)
+            await asyncio.sleep(0)
+
+        try:
+            for index in range(3):
+                dataset = copy.deepcopy(self.dataset1)
+                dataset.SOPInstanceUID = f'1.1.{index}'
+                await collect(dataset)
+            completion = self.dispatcher.completion
+            self.assertEqual(self.dispatcher.series_collectors['4.5.6'].instance_count, 3)
+            self.assertGreater(completion.next_deadline() - time.time(), completion.release_grace)
+
+            await collect(None)
+            self.assertLessEqual(completion.next_deadline() - time.time(), completion.release_grace)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def test_start_stop(self):
+        """Test that the SCP only listens between `start()` and `stop()`, and that the dispatcher can be restarted."""
+        def associate():
+            ae = AE(ae_title='TESTSCU')
+            ae.add_requested_context(MRImageStorage, ExplicitVRLittleEndian)
+            assoc = ae.associate('127.0.0.1', 6667)
+            established = assoc.is_established
+            if established:
+                assoc.release()
+            return established
+
+        self.assertIsNone(self.dispatcher.modality_scp.scp)
+        for _ in range(2):
+            self.dispatcher.start()
+            self.dispatcher.start()
+            self.assertTrue(await asyncio.to_thread(associate))
+            await self.dispatcher.stop()
+            self.assertIsNone(self.dispatcher.modality_scp.scp)
+            self.assertFalse(await asyncio.to_thread(associate))
+
+    async def test_metrics_served_on_loopback(self):
+        """Test that the metrics are only served on the loopback interface unless another address is given."""
+        self.dispatcher = SeriesDispatcher(metrics_port=0)
+        self.dispatcher.start()
+        self.assertEqual(self.dispatcher.metrics_server.server_address[0], '127.0.0.1')
+        await self.dispatcher.stop()
+
+        self.dispatcher = SeriesDispatcher(metrics_port=0, metrics_address='')
+        self.dispatcher.start()
+        self.assertEqual(self.dispatcher.metrics_server.server_address[0], '0.0.0.0')
+
+    def test_shard_index_stable(self):
+        """Test that a series is always collected by the same shard."""
+        index = self.dispatcher.shard_index('4.5.6')
+        self.assertEqual(index, self.dispatcher.shard_index('4.5.6'))
+        self.assertIn(index, range(self.dispatcher.num_shards))
+
+    def test_store_refused_when_queue_full(self):
+        """Test that the SCP answers with 'Out of Resources' once the queue bound is reached."""
+        scp = self.dispatcher.modality_scp
+        scp.max_queued_instances = 1
+        scp.backpressure = BACKPRESSURE_REJECT
+
+        event = MagicMock()
+        event.dataset = self.dataset1
+        event.file_meta = Dataset()
+        event.request.DataSet = io.BytesIO(b'\x00' * 16)
+
+        self.assertEqual(scp.handle_store(event), 0x0000)
+        self.assertEqual(scp.handle_store(event), STATUS_OUT_OF_RESOURCES)
+        self.assertEqual(scp.stats.rejected, 1)
+        self.assertEqual(scp.stats.queue_depth, 1)
+        self.assertEqual(scp.stats.queued_bytes, 16)
+
+    async def test_blocked_store_accepted_after_consumption(self):
+        """Test that a blocked C-STORE is accepted as soon as the consumer takes a dataset from the queue."""
+        scp = self.dispatcher.modality_scp
+        scp.max_queued_instances = 1
+        scp.attach_loop(asyncio.get_running_loop())
+
+        event = MagicMock()
+        event.dataset = self.dataset1
+        event.file_meta = Dataset()
+        event.request.DataSet = io.BytesIO(b'\x00' * 16)
+        self.assertEqual(scp.handle_store(event), 0x0000)
+
+        statuses = []
+        handler = threading.Thread(target=lambda: statuses.append(scp.handle_store(event)))
+        handler.start()
+        await asyncio.sleep(0.05)
+        self.assertEqual(statuses, [])
+
+        await scp.get()
+        while handler.is_alive():
+            await asyncio.sleep(0.01)
+        self.assertEqual(statuses, [0x0000])
+
+    def test_store_without_pixel_data(self):
+        """Test that the SCP can drop the pixel data of queued datasets and write the instance to disk instead."""
+        with tempfile.TemporaryDirectory() as store_dir:
+            self.dispatcher = SeriesDispatcher(compact=True, store_dir=store_dir)
+            scp = self.dispatcher.modality_scp
+
+            dataset = copy.deepcopy(self.dataset1)
+            dataset.SOPClassUID = MRImageStorage
+            dataset.BitsAllocated = 8
+            dataset.PixelData = b'\x00' * 64
+            dataset.ImageComments = 'not parsed'
+            # The SCP receives the encoded dataset without file meta information
+            buffer = io.BytesIO()
+            dcmwrite(buffer, dataset, implicit_vr=False, little_endian=True)
+
+            event = MagicMock()
+            event.request.DataSet = buffer
+            event.context.transfer_syntax = ExplicitVRLittleEndian
+            event.file_meta = FileMetaDataset()
+            event.file_meta.MediaStorageSOPClassUID = MRImageStorage
+            event.file_meta.MediaStorageSOPInstanceUID = dataset.SOPInstanceUID
+            event.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+            event.assoc.requestor.ae_title = 'TESTSCU'
+            self.assertEqual(scp.handle_store(event), 0x0000)
+
+            queued, _, _ = scp._pending[0]
+            self.assertEqual(queued.SOPInstanceUID, '1.1.1')
+            self.assertEqual(queued.PatientName, 'Hanwool Park')
+            self.assertNotIn('PixelData', queued)
+            self.assertNotIn('ImageComments', queued)
+
+            stored = dcmread(os.path.join(store_dir, '1.1.1.dcm'))
+            self.assertEqual(stored.PixelData, b'\x00' * 64)
+
+    def test_store_dir_only_valid_accepted_instances(self):
+        """Test that instances are only written if accepted, and never with a file name from an invalid UID."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store_dir = os.path.join(tmp_dir, 'store')
+            self.dispatcher = SeriesDispatcher(store_dir=store_dir)
+            self.dispatcher.start()
+            scp = self.dispatcher.modality_scp
+            scp.max_queued_instances = 1
+            scp.backpressure = BACKPRESSURE_REJECT
+
+            def event_for(sop_instance_uid):
+                dataset = copy.deepcopy(self.dataset1)
+                dataset.SOPInstanceUID = sop_instance_uid
+                event = MagicMock()
+                event.dataset = dataset
+                event.file_meta = FileMetaDataset()
+                event.file_meta.MediaStorageSOPClassUID = MRImageStorage
+                event.file_meta.MediaStorageSOPInstanceUID = sop_instance_uid
+                event.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+                event.request.DataSet = io.BytesIO(b'\x00' * 16)
+                return event
+
+            with self.assertWarns(UserWarning):
+                # pydicom warns about the invalid UID, but keeps it as received
+                event = event_for('../1.1.1')
+            self.assertEqual(scp.handle_store(event), STATUS_CANNOT_UNDERSTAND)
+            self.assertEqual(scp.handle_store(event_for('1.1.1')), 0x0000)
+            self.assertEqual(scp.handle_store(event_for('1.1.2')), STATUS_OUT_OF_RESOURCES)
+            self.assertEqual(os.listdir(tmp_dir), ['store'])
+            self.assertEqual(os.listdir(store_dir), ['1.1.1.dcm'])
+            with self.assertRaises(ValueError):
+                scp.instance_path('1.1/../../x')
+
+    def test_store_refused_when_spool_stalls(self):
+        """Test that an instance is refused and its file removed if the spool does not persist it in time."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store_dir = os.path.join(tmp_dir, 'store')
+            self.dispatcher = SeriesDispatcher(store_dir=store_dir, spool_path=os.path.join(tmp_dir, 'spool.db'),
+                                               scp_options={'block_timeout': 0.05})
+            self.assertEqual(os.listdir(tmp_dir), [])
+            self.dispatcher.start()
+            self.assertEqual(sorted(os.listdir(tmp_dir)), ['spool.db', 'store'])
+            scp = self.dispatcher.modality_scp
+            stalled = Future()
+            event = MagicMock()
+            event.dataset = self.dataset1
+            event.file_meta = FileMetaDataset()
+            event.file_meta.MediaStorageSOPClassUID = MRImageStorage
+            event.file_meta.MediaStorageSOPInstanceUID = '1.1.1'
+            event.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+            event.request.DataSet = io.BytesIO(b'\x00' * 16)
+
+            with patch.object(self.dispatcher.spool, 'append', return_value=stalled):
+                self.assertEqual(scp.handle_store(event), STATUS_OUT_OF_RESOURCES)
+            self.assertTrue(stalled.cancelled())
+            self.assertEqual(os.listdir(store_dir), [])
+            self.assertEqual(scp.stats.queue_depth, 0)
+
     @patch('client.aiohttp.ClientSession.post')
     async def test_dispatch_series_collector(self, mock_post):
         """Test that series is dispatched correctly after timeout."""
@@ -67,19 +371,20 @@ class TestSeriesDispatcher(unittest.IsolatedAsyncioTestCase):
             return_value={"message": "Test message from server"}
         )
 
+        dispatched = client.SERIES_DISPATCHED.value
+        posted = client.POST_SECONDS.count
+
         # Add dataset to the dispatcher
         await self.dispatcher.run_series_collectors(self.dataset1)
 
-        # Simulate the passage of time to exceed the maximum wait time
-        series_uid = self.dataset1.SeriesInstanceUID
-        self.dispatcher.series_collectors[series_uid].last_update_time = time.time(
-        ) - 2
-
-        await self.dispatcher.dispatch_series_collector()
+        # Simulate the passage of time to exceed the wait time
+        await self.dispatcher.dispatch_series_collector(now=time.time() + 2)
 
         # Check that the dispatch was called and data was sent
         self.assertTrue(mock_post.called)
         self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(client.SERIES_DISPATCHED.value, dispatched + 1)
+        self.assertEqual(client.POST_SECONDS.count, posted + 1)
 
         # Validate that the correct message was returned from the mocked server
         response_data = await mock_post.return_value.__aenter__.return_value.json()
@@ -104,7 +409,9 @@ class TestSeriesDispatcher(unittest.IsolatedAsyncioTestCase):
             'PatientName': 'Hanwool Park',
             'StudyInstanceUID': '1.2.3',
             'SeriesInstanceUID': '4.5.6',
-            'InstanceInSeries': 1
+            'InstanceInSeries': 1,
+            'EncodedSOPInstanceUIDs': encode_uids(['1.1.1']),
+            'Summary': {'DuplicateSOPInstanceUIDs': 0}
         }
 
         # Ensure the correct data was sent
@@ -116,6 +423,158 @@ class TestSeriesDispatcher(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(response_data.get('message'),
                          'Test message from server')
 
+    @patch('client.aiohttp.ClientSession.post')
+    async def test_send_data_with_extractor_summary(self, mock_post):
+        """Test that the summary of the extractor pipeline, computed from the stored instance files, is sent."""
+        mock_post.return_value.__aenter__.return_value.status = 200
+        mock_post.return_value.__aenter__.return_value.json = AsyncMock(return_value={"message": "ok"})
+
+        with tempfile.TemporaryDirectory() as tmp_dir, ThreadPoolExecutor() as executor:
+            await self.dispatcher.stop()
+            pipeline = ExtractorPipeline([InstanceUIDExtractor], executor=executor)
+            self.dispatcher = SeriesDispatcher(store_dir=tmp_dir, extractors=pipeline)
+
+            dataset = copy.deepcopy(self.dataset1)
+            dataset.SOPClassUID = MRImageStorage
+            dataset.file_meta = FileMetaDataset()
+            dataset.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+            dcmwrite(self.dispatcher.modality_scp.instance_path('1.1.1'), dataset, enforce_file_format=True)
+
+            await self.dispatcher.extract_and_send_series_info(SeriesCollector(dataset))
+
+        sent = mock_post.call_args.kwargs['json']
+        self.assertEqual(sent['Summary'], {'DuplicateSOPInstanceUIDs': 0, 'SOPInstanceUIDs': ['1.1.1']})
+
+    @patch('client.aiohttp.ClientSession.post')
+    async def test_series_sent_if_extractors_fail(self, mock_post):
+        """Test that a series whose instance files cannot be read is still sent, with the geometry summary."""
+        mock_post.return_value.__aenter__.return_value.status = 200
+        mock_post.return_value.__aenter__.return_value.json = AsyncMock(return_value={"message": "ok"})
+
+        with tempfile.TemporaryDirectory() as tmp_dir, ThreadPoolExecutor() as executor:
+            await self.dispatcher.stop()
+            pipeline = ExtractorPipeline([InstanceUIDExtractor], executor=executor)
+            self.dispatcher = SeriesDispatcher(store_dir=tmp_dir, extractors=pipeline)
+
+            with self.assertLogs('client', level='ERROR'):
+                # The instance file was never written
+                await self.dispatcher.extract_and_send_series_info(SeriesCollector(self.dataset1))
+
+        sent = mock_post.call_args.kwargs['json']
+        self.assertEqual(sent['SeriesInstanceUID'], '4.5.6')
+        self.assertEqual(sent['Summary'], {'DuplicateSOPInstanceUIDs': 0})
+
+    def test_extractors_require_store_dir(self):
+        with self.assertRaises(ValueError):
+            SeriesDispatcher(extractors=ExtractorPipeline())
+
+    @patch('client.aiohttp.ClientSession.post')
+    async def test_batch_series_sent_in_one_request(self, mock_post):
+        """Test that series dispatched within the batch window are sent in one request to the batch endpoint."""
+        mock_post.return_value.__aenter__.return_value.status = 200
+        mock_post.return_value.__aenter__.return_value.json = AsyncMock(
+            return_value={"message": "Test message from server"}
+        )
+        self.dispatcher.batch_window = 0.05
+
+        dataset2 = copy.deepcopy(self.dataset1)
+        dataset2.SeriesInstanceUID = '4.5.7'
+        await self.dispatcher.extract_and_send_series_info(SeriesCollector(self.dataset1))
+        await self.dispatcher.extract_and_send_series_info(SeriesCollector(dataset2))
+        self.assertFalse(mock_post.called)
+
+        await asyncio.sleep(0.1)
+        mock_post.assert_called_once()
+        url = mock_post.call_args.args[0]
+        batch = mock_post.call_args.kwargs['json']
+        self.assertEqual(url, 'http://localhost:8000/series/batch')
+        self.assertEqual([data['SeriesInstanceUID'] for data in batch], ['4.5.6', '4.5.7'])
+
+    @patch('client.aiohttp.ClientSession.post')
+    async def test_batch_sent_as_compressed_msgpack(self, mock_post):
+        """Test that with the msgpack content type a large batch is sent encoded and gzip compressed."""
+        mock_post.return_value.__aenter__.return_value.status = 200
+        mock_post.return_value.__aenter__.return_value.json = AsyncMock(return_value={"message": "ok"})
+        self.dispatcher.content_type = payload.MSGPACK
+        self.dispatcher.compress_min_bytes = 0
+
+        await self.dispatcher.post('http://localhost:8000/series/batch', [{'SeriesInstanceUID': '4.5.6'}])
+
+        headers = mock_post.call_args.kwargs['headers']
+        self.assertEqual(headers, {'Content-Type': payload.MSGPACK, 'Content-Encoding': payload.GZIP})
+        self.assertEqual(payload.decode(mock_post.call_args.kwargs['data'], headers['Content-Type'],
+                                        headers['Content-Encoding']), [{'SeriesInstanceUID': '4.5.6'}])
+
+    @patch('client.aiohttp.ClientSession.post')
+    async def test_send_data_retried_on_server_error(self, mock_post):
+        """Test that a failed request is retried and that the session is reused for the retry."""
+        failed = MagicMock()
+        failed.__aenter__.return_value.status = 503
+        failed.__aenter__.return_value.text = AsyncMock(return_value="Service Unavailable")
+        succeeded = MagicMock()
+        succeeded.__aenter__.return_value.status = 200
+        succeeded.__aenter__.return_value.json = AsyncMock(return_value={"message": "Test message from server"})
+        mock_post.side_effect = [failed, succeeded]
+        self.dispatcher.retry_backoff = 0.01
+
+        await self.dispatcher.send_data_to_server({'SeriesInstanceUID': '4.5.6'})
+
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertIsNotNone(self.dispatcher.session)
+
+    @patch('client.aiohttp.ClientSession.post')
+    async def test_spooled_series_replayed_and_compacted(self, mock_post):
+        """Test that a series spooled before a restart is collected again and removed once the server stored it."""
+        mock_post.return_value.__aenter__.return_value.status = 200
+        mock_post.return_value.__aenter__.return_value.json = AsyncMock(
+            return_value={"message": "Test message from server"}
+        )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            spool_path = os.path.join(tmp_dir, 'spool.db')
+            spool = InstanceSpool(spool_path)
+            spool.open()
+            spool.append(self.dataset1, 'MODALITY').result()
+            spool.close()
+
+            await self.dispatcher.stop()
+            self.dispatcher = SeriesDispatcher(compact=True, spool_path=spool_path)
+
+            main_task = asyncio.create_task(self.dispatcher.main())
+            await asyncio.sleep(0.05)
+            self.assertIn('4.5.6', self.dispatcher.series_collectors)
+
+            await self.dispatcher.dispatch_series_collector(now=time.time() + 2)
+            main_task.cancel()
+
+            mock_post.assert_called_once()
+            self.assertEqual(list(self.dispatcher.spool.replay()), [])
+
+    @patch('client.aiohttp.ClientSession.post')
+    async def test_late_instance_kept_in_spool(self, mock_post):
+        """Test that an instance received while its series is sent stays spooled after the acknowledgement."""
+        mock_post.return_value.__aenter__.return_value.status = 200
+        mock_post.return_value.__aenter__.return_value.json = AsyncMock(return_value={"message": "ok"})
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            await self.dispatcher.stop()
+            self.dispatcher = SeriesDispatcher(compact=True, spool_path=os.path.join(tmp_dir, 'spool.db'),
+                                               batch_window=0.01)
+            spool = self.dispatcher.spool
+            spool.open()
+            spool.append(self.dataset1, 'MODALITY').result()
+            collector = CompactSeriesCollector(self.dataset1)
+
+            late = copy.deepcopy(self.dataset1)
+            late.SOPInstanceUID = '1.1.2'
+            spool.append(late, 'MODALITY').result()
+            await self.dispatcher.extract_and_send_series_info(collector)
+            await self.dispatcher.flush_batch()
+
+            mock_post.assert_called_once()
+            self.assertEqual([dataset.SOPInstanceUID for dataset, _ in spool.replay()], ['1.1.2'])
+
 
 if __name__ == "__main__":
     unittest.main()
+
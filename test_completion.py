@@ -0,0 +1,67 @@
+import unittest
+import completion
+from completion import CompletionTracker
+
+
+class TestCompletionTracker(unittest.TestCase):
+
+    def setUp(self):
+        """Create a tracker with fixed parameters."""
+        self.tracker = CompletionTracker(default_wait=1.0, min_wait=0.2, max_wait=10.0, interval_factor=5.0,
+                                         release_grace=0.1, smoothing=0.5)
+
+    def test_default_wait_for_unknown_sender(self):
+        """Test that a single instance of an unknown sender waits the default time."""
+        deadline = self.tracker.record_arrival('1.1', 'MODALITY', now=100.0)
+        self.assertEqual(deadline, 101.0)
+        self.assertEqual(self.tracker.pop_due(now=100.9), [])
+        self.assertEqual(self.tracker.pop_due(now=101.0), ['1.1'])
+
+    def test_wait_adapts_to_inter_arrival_time(self):
+        """Test that the wait time follows the inter-arrival time of the series and is clamped."""
+        self.tracker.record_arrival('1.1', 'FAST', now=100.0)
+        deadline = self.tracker.record_arrival('1.1', 'FAST', now=100.01)
+        self.assertAlmostEqual(deadline, 100.01 + 0.2)
+
+        self.tracker.record_arrival('1.2', 'SLOW', now=100.0)
+        deadline = self.tracker.record_arrival('1.2', 'SLOW', now=101.0)
+        self.assertAlmostEqual(deadline, 106.0)
+
+        # A new series of a known sender uses the inter-arrival time learned for its AE title
+        deadline = self.tracker.record_arrival('1.3', 'SLOW', now=110.0)
+        self.assertAlmostEqual(deadline, 115.0)
+
+    def test_deadline_postponed_by_new_instance(self):
+        """Test that outdated deadlines are skipped once a series received a further instance."""
+        self.tracker.record_arrival('1.1', 'MODALITY', now=100.0)
+        self.tracker.record_arrival('1.1', 'MODALITY', now=100.9)
+        self.assertEqual(self.tracker.pop_due(now=101.0), [])
+        self.assertEqual(self.tracker.pop_due(now=110.0), ['1.1'])
+        self.assertEqual(self.tracker.pop_due(now=120.0), [])
+
+    def test_release_shortens_wait(self):
+        """Test that the release of an association with several instances of a series completes it early."""
+        self.tracker.record_arrival('1.1', 'MODALITY', association=1, now=100.0)
+        self.tracker.record_arrival('1.1', 'MODALITY', association=1, now=101.0)
+        self.tracker.association_released(1, now=101.0)
+        self.assertEqual(self.tracker.pop_due(now=101.1), ['1.1'])
+
+    def test_release_ignored_for_single_instance_association(self):
+        """Test that an association per instance is not taken as completion signal."""
+        self.tracker.record_arrival('1.1', 'MODALITY', association=1, now=100.0)
+        self.tracker.association_released(1, now=100.0)
+        self.assertEqual(self.tracker.pop_due(now=100.5), [])
+
+    def test_reopened_series_counted(self):
+        """Test that instances arriving after the dispatch of their series are counted as reopened series, also in the
+        metrics."""
+        reopened = completion.SERIES_REOPENED.value
+        self.tracker.record_arrival('1.1', 'MODALITY', now=100.0)
+        self.assertEqual(self.tracker.pop_due(now=102.0), ['1.1'])
+        self.tracker.record_arrival('1.1', 'MODALITY', now=103.0)
+        self.assertEqual(self.tracker.stats(), {'open': 1, 'dispatched': 1, 'reopened': 1})
+        self.assertEqual(completion.SERIES_REOPENED.value, reopened + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
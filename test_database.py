@@ -0,0 +1,189 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from database import ConnectionPool, GroupCommitWriter, ReadCache
+
+
+class TestConnectionPool(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        """Create a pool on a database in a temporary directory."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.pool = ConnectionPool(os.path.join(self.tmp_dir.name, 'test.db'), size=2)
+
+    def tearDown(self):
+        """Close the pool and remove the database."""
+        self.pool.close()
+        self.tmp_dir.cleanup()
+
+    async def test_run_off_loop_with_wal(self):
+        """Test that queries run in a pool thread on a connection in WAL mode."""
+        def query(conn):
+            journal_mode = conn.execute('PRAGMA journal_mode').fetchone()[0]
+            return journal_mode, threading.current_thread() is threading.main_thread()
+
+        journal_mode, on_main_thread = await self.pool.run(query)
+        self.assertEqual(journal_mode, 'wal')
+        self.assertFalse(on_main_thread)
+
+    async def test_concurrent_writes(self):
+        """Test that concurrent writes through the pool are all stored."""
+        def create(conn):
+            conn.execute('CREATE TABLE numbers (value INTEGER)')
+            conn.commit()
+
+        def insert(conn, value):
+            conn.execute('INSERT INTO numbers VALUES (?)', (value,))
+            conn.commit()
+
+        def count(conn):
+            return conn.execute('SELECT COUNT(*) FROM numbers').fetchone()[0]
+
+        await self.pool.run(create)
+        await asyncio.gather(*(self.pool.run(insert, value) for value in range(50)))
+        self.assertEqual(await self.pool.run(count), 50)
+
+    async def test_reuse_after_close(self):
+        """Test that a closed pool opens new connections for further queries."""
+        def query(conn):
+            return conn.execute('SELECT 1').fetchone()[0]
+
+        self.assertEqual(await self.pool.run(query), 1)
+        self.pool.close()
+        self.assertEqual(await self.pool.run(query), 1)
+
+    async def test_rollback_on_error(self):
+        """Test that a failing query rolls back the open transaction of the pooled connection."""
+        def create(conn):
+            conn.execute('CREATE TABLE numbers (value INTEGER)')
+            conn.commit()
+
+        def insert_and_fail(conn):
+            conn.execute('INSERT INTO numbers VALUES (1)')
+            raise ValueError("failed")
+
+        def count(conn):
+            return conn.execute('SELECT COUNT(*) FROM numbers').fetchone()[0]
+
+        await self.pool.run(create)
+        with self.assertRaises(ValueError):
+            await self.pool.run(insert_and_fail)
+        self.assertEqual(await self.pool.run(count), 0)
+
+
+class TestGroupCommitWriter(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        """Create a table and a writer inserting into it."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.pool = ConnectionPool(os.path.join(self.tmp_dir.name, 'test.db'), size=1)
+
+        def create(conn):
+            conn.execute('CREATE TABLE numbers (value INTEGER PRIMARY KEY)')
+            conn.commit()
+
+        await self.pool.run(create)
+        self.writer = GroupCommitWriter(self.pool, 'INSERT INTO numbers VALUES (?)', flush_interval=0.05)
+
+    def tearDown(self):
+        """Stop the writer, close the pool and remove the database."""
+        self.writer.close()
+        self.pool.close()
+        self.tmp_dir.cleanup()
+
+    async def test_submissions_committed_together(self):
+        """Test that concurrent submissions are committed and visible once their futures are resolved."""
+        futures = [self.writer.submit([(value,)]) for value in range(20)]
+        results = await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+        self.assertEqual(results, [1] * 20)
+
+        def count(conn):
+            return conn.execute('SELECT COUNT(*) FROM numbers').fetchone()[0]
+
+        self.assertEqual(await self.pool.run(count), 20)
+
+    async def test_failed_submission_isolated(self):
+        """Test that a failing submission is rolled back and reported alone, while the others of its group are
+        committed."""
+        first = self.writer.submit([(1,)])
+        duplicate = self.writer.submit([(2,), (2,)])
+        last = self.writer.submit([(3,)])
+        with self.assertRaises(sqlite3.IntegrityError):
+            await asyncio.wrap_future(duplicate)
+        self.assertEqual(await asyncio.wrap_future(first), 1)
+        self.assertEqual(await asyncio.wrap_future(last), 1)
+
+        def values(conn):
+            return [row[0] for row in conn.execute('SELECT * FROM numbers ORDER BY 1')]
+
+        self.assertEqual(await self.pool.run(values), [1, 3])
+
+    async def test_cancelled_submission_skipped(self):
+        """Test that a submission cancelled while waiting for its flush is not written and the writer keeps
+        running."""
+        waiting = asyncio.ensure_future(asyncio.wrap_future(self.writer.submit([(1,)])))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+
+        self.assertEqual(await asyncio.wait_for(asyncio.wrap_future(self.writer.submit([(2,)])), 5), 1)
+        self.assertTrue(self.writer._thread.is_alive())
+
+        def values(conn):
+            return [row[0] for row in conn.execute('SELECT * FROM numbers ORDER BY 1')]
+
+        self.assertEqual(await self.pool.run(values), [2])
+
+    async def test_submit_function(self):
+        """Test that a function given as statement writes the rows of its submission in the transaction."""
+        def insert_squares(conn, rows):
+            return conn.executemany('INSERT INTO numbers VALUES (?)', [(value * value,) for value, in rows]).rowcount
+
+        result = await asyncio.wrap_future(self.writer.submit([(2,), (3,)], insert_squares))
+        self.assertEqual(result, 2)
+
+        def values(conn):
+            return [row[0] for row in conn.execute('SELECT * FROM numbers ORDER BY 1')]
+
+        self.assertEqual(await self.pool.run(values), [4, 9])
+
+
+class TestReadCache(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.cache = ReadCache(max_entries=2, ttl=10.0, clock=lambda: self.now)
+
+    def test_lru_and_ttl(self):
+        """Test that the least recently used entry is evicted and that entries expire."""
+        self.cache.put('a', 1, (), self.cache.version)
+        self.cache.put('b', 2, (), self.cache.version)
+        self.assertEqual(self.cache.get('a'), 1)
+        self.cache.put('c', 3, (), self.cache.version)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('a'), 1)
+
+        self.now = 10.0
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(len(self.cache), 1)
+
+    def test_invalidate_by_tag(self):
+        """Test that only the entries of the invalidated tags are removed, and that a value loaded before an
+        invalidation is not cached."""
+        self.cache.put('series', 1, ('s1',), self.cache.version)
+        self.cache.put('page', 2, ('p1', 's2'), self.cache.version)
+        version = self.cache.version
+        self.cache.invalidate(['s2'])
+        self.assertEqual(self.cache.get('series'), 1)
+        self.assertIsNone(self.cache.get('page'))
+
+        self.cache.put('page', 2, ('p1', 's2'), version)
+        self.assertIsNone(self.cache.get('page'))
+
+
+if __name__ == "__main__":
+    unittest.main()
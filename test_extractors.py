@@ -0,0 +1,113 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from pydicom import dcmread, dcmwrite
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, MRImageStorage
+from extractors import (ExtractorPipeline, InstanceUIDExtractor, PixelStatisticsExtractor,
+                        SliceGeometryExtractor, map_chunk)
+
+
+def write_slice(directory, sop_uid, location, value):
+    """Write an axial MR slice at the given z position, filled with a constant pixel value."""
+    dataset = Dataset()
+    dataset.file_meta = FileMetaDataset()
+    dataset.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    dataset.file_meta.MediaStorageSOPClassUID = MRImageStorage
+    dataset.file_meta.MediaStorageSOPInstanceUID = sop_uid
+    dataset.SOPClassUID = MRImageStorage
+    dataset.SOPInstanceUID = sop_uid
+    dataset.SeriesInstanceUID = '4.5.6'
+    dataset.ImagePositionPatient = [0.0, 0.0, location]
+    dataset.ImageOrientationPatient = [1.0, 0.0, 0.0, 0.0, 1.0, 0.0]
+    dataset.Rows = 2
+    dataset.Columns = 2
+    dataset.BitsAllocated = 16
+    dataset.BitsStored = 16
+    dataset.HighBit = 15
+    dataset.PixelRepresentation = 0
+    dataset.SamplesPerPixel = 1
+    dataset.PhotometricInterpretation = 'MONOCHROME2'
+    dataset.PixelData = np.full((2, 2), value, dtype=np.uint16).tobytes()
+    path = os.path.join(directory, f"{sop_uid}.dcm")
+    dcmwrite(path, dataset, enforce_file_format=True)
+    return path
+
+
+class TestExtractors(unittest.TestCase):
+
+    def setUp(self):
+        """Write a series with slices out of order, one duplicate and one missing slice."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        locations = {'1.1.1': 10.0, '1.1.2': 0.0, '1.1.3': 5.0, '1.1.4': 5.0, '1.1.5': 20.0}
+        self.paths = [write_slice(self.tmp_dir.name, uid, location, value)
+                      for value, (uid, location) in enumerate(locations.items())]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def run_extractor(self, extractor, chunks=2):
+        datasets = [dcmread(path) for path in self.paths]
+        return extractor.reduce([extractor.map(datasets[start::chunks]) for start in range(chunks)])
+
+    def test_instance_uids(self):
+        summary = self.run_extractor(InstanceUIDExtractor, chunks=1)
+        self.assertEqual(summary['SOPInstanceUIDs'], ['1.1.1', '1.1.2', '1.1.3', '1.1.4', '1.1.5'])
+
+    def test_slice_geometry(self):
+        summary = self.run_extractor(SliceGeometryExtractor)
+        self.assertEqual(summary['SliceOrder'][0], '1.1.2')
+        self.assertEqual(summary['SliceOrder'][-1], '1.1.5')
+        # Spacing, duplicate and missing slices are part of the geometry summary of the dispatcher
+        self.assertEqual(set(summary), {'SliceOrder'})
+
+    def test_pixel_statistics(self):
+        summary = self.run_extractor(PixelStatisticsExtractor)
+        values = np.arange(5, dtype=np.float64)
+        self.assertEqual(summary['PixelMin'], 0.0)
+        self.assertEqual(summary['PixelMax'], 4.0)
+        self.assertAlmostEqual(summary['PixelMean'], values.mean())
+        self.assertAlmostEqual(summary['PixelStd'], values.std())
+
+    def test_map_chunk_reads_each_file_once(self):
+        """Test that a chunk is read once for all extractors, without the pixels if no extractor needs them."""
+        extractors = [InstanceUIDExtractor, SliceGeometryExtractor]
+        with mock.patch('extractors.dcmread', wraps=dcmread) as read:
+            parts = map_chunk(extractors, self.paths)
+        self.assertEqual(read.call_count, len(self.paths))
+        self.assertTrue(all(call.kwargs['stop_before_pixels'] for call in read.call_args_list))
+        self.assertEqual(InstanceUIDExtractor.reduce(parts[0]), {'SOPInstanceUIDs': ['1.1.1', '1.1.2', '1.1.3',
+                                                                                    '1.1.4', '1.1.5']})
+
+        with mock.patch('extractors.dcmread', wraps=dcmread) as read:
+            map_chunk([*extractors, PixelStatisticsExtractor], self.paths)
+        self.assertEqual(read.call_count, len(self.paths))
+        self.assertFalse(any(call.kwargs['stop_before_pixels'] for call in read.call_args_list))
+
+    def test_pipeline_in_process_pool(self):
+        """Test that the pipeline merges the results of all extractors computed in worker processes."""
+        pipeline = ExtractorPipeline(max_workers=2)
+        try:
+            summary = asyncio.run(pipeline.run(self.paths))
+        finally:
+            pipeline.close()
+        self.assertEqual(len(summary['SOPInstanceUIDs']), 5)
+        self.assertEqual(summary['SliceOrder'][0], '1.1.2')
+        self.assertEqual(summary['PixelMax'], 4.0)
+
+    def test_pipeline_with_executor(self):
+        """Test that a given executor is used and not shut down by the pipeline."""
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            pipeline = ExtractorPipeline([InstanceUIDExtractor], max_workers=3, executor=executor)
+            summary = asyncio.run(pipeline.run(self.paths))
+            pipeline.close()
+            self.assertIs(pipeline.executor, executor)
+        self.assertEqual(summary, {'SOPInstanceUIDs': ['1.1.1', '1.1.2', '1.1.3', '1.1.4', '1.1.5']})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import urllib.error
+import urllib.request
+from metrics import CONTENT_TYPE, Counter, Gauge, Histogram, Registry, start_http_server
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_counter_and_gauge(self):
+        counter = Counter('test_requests_total', "Requests.", registry=self.registry)
+        gauge = Gauge('test_queue_depth', "Queue depth.", registry=self.registry)
+        counter.inc()
+        counter.inc(2)
+        gauge.set(5)
+        gauge.dec()
+
+        self.assertEqual(self.registry.render(), (
+            "# HELP test_requests_total Requests.\n"
+            "# TYPE test_requests_total counter\n"
+            "test_requests_total 3\n"
+            "# HELP test_queue_depth Queue depth.\n"
+            "# TYPE test_queue_depth gauge\n"
+            "test_queue_depth 4\n"
+        ))
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram('test_latency_seconds', "Latency.", buckets=(0.1, 1.0), registry=self.registry)
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+        with histogram.time():
+            pass
+
+        lines = self.registry.render().splitlines()
+        self.assertIn('test_latency_seconds_bucket{le="0.1"} 3', lines)
+        self.assertIn('test_latency_seconds_bucket{le="1.0"} 4', lines)
+        self.assertIn('test_latency_seconds_bucket{le="+Inf"} 5', lines)
+        self.assertIn('test_latency_seconds_count 5', lines)
+        self.assertEqual(histogram.count, 5)
+        self.assertGreaterEqual(histogram.sum, 3.65)
+
+    def test_duplicate_name_refused(self):
+        Counter('test_total', "Test.", registry=self.registry)
+        with self.assertRaises(ValueError):
+            Counter('test_total', "Test.", registry=self.registry)
+
+    def test_http_server(self):
+        """Test that the listener serves the registry on /metrics only."""
+        Counter('test_total', "Test.", registry=self.registry).inc()
+        server = start_http_server(0, '127.0.0.1', registry=self.registry)
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}"
+            with urllib.request.urlopen(f"{url}/metrics") as response:
+                self.assertEqual(response.headers['Content-Type'], CONTENT_TYPE)
+                self.assertIn(b"test_total 1\n", response.read())
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(f"{url}/other")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+import payload
+
+
+class TestPayload(unittest.TestCase):
+
+    def test_round_trip(self):
+        """Test that bodies are decoded by their headers, compressed only from the minimum size on."""
+        data = [{'SeriesInstanceUID': '4.5.6', 'InstanceInSeries': 10, 'Summary': None}]
+        for content_type in payload.CONTENT_TYPES:
+            body, headers = payload.encode(data, content_type)
+            self.assertEqual(headers, {'Content-Type': content_type})
+            self.assertEqual(payload.decode(body, content_type), data)
+
+            body, headers = payload.encode(data, content_type, compress_min_bytes=0)
+            self.assertEqual(headers['Content-Encoding'], payload.GZIP)
+            self.assertEqual(payload.decode(body, f'{content_type}; charset=utf-8', payload.GZIP), data)
+
+    def test_msgpack_smaller_than_json(self):
+        data = [{'SeriesInstanceUID': f'1.2.3.{index}', 'InstanceInSeries': index} for index in range(100)]
+        self.assertLess(len(payload.encode(data, payload.MSGPACK)[0]), len(payload.encode(data, payload.JSON)[0]))
+
+    def test_unsupported_and_invalid(self):
+        with self.assertRaises(payload.UnsupportedFormat):
+            payload.decode(b'{}', 'application/xml')
+        with self.assertRaises(payload.UnsupportedFormat):
+            payload.decode(b'{}', payload.JSON, 'br')
+        with self.assertRaises(ValueError):
+            payload.decode(b'{', payload.JSON)
+        with self.assertRaises(ValueError):
+            payload.decode(b'{}', payload.JSON, payload.GZIP)
+        body, headers = payload.encode({'a': 1}, payload.JSON, compress_min_bytes=0)
+        with self.assertRaises(ValueError):
+            payload.decode(body[:-10], payload.JSON, payload.GZIP)
+
+    def test_decompression_bounded(self):
+        """Test that a small compressed body expanding beyond the maximum size is refused."""
+        body, headers = payload.encode({'a': 'x' * 10 ** 6}, payload.JSON, compress_min_bytes=0)
+        self.assertLess(len(body), 10 ** 4)
+        self.assertEqual(len(payload.decode(body, payload.JSON, payload.GZIP)['a']), 10 ** 6)
+        with self.assertRaises(payload.PayloadTooLarge):
+            payload.decode(body, payload.JSON, payload.GZIP, max_size=10 ** 5)
+        with self.assertRaises(payload.PayloadTooLarge):
+            payload.decode(b'{}' + b' ' * 100, payload.JSON, max_size=10)
+
+
+if __name__ == "__main__":
+    unittest.main()
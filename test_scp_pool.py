@@ -0,0 +1,120 @@
+import asyncio
+import io
+import queue
+import threading
+import unittest
+from unittest.mock import MagicMock
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, MRImageStorage
+from pynetdicom import AE
+from client import SeriesDispatcher
+from scp import BACKPRESSURE_REJECT, STATUS_OUT_OF_RESOURCES
+from scp_pool import WorkerStoreSCP, shard_index
+
+PORT = 6668
+
+
+def send(sop_instance_uids):
+    """Send instances of one series over a new association."""
+    ae = AE(ae_title='TESTSCU')
+    ae.add_requested_context(MRImageStorage, ExplicitVRLittleEndian)
+    assoc = ae.associate('127.0.0.1', PORT)
+    if not assoc.is_established:
+        raise RuntimeError("Association rejected")
+    statuses = []
+    for sop_instance_uid in sop_instance_uids:
+        dataset = Dataset()
+        dataset.PatientID = '12345'
+        dataset.PatientName = 'Hanwool Park'
+        dataset.StudyInstanceUID = '1.2.3'
+        dataset.SeriesInstanceUID = '4.5.6'
+        dataset.SOPClassUID = MRImageStorage
+        dataset.SOPInstanceUID = sop_instance_uid
+        dataset.file_meta = FileMetaDataset()
+        dataset.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+        statuses.append(assoc.send_c_store(dataset).Status)
+    assoc.release()
+    return statuses
+
+
+class TestScpWorkerPool(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        """Create a dispatcher with two SCP worker processes sharing one port."""
+        self.dispatcher = SeriesDispatcher(compact=True, scp_workers=2, num_shards=3,
+                                           scp_options={'address': ('127.0.0.1', PORT)})
+
+    async def asyncTearDown(self):
+        await self.dispatcher.stop()
+
+    async def test_series_from_several_associations_collected_together(self):
+        """Test that the instances of one series received by different workers end up in one collector."""
+        self.dispatcher.start()
+        main_task = asyncio.create_task(self.dispatcher.main())
+
+        uids = [f'1.1.{index}' for index in range(8)]
+        results = await asyncio.gather(*(asyncio.to_thread(send, uids[start::4]) for start in range(4)))
+        self.assertEqual([status for statuses in results for status in statuses], [0x0000] * 8)
+
+        for _ in range(200):
+            collector = self.dispatcher.series_collectors.get('4.5.6')
+            if collector is not None and collector.instance_count == 8:
+                break
+            await asyncio.sleep(0.01)
+
+        main_task.cancel()
+        self.assertEqual(sorted(self.dispatcher.series_collectors['4.5.6'].sop_instance_uids), sorted(uids))
+
+    def test_shard_index_matches_dispatcher(self):
+        self.assertEqual(shard_index('4.5.6', 3), self.dispatcher.shard_index('4.5.6'))
+
+    def test_workers_require_compact(self):
+        with self.assertRaises(ValueError):
+            SeriesDispatcher(scp_workers=2)
+
+
+def store_event(sop_instance_uid):
+    """Return a C-STORE event of an instance of series 4.5.6."""
+    event = MagicMock()
+    event.dataset = Dataset()
+    event.dataset.SeriesInstanceUID = '4.5.6'
+    event.dataset.SOPInstanceUID = sop_instance_uid
+    event.file_meta = FileMetaDataset()
+    event.request.DataSet = io.BytesIO(b'\x00' * 16)
+    return event
+
+
+class TestWorkerStoreSCP(unittest.TestCase):
+
+    def setUp(self):
+        """Create a worker SCP with one shard queue holding a single dataset."""
+        self.shard_queue = queue.Queue(maxsize=1)
+        self.scp = WorkerStoreSCP([self.shard_queue], keep_pixel_data=True, block_timeout=0.5,
+                                  address=('127.0.0.1', PORT))
+
+    def test_full_shard_queue_refuses_after_block_timeout(self):
+        """Test that a full shard queue refuses the C-STORE after `block_timeout` without holding the lock."""
+        self.assertEqual(self.scp.handle_store(store_event('1.1.1')), 0x0000)
+
+        statuses = []
+        handler = threading.Thread(target=lambda: statuses.append(self.scp.handle_store(store_event('1.1.2'))))
+        handler.start()
+        # Other associations of the worker are not held up while the put waits
+        self.assertTrue(self.scp._lock.acquire(timeout=0.25))
+        self.scp._lock.release()
+        handler.join()
+
+        self.assertEqual(statuses, [STATUS_OUT_OF_RESOURCES])
+        self.assertEqual(self.scp.stats.queue_depth, 0)
+        self.assertEqual(self.scp.stats.rejected, 1)
+
+    def test_full_shard_queue_refuses_immediately_with_reject(self):
+        self.scp.backpressure = BACKPRESSURE_REJECT
+        self.scp.block_timeout = 60
+        self.assertEqual(self.scp.handle_store(store_event('1.1.1')), 0x0000)
+        self.assertEqual(self.scp.handle_store(store_event('1.1.2')), STATUS_OUT_OF_RESOURCES)
+        self.assertEqual(self.shard_queue.get_nowait()[0].SOPInstanceUID, '1.1.1')
+
+
+if __name__ == "__main__":
+    unittest.main()
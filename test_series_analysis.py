@@ -0,0 +1,77 @@
+import math
+import unittest
+from pydicom.dataset import Dataset
+from series_analysis import SeriesGeometry, dicom_time_seconds
+
+
+def make_slice(sop_uid, instance_number, location, acquisition_time='120000'):
+    """Create an axial slice at the given z position."""
+    dataset = Dataset()
+    dataset.SOPInstanceUID = sop_uid
+    dataset.InstanceNumber = instance_number
+    dataset.AcquisitionTime = acquisition_time
+    dataset.ImagePositionPatient = [-100.0, -100.0, location]
+    dataset.ImageOrientationPatient = [1.0, 0.0, 0.0, 0.0, 1.0, 0.0]
+    return dataset
+
+
+class TestSeriesGeometry(unittest.TestCase):
+
+    def analyze(self, datasets):
+        geometry = SeriesGeometry()
+        for dataset in datasets:
+            geometry.add(dataset)
+        return geometry.analyze()
+
+    def test_consistent_series(self):
+        """Test a complete series received in reverse order."""
+        datasets = [make_slice(f'1.1.{index}', index, index * 1.5, f'1200{index:02d}') for index in range(10, 0, -1)]
+        self.assertEqual(self.analyze(datasets), {
+            'DuplicateSOPInstanceUIDs': 0,
+            'MissingInstanceNumbers': 0,
+            'AcquisitionDuration': 9.0,
+            'MixedOrientations': 0,
+            'SliceSpacing': 1.5,
+            'DuplicateSlices': 0,
+            'MissingSlices': 0,
+            'InstanceNumberOrder': 'ascending',
+        })
+
+    def test_gaps_and_duplicates(self):
+        """Test a series with a missing slice, a duplicated slice and a resent instance."""
+        datasets = [make_slice('1.1.1', 1, 0.0), make_slice('1.1.2', 2, 3.0), make_slice('1.1.3', 3, 6.0),
+                    make_slice('1.1.4', 4, 6.0), make_slice('1.1.6', 6, 12.0), make_slice('1.1.7', 7, 15.0),
+                    make_slice('1.1.7', 7, 15.0)]
+        summary = self.analyze(datasets)
+        self.assertEqual(summary['DuplicateSOPInstanceUIDs'], 1)
+        self.assertEqual(summary['MissingInstanceNumbers'], 1)
+        self.assertEqual(summary['SliceSpacing'], 3.0)
+        self.assertEqual(summary['DuplicateSlices'], 2)
+        self.assertEqual(summary['MissingSlices'], 1)
+        self.assertEqual(summary['InstanceNumberOrder'], 'unordered')
+
+    def test_mixed_orientations(self):
+        datasets = [make_slice(f'1.1.{index}', index, float(index)) for index in range(5)]
+        datasets[2].ImageOrientationPatient = [0.0, 1.0, 0.0, 0.0, 0.0, -1.0]
+        self.assertEqual(self.analyze(datasets)['MixedOrientations'], 1)
+
+    def test_descending_instance_numbers(self):
+        datasets = [make_slice(f'1.1.{index}', 10 - index, float(index)) for index in range(5)]
+        self.assertEqual(self.analyze(datasets)['InstanceNumberOrder'], 'descending')
+
+    def test_missing_attributes(self):
+        """Test that only the checks possible with the present attributes are reported."""
+        dataset = Dataset()
+        dataset.SOPInstanceUID = '1.1.1'
+        self.assertEqual(self.analyze([dataset, dataset]), {'DuplicateSOPInstanceUIDs': 1})
+
+    def test_dicom_time_seconds(self):
+        self.assertEqual(dicom_time_seconds('013015.5'), 5415.5)
+        self.assertEqual(dicom_time_seconds('01'), 3600)
+        self.assertEqual(dicom_time_seconds('01:30:15'), 5415)
+        self.assertTrue(math.isnan(dicom_time_seconds('')))
+        self.assertTrue(math.isnan(dicom_time_seconds(None)))
+
+
+if __name__ == "__main__":
+    unittest.main()
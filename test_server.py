@@ -1,7 +1,29 @@
-import unittest
+import json
+import os
+import shutil
 import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
 from fastapi.testclient import TestClient
-from server import app, init_db
+
+# The server reads the path of its database from the environment when it is imported, so the tests never touch the
+# database of the repository
+TMP_DIR = tempfile.mkdtemp()
+os.environ['DICOM_DB_PATH'] = os.path.join(TMP_DIR, 'dicom_series.db')
+
+import server  # noqa: E402
+from database import ConnectionPool, GroupCommitWriter  # noqa: E402
+from server import app, init_db  # noqa: E402
+from uid_codec import encode_uids  # noqa: E402
+import payload  # noqa: E402
+
+
+def tearDownModule():
+    server.db.close()
+    shutil.rmtree(TMP_DIR)
+    del os.environ['DICOM_DB_PATH']
+
 
 class TestFastAPIServer(unittest.TestCase):
 
@@ -11,21 +33,18 @@ class TestFastAPIServer(unittest.TestCase):
         init_db()  # Initialize the database schema
 
     def setUp(self):
-        """Set up the TestClient and clean mock test data before each test."""
+        """Set up the TestClient and clear the read cache before each test."""
         self.client = TestClient(app)
-
-        # clean test data from the previous runs before the test
-        conn = sqlite3.connect('dicom_series.db')
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM series WHERE SeriesInstanceUID LIKE 'test_%'")
-        conn.commit()
-        conn.close()
+        # The test data is deleted directly in the database, which the read cache does not see
+        if server.read_cache is not None:
+            server.read_cache.clear()
 
     def tearDown(self):
-        """Remove only test data (with SeriesInstanceUID starting with 'test_') after each test case."""
-        conn = sqlite3.connect('dicom_series.db')
+        """Remove all data of the test from the temporary database, including the patients and studies."""
+        conn = sqlite3.connect(server.DB_PATH)
         cursor = conn.cursor()
-        cursor.execute("DELETE FROM series WHERE SeriesInstanceUID LIKE 'test_%'")
+        for table in ('instances', 'series', 'studies', 'patients'):
+            cursor.execute(f"DELETE FROM {table}")
         conn.commit()
         conn.close()
 
@@ -44,15 +63,497 @@ class TestFastAPIServer(unittest.TestCase):
         self.assertIn("success", response.json()["status"])
 
         # Verify the data is in the database
-        conn = sqlite3.connect('dicom_series.db')
+        conn = sqlite3.connect(server.DB_PATH)
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM series WHERE SeriesInstanceUID = ?', ('test_4.5.6',))
         record = cursor.fetchone()
         self.assertIsNotNone(record)
         self.assertEqual(record[0], 'test_4.5.6')  # SeriesInstanceUID
-        self.assertEqual(record[1], '12345')  # PatientID
-        self.assertEqual(record[2], 'Hanwool Park')  # PatientName
-        self.assertEqual(record[4], 10)  # InstanceInSeries
+        self.assertEqual(record[1], '1.2.3')  # StudyInstanceUID
+        self.assertEqual(record[2], 10)  # InstanceInSeries
+        # The patient is stored once, referenced by the study
+        self.assertEqual(cursor.execute('SELECT * FROM studies').fetchall(), [('1.2.3', '12345')])
+        self.assertEqual(cursor.execute('SELECT * FROM patients').fetchall(), [('12345', 'Hanwool Park')])
+        conn.close()
+
+    def test_lifespan_restart(self):
+        """Test that the app can be started and stopped repeatedly in one process, e.g. by consecutive test runs."""
+        data = {
+            'PatientID': '12345',
+            'PatientName': 'Hanwool Park',
+            'StudyInstanceUID': '1.2.3',
+            'SeriesInstanceUID': 'test_4.5.6',
+            'InstanceInSeries': 10
+        }
+        for count in (10, 11):
+            # The lifespan (creating the database, closing the connections) only runs with the client as context
+            with TestClient(app) as client:
+                response = client.post("/series", json=dict(data, InstanceInSeries=count))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(client.get("/series/test_4.5.6").json()['InstanceInSeries'], count)
+
+    def test_post_series_data_update(self):
+        """Test that posting a series again only updates it if the instance count has changed."""
+        data = {
+            'PatientID': '12345',
+            'PatientName': 'Hanwool Park',
+            'StudyInstanceUID': '1.2.3',
+            'SeriesInstanceUID': 'test_4.5.6',
+            'InstanceInSeries': 10
+        }
+        self.client.post("/series", json=data)
+
+        response = self.client.post("/series", json=data)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("No update needed", response.json()["message"])
+
+        data['InstanceInSeries'] = 12
+        response = self.client.post("/series", json=data)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("No update needed", response.json()["message"])
+
+        conn = sqlite3.connect(server.DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute('SELECT InstanceInSeries FROM series WHERE SeriesInstanceUID = ?', ('test_4.5.6',))
+        self.assertEqual(cursor.fetchone(), (12,))
+        conn.close()
+
+    def test_post_series_batch(self):
+        """Test the batch API stores all series of the batch."""
+        batch = [
+            {
+                'PatientID': '12345',
+                'PatientName': 'Hanwool Park',
+                'StudyInstanceUID': '1.2.3',
+                'SeriesInstanceUID': f'test_4.5.{index}',
+                'InstanceInSeries': index
+            }
+            for index in range(1, 4)
+        ]
+
+        response = self.client.post("/series/batch", json=batch)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("success", response.json()["status"])
+        self.assertEqual(response.json()["message"], "Stored 3 of 3 series.")
+
+        conn = sqlite3.connect(server.DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute("SELECT SeriesInstanceUID, InstanceInSeries FROM series WHERE SeriesInstanceUID LIKE 'test_%' "
+                       "ORDER BY SeriesInstanceUID")
+        records = cursor.fetchall()
+        conn.close()
+        self.assertEqual(records, [('test_4.5.1', 1), ('test_4.5.2', 2), ('test_4.5.3', 3)])
+
+    def test_post_series_batch_changes_only(self):
+        """Test that a batch resend changes nothing, and that only the series with new data count as stored."""
+        batch = [
+            {
+                'PatientID': '12345',
+                'PatientName': 'Hanwool Park',
+                'StudyInstanceUID': f'1.2.{index}',
+                'SeriesInstanceUID': f'test_4.5.{index}',
+                'InstanceInSeries': 2,
+                'EncodedSOPInstanceUIDs': encode_uids([f'test_1.{index}.1', f'test_1.{index}.2'])
+            }
+            for index in range(1, 4)
+        ]
+        self.assertEqual(self.client.post("/series/batch", json=batch).json()["message"], "Stored 3 of 3 series.")
+        self.assertEqual(self.client.post("/series/batch", json=batch).json()["message"], "Stored 0 of 3 series.")
+
+        # An instance moved from another series counts for the series it is sent with, the instance count of the
+        # other series drops
+        batch[1]['EncodedSOPInstanceUIDs'] = encode_uids(['test_1.2.1', 'test_1.2.2', 'test_1.1.2'])
+        self.assertEqual(self.client.post("/series/batch", json=batch).json()["message"], "Stored 1 of 3 series.")
+        stored = {uid: self.client.get(f"/series/{uid}").json()['StoredInstances']
+                  for uid in ('test_4.5.1', 'test_4.5.2', 'test_4.5.3')}
+        self.assertEqual(stored, {'test_4.5.1': 1, 'test_4.5.2': 3, 'test_4.5.3': 2})
+        # A renamed patient changes all its series
+        for series in batch:
+            series['PatientName'] = 'Park'
+        self.assertEqual(self.client.post("/series/batch", json=batch).json()["message"], "Stored 3 of 3 series.")
+        self.assertEqual(self.client.get("/series/test_4.5.3").json()['PatientName'], 'Park')
+
+    def test_post_series_write_behind(self):
+        """Test that in write-behind mode the series is committed before the response is returned."""
+        writer = GroupCommitWriter(server.db, server.UPSERT_SERIES)
+        data = {
+            'PatientID': '12345',
+            'PatientName': 'Hanwool Park',
+            'StudyInstanceUID': '1.2.3',
+            'SeriesInstanceUID': 'test_4.5.6',
+            'InstanceInSeries': 10
+        }
+
+        with patch('server.writer', writer):
+            response = self.client.post("/series", json=data)
+            self.assertEqual(response.status_code, 200)
+
+            conn = sqlite3.connect(server.DB_PATH)
+            cursor = conn.cursor()
+            cursor.execute('SELECT InstanceInSeries FROM series WHERE SeriesInstanceUID = ?', ('test_4.5.6',))
+            self.assertEqual(cursor.fetchone(), (10,))
+            conn.close()
+
+            response = self.client.post("/series", json=data)
+            self.assertIn("No update needed", response.json()["message"])
+
+            data['EncodedSOPInstanceUIDs'] = encode_uids(['test_1.1.1', 'test_1.1.2'])
+            response = self.client.post("/series", json=data)
+            self.assertNotIn("No update needed", response.json()["message"])
+            self.assertEqual(self.client.get("/series/test_4.5.6").json()['StoredInstances'], 2)
+        writer.close()
+
+    def test_get_series(self):
+        """Test the lookup of a single series by its UID."""
+        data = {
+            'PatientID': '12345',
+            'PatientName': 'Hanwool Park',
+            'StudyInstanceUID': '1.2.3',
+            'SeriesInstanceUID': 'test_4.5.6',
+            'InstanceInSeries': 10
+        }
+        self.client.post("/series", json=data)
+
+        response = self.client.get("/series/test_4.5.6")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), data)
+
+        response = self.client.get("/series/test_unknown")
+        self.assertEqual(response.status_code, 404)
+
+    def test_series_summary(self):
+        """Test that the summary of the extractors is stored with the series and that a new summary updates it."""
+        data = {
+            'PatientID': '12345',
+            'PatientName': 'Hanwool Park',
+            'StudyInstanceUID': '1.2.3',
+            'SeriesInstanceUID': 'test_4.5.6',
+            'InstanceInSeries': 2,
+            'Summary': {'SOPInstanceUIDs': ['1.1.1', '1.1.2'], 'MissingSlices': 0, 'CustomField': 'value'}
+        }
+        response = self.client.post("/series", json=data)
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get("/series/test_4.5.6")
+        self.assertEqual(response.json()['Summary'], data['Summary'])
+
+        data['Summary']['MissingSlices'] = 1
+        response = self.client.post("/series", json=data)
+        self.assertNotIn("No update needed", response.json()["message"])
+        self.assertEqual(self.client.get("/series/test_4.5.6").json()['Summary']['MissingSlices'], 1)
+
+    def test_series_instances(self):
+        """Test that the instances sent with a series are stored once, counted by the triggers and listed."""
+        data = {
+            'PatientID': 'test_patient',
+            'PatientName': 'Hanwool Park',
+            'StudyInstanceUID': 'test_study',
+            'SeriesInstanceUID': 'test_4.5.6',
+            'InstanceInSeries': 3,
+            'EncodedSOPInstanceUIDs': encode_uids(['test_1.1.1', 'test_1.1.2', 'test_1.1.3'])
+        }
+        response = self.client.post("/series", json=data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get("/series/test_4.5.6").json()['StoredInstances'], 3)
+
+        # Resending the same instances changes nothing, a partial resend does not reduce the stored instances
+        response = self.client.post("/series", json=data)
+        self.assertIn("No update needed", response.json()["message"])
+        data['InstanceInSeries'] = 2
+        data['EncodedSOPInstanceUIDs'] = encode_uids(['test_1.1.3', 'test_1.1.4'])
+        self.client.post("/series", json=data)
+        self.assertEqual(self.client.get("/series/test_4.5.6").json()['StoredInstances'], 4)
+
+        response = self.client.get("/series/test_4.5.6/instances", params={'limit': 3})
+        self.assertEqual(response.headers['content-type'], 'application/x-ndjson')
+        page = [json.loads(line)['SOPInstanceUID'] for line in response.text.splitlines()]
+        self.assertEqual(page, ['test_1.1.1', 'test_1.1.2', 'test_1.1.3'])
+        response = self.client.get("/series/test_4.5.6/instances",
+                                   params={'after': response.headers['X-Next-After']})
+        self.assertEqual(response.text, '{"SOPInstanceUID": "test_1.1.4"}\n')
+
+        conn = sqlite3.connect(server.DB_PATH)
+        self.assertEqual(conn.execute("SELECT PatientID FROM studies WHERE StudyInstanceUID = 'test_study'").fetchone(),
+                         ('test_patient',))
+        # Deleting the series deletes its instances
+        conn.execute("DELETE FROM series WHERE SeriesInstanceUID = 'test_4.5.6'")
+        conn.commit()
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM instances WHERE SeriesInstanceUID = 'test_4.5.6'")
+                         .fetchone(), (0,))
+        conn.close()
+
+    def test_series_instances_invalid(self):
+        data = {
+            'PatientID': '12345',
+            'PatientName': 'Hanwool Park',
+            'StudyInstanceUID': '1.2.3',
+            'SeriesInstanceUID': 'test_4.5.6',
+            'InstanceInSeries': 1,
+            'EncodedSOPInstanceUIDs': 'invalid'
+        }
+        response = self.client.post("/series", json=data)
+        self.assertEqual(response.status_code, 422)
+
+    def test_post_msgpack(self):
+        """Test that series are accepted as msgpack, also gzip compressed batches, and decoded like JSON."""
+        data = {
+            'PatientID': '12345',
+            'PatientName': 'Hanwool Park',
+            'StudyInstanceUID': '1.2.3',
+            'SeriesInstanceUID': 'test_4.5.6',
+            'InstanceInSeries': 10,
+            'Summary': {'MissingSlices': 0}
+        }
+        body, headers = payload.encode(data, payload.MSGPACK)
+        response = self.client.post("/series", content=body, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get("/series/test_4.5.6").json(), data)
+
+        batch = [dict(data, SeriesInstanceUID=f'test_4.5.{index}') for index in range(7, 10)]
+        body, headers = payload.encode(batch, payload.MSGPACK, compress_min_bytes=0)
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        response = self.client.post("/series/batch", content=body, headers=headers)
+        self.assertEqual(response.json()["message"], "Stored 3 of 3 series.")
+
+    def test_post_unsupported_or_invalid_body(self):
+        response = self.client.post("/series", content=b'<series/>', headers={'Content-Type': 'application/xml'})
+        self.assertEqual(response.status_code, 415)
+        response = self.client.post("/series", content=b'\xc1', headers={'Content-Type': payload.MSGPACK})
+        self.assertEqual(response.status_code, 422)
+        response = self.client.post("/series/batch", json={'SeriesInstanceUID': 'test_4.5.6'})
+        self.assertEqual(response.status_code, 422)
+        response = self.client.post("/series", json={'PatientID': '12345', 'PatientName': 'Hanwool Park',
+                                                     'StudyInstanceUID': '1.2.3', 'SeriesInstanceUID': 'test_4.5.6',
+                                                     'InstanceInSeries': 'ten'})
+        self.assertEqual(response.status_code, 422)
+
+    def test_post_summary_not_storable_as_json(self):
+        """Test that summaries with binary msgpack values or NaN are refused instead of failing or being stored as
+        invalid JSON."""
+        data = {'PatientID': '12345', 'PatientName': 'Hanwool Park', 'StudyInstanceUID': '1.2.3',
+                'SeriesInstanceUID': 'test_4.5.6', 'InstanceInSeries': 10, 'Summary': {'x': b'\x00'}}
+        body, headers = payload.encode(data, payload.MSGPACK)
+        self.assertEqual(self.client.post("/series", content=body, headers=headers).status_code, 422)
+        body, headers = payload.encode([data], payload.MSGPACK)
+        self.assertEqual(self.client.post("/series/batch", content=body, headers=headers).status_code, 422)
+
+        body = b'{"PatientID": "12345", "PatientName": "Hanwool Park", "StudyInstanceUID": "1.2.3", ' \
+               b'"SeriesInstanceUID": "test_4.5.6", "InstanceInSeries": 10, "Summary": {"a": NaN}}'
+        for url in ("/series", "/series/batch"):
+            response = self.client.post(url, content=body if url == "/series" else b'[' + body + b']',
+                                        headers={'Content-Type': 'application/json'})
+            self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.client.get("/series/test_4.5.6").status_code, 404)
+
+    def test_post_series_model(self):
+        """Test that single series are validated with the `SeriesData` model, coercing numeric strings, which is
+        documented in the OpenAPI schema."""
+        data = {
+            'PatientID': '12345',
+            'PatientName': 'Hanwool Park',
+            'StudyInstanceUID': '1.2.3',
+            'SeriesInstanceUID': 'test_4.5.6',
+            'InstanceInSeries': '10'
+        }
+        response = self.client.post("/series", json=data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get("/series/test_4.5.6").json()['InstanceInSeries'], 10)
+
+        response = self.client.post("/series", json=dict(data, InstanceInSeries='ten'))
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.json()['detail'][0]['loc'], ['InstanceInSeries'])
+
+        request_body = self.client.get("/openapi.json").json()['paths']['/series']['post']['requestBody']
+        schema = request_body['content'][payload.MSGPACK]['schema']
+        self.assertEqual(schema['required'], ['PatientID', 'PatientName', 'StudyInstanceUID', 'SeriesInstanceUID',
+                                              'InstanceInSeries'])
+        self.assertNotIn('$ref', json.dumps(schema))
+
+    def test_post_body_too_large(self):
+        """Test that a compressed body expanding beyond the maximum size is refused with 413."""
+        batch = [{'PatientID': '12345', 'PatientName': 'x' * 10000, 'StudyInstanceUID': '1.2.3',
+                  'SeriesInstanceUID': f'test_4.5.{index}', 'InstanceInSeries': 1} for index in range(100)]
+        body, headers = payload.encode(batch, payload.MSGPACK, compress_min_bytes=0)
+        with patch('server.MAX_BODY_BYTES', 100000):
+            self.assertLess(len(body), 100000)
+            response = self.client.post("/series/batch", content=body, headers=headers)
+            self.assertEqual(response.status_code, 413)
+            response = self.client.post("/series/batch", json=batch)
+            self.assertEqual(response.status_code, 413)
+
+    def test_read_cache_and_etag(self):
+        """Test that reads are cached, answered with 304 for a known ETag and invalidated by upserts."""
+        data = {
+            'PatientID': 'test_patient',
+            'PatientName': 'Hanwool Park',
+            'StudyInstanceUID': 'test_study',
+            'SeriesInstanceUID': 'test_4.5.6',
+            'InstanceInSeries': 10
+        }
+        self.client.post("/series", json=data)
+        hits, misses = server.READ_CACHE_HITS.value, server.READ_CACHE_MISSES.value
+
+        response = self.client.get("/series/test_4.5.6")
+        etag = response.headers['ETag']
+        self.assertEqual(self.client.get("/series/test_4.5.6").json(), data)
+        self.assertEqual((server.READ_CACHE_HITS.value, server.READ_CACHE_MISSES.value), (hits + 1, misses + 1))
+
+        response = self.client.get("/series/test_4.5.6", headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        page = self.client.get("/series", params={'PatientID': 'test_patient'})
+        self.assertEqual(len(page.text.splitlines()), 1)
+
+        # An upsert of the series invalidates the series and the listing of its patient
+        data['InstanceInSeries'] = 12
+        self.client.post("/series", json=data)
+        response = self.client.get("/series/test_4.5.6", headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['InstanceInSeries'], 12)
+        self.assertEqual(json.loads(self.client.get("/series", params={'PatientID': 'test_patient'}).text),
+                         data)
+
+        # A series whose study is moved to another patient leaves the listing of the old patient
+        data['PatientID'] = 'test_other_patient'
+        data['InstanceInSeries'] = 13
+        self.client.post("/series", json=data)
+        self.assertEqual(self.client.get("/series", params={'PatientID': 'test_patient'}).text, '')
+        response = self.client.get("/series", params={'PatientID': 'test_other_patient'})
+        self.assertEqual(json.loads(response.text)['PatientID'], 'test_other_patient')
+
+    def test_read_cache_patient_updated(self):
+        """Test that updating a patient or moving a study invalidates the cached responses of all their series."""
+        data = {
+            'PatientID': 'test_patient',
+            'PatientName': 'Hanwool Park',
+            'StudyInstanceUID': 'test_study',
+            'SeriesInstanceUID': 'test_4.5.6',
+            'InstanceInSeries': 10
+        }
+        self.client.post("/series", json=data)
+        self.client.post("/series", json=dict(data, SeriesInstanceUID='test_4.5.7'))
+        self.assertEqual(self.client.get("/series/test_4.5.6").json()['PatientName'], 'Hanwool Park')
+        listing = self.client.get("/studies/test_study/series")
+        self.assertEqual(len(listing.text.splitlines()), 2)
+
+        # The new name of the patient, sent with another series, is shown for all series of the patient
+        response = self.client.post("/series", json=dict(data, SeriesInstanceUID='test_4.5.7', PatientName='Park'))
+        self.assertIn("Stored series", response.json()['message'])
+        self.assertEqual(self.client.get("/series/test_4.5.6").json()['PatientName'], 'Park')
+        listing = self.client.get("/studies/test_study/series")
+        self.assertEqual({json.loads(line)['PatientName'] for line in listing.text.splitlines()}, {'Park'})
+
+        # Moving the study to another patient moves all its series
+        self.assertEqual(len(self.client.get("/series", params={'PatientID': 'test_patient'}).text.splitlines()), 2)
+        self.client.post("/series", json=dict(data, SeriesInstanceUID='test_4.5.7', PatientID='test_other_patient'))
+        self.assertEqual(self.client.get("/series/test_4.5.6").json()['PatientID'], 'test_other_patient')
+        self.assertEqual(self.client.get("/series", params={'PatientID': 'test_patient'}).text, '')
+
+    def test_init_db_migrates_series(self):
+        """Test that a database storing the patient in every series is migrated to the normalized tables."""
+        path = os.path.join(TMP_DIR, 'denormalized.db')
+        conn = sqlite3.connect(path)
+        conn.execute('CREATE TABLE series (SeriesInstanceUID TEXT PRIMARY KEY, PatientID TEXT, PatientName TEXT, '
+                     'StudyInstanceUID TEXT, InstanceInSeries INTEGER)')
+        conn.execute('CREATE INDEX idx_series_patient ON series (PatientID, SeriesInstanceUID)')
+        conn.executemany('INSERT INTO series VALUES (?, ?, ?, ?, ?)',
+                         [('test_4.5.6', 'test_patient', 'Hanwool Park', 'test_study', 10),
+                          ('test_4.5.7', 'test_patient', 'Hanwool Park', 'test_study', 11)])
+        conn.commit()
+        conn.close()
+
+        pool = ConnectionPool(path, 1)
+        try:
+            with patch('server.db', pool):
+                init_db()
+                # A second start finds the database migrated
+                init_db()
+        finally:
+            pool.close()
+        conn = sqlite3.connect(path)
+        self.assertEqual(server.fetch_series(conn, 'test_4.5.7'), {
+            'SeriesInstanceUID': 'test_4.5.7', 'PatientID': 'test_patient', 'PatientName': 'Hanwool Park',
+            'StudyInstanceUID': 'test_study', 'InstanceInSeries': 11})
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(series)')]
+        self.assertNotIn('PatientID', columns)
+        self.assertNotIn('PatientName', columns)
+        self.assertEqual(conn.execute('SELECT * FROM patients').fetchall(), [('test_patient', 'Hanwool Park')])
+        conn.close()
+
+    def test_read_cache_instance_moved(self):
+        """Test that moving an instance to another series invalidates the cached responses of its previous series."""
+        data = {
+            'PatientID': 'test_patient',
+            'PatientName': 'Hanwool Park',
+            'StudyInstanceUID': 'test_study',
+            'SeriesInstanceUID': 'test_4.5.6',
+            'InstanceInSeries': 2,
+            'EncodedSOPInstanceUIDs': encode_uids(['1.1.1', '1.1.2'])
+        }
+        self.client.post("/series", json=data)
+        response = self.client.get("/series/test_4.5.6")
+        self.assertEqual(response.json()['StoredInstances'], 2)
+        etag = response.headers['ETag']
+        listing = self.client.get("/series", params={'PatientID': 'test_patient'})
+        self.assertEqual(json.loads(listing.text)['StoredInstances'], 2)
+
+        self.client.post("/series", json=dict(data, SeriesInstanceUID='test_4.5.7', PatientID='test_other_patient',
+                                              StudyInstanceUID='test_other_study', InstanceInSeries=1,
+                                              EncodedSOPInstanceUIDs=encode_uids(['1.1.2'])))
+        response = self.client.get("/series/test_4.5.6", headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['StoredInstances'], 1)
+        listing = self.client.get("/series", params={'PatientID': 'test_patient'})
+        self.assertEqual(json.loads(listing.text)['StoredInstances'], 1)
+
+    def test_metrics(self):
+        """Test that the metrics endpoint reports the received series and the database write latency."""
+        data = {
+            'PatientID': '12345',
+            'PatientName': 'Hanwool Park',
+            'StudyInstanceUID': '1.2.3',
+            'SeriesInstanceUID': 'test_4.5.6',
+            'InstanceInSeries': 10
+        }
+        received = server.SERIES_RECEIVED.value
+        self.client.post("/series", json=data)
+
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f"dicom_server_series_received_total {received + 1}", response.text)
+        self.assertIn("dicom_server_db_write_seconds_count", response.text)
+
+    def test_list_series_paginated(self):
+        """Test the NDJSON listing of the series of a patient and a study with keyset pagination."""
+        batch = [
+            {
+                'PatientID': 'test_patient',
+                'PatientName': 'Hanwool Park',
+                'StudyInstanceUID': 'test_study' if index < 4 else 'test_other_study',
+                'SeriesInstanceUID': f'test_4.5.{index}',
+                'InstanceInSeries': index
+            }
+            for index in range(5)
+        ]
+        self.client.post("/series/batch", json=batch)
+
+        response = self.client.get("/series", params={'PatientID': 'test_patient', 'limit': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['content-type'], 'application/x-ndjson')
+        page = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual(page, batch[:3])
+        self.assertEqual(response.headers['X-Next-After'], 'test_4.5.2')
+
+        response = self.client.get("/series", params={'PatientID': 'test_patient', 'limit': 3,
+                                                      'after': response.headers['X-Next-After']})
+        page = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual(page, batch[3:])
+        self.assertNotIn('X-Next-After', response.headers)
+
+        response = self.client.get("/studies/test_study/series")
+        uids = [json.loads(line)['SeriesInstanceUID'] for line in response.text.splitlines()]
+        self.assertEqual(uids, ['test_4.5.0', 'test_4.5.1', 'test_4.5.2', 'test_4.5.3'])
 
     def test_post_invalid_data(self):
         """Test the API with invalid data."""
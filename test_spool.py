@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+from pydicom.dataset import Dataset
+from spool import InstanceSpool
+
+
+class TestInstanceSpool(unittest.TestCase):
+
+    def setUp(self):
+        """Create a spool in a temporary directory."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'spool.db')
+        self.spool = InstanceSpool(self.path)
+        self.spool.open()
+
+    def tearDown(self):
+        """Close the spool and remove it."""
+        self.spool.close()
+        self.tmp_dir.cleanup()
+
+    def make_dataset(self, series_uid, sop_uid):
+        dataset = Dataset()
+        dataset.PatientID = '12345'
+        dataset.PatientName = 'Hanwool Park'
+        dataset.StudyInstanceUID = '1.2.3'
+        dataset.SeriesInstanceUID = series_uid
+        dataset.SOPInstanceUID = sop_uid
+        return dataset
+
+    def test_replay_after_restart(self):
+        """Test that appended instances are replayed in order by a new spool on the same file."""
+        for index in range(3):
+            self.spool.append(self.make_dataset('4.5.6', f'1.1.{index}'), 'MODALITY').result()
+        self.spool.close()
+
+        self.spool = InstanceSpool(self.path)
+        self.spool.open()
+        replayed = list(self.spool.replay())
+        self.assertEqual([dataset.SOPInstanceUID for dataset, _ in replayed], ['1.1.0', '1.1.1', '1.1.2'])
+        self.assertEqual(replayed[0][0].PatientName, 'Hanwool Park')
+        self.assertEqual(replayed[0][1], 'MODALITY')
+
+    def test_acknowledge_removes_sent_instances(self):
+        """Test that acknowledged instances are removed, while other series and late instances remain spooled."""
+        self.spool.append(self.make_dataset('4.5.6', '1.1.1')).result()
+        self.spool.append(self.make_dataset('4.5.7', '1.1.2')).result()
+        # Received while the series was sent, i.e. not part of the acknowledged dispatch
+        self.spool.append(self.make_dataset('4.5.6', '1.1.3')).result()
+
+        self.assertEqual(self.spool.acknowledge(['1.1.1']).result(), 1)
+        self.assertEqual([dataset.SOPInstanceUID for dataset, _ in self.spool.replay()], ['1.1.2', '1.1.3'])
+
+    def test_resent_instance_spooled_once(self):
+        """Test that an instance sent again replaces its spooled record."""
+        self.spool.append(self.make_dataset('4.5.6', '1.1.1')).result()
+        self.spool.append(self.make_dataset('4.5.6', '1.1.1')).result()
+        self.assertEqual(len(list(self.spool.replay())), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
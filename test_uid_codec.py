@@ -0,0 +1,34 @@
+import json
+import unittest
+from uid_codec import decode_uids, encode_uids
+
+
+class TestUidCodec(unittest.TestCase):
+
+    def test_round_trip(self):
+        """Test that the UIDs are decoded sorted and without duplicates."""
+        uids = ['1.2.840.1.10', '1.2.840.1.9', '1.2.840.1.100', '1.2', '1.2.840.1.9', '2.25.1']
+        self.assertEqual(decode_uids(encode_uids(uids)), sorted(set(uids)))
+        self.assertEqual(decode_uids(encode_uids([])), [])
+
+    def test_series_payload_compact(self):
+        """Test that the UIDs of a series are much smaller encoded than as a JSON list."""
+        uids = [f'1.2.826.0.1.3680043.8.498.10293847561029384756.{index}' for index in range(1000)]
+        self.assertLess(len(encode_uids(uids)) * 20, len(json.dumps(uids)))
+
+    def test_invalid_payload(self):
+        with self.assertRaises(ValueError):
+            decode_uids('not base64!')
+        with self.assertRaises(ValueError):
+            decode_uids('AAAA')
+
+    def test_decompression_bounded(self):
+        """Test that UIDs expanding beyond the maximum size are refused."""
+        payload = encode_uids([f'1.2.3.{index}' for index in range(10000)])
+        self.assertEqual(len(decode_uids(payload)), 10000)
+        with self.assertRaises(ValueError):
+            decode_uids(payload, max_size=1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
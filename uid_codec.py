@@ -0,0 +1,74 @@
+import base64
+import binascii
+import zlib
+
+# The UIDs of one series usually share a long root and differ in a few trailing digits, so each UID is sent as the
+# length of the prefix it shares with the previous UID (in sorted order) and the remaining suffix, and the resulting
+# text is compressed with zlib.
+
+# Maximum size in bytes of the decompressed text of the encoded UIDs, about a million UIDs
+MAX_DECODED_SIZE = 64 * 1024 ** 2
+
+
+def _shared_prefix_length(a: str, b: str) -> int:
+    """Return the length of the common prefix of two strings, by a binary search over slice comparisons."""
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def encode_uids(uids: list[str]) -> str:
+    """Encode a list of UIDs compactly for the JSON payload of a request. The order and duplicates are not kept.
+
+    Args:
+        uids (list[str]): The UIDs.
+
+    Returns:
+        str: The sorted, front coded and compressed UIDs as base64.
+    """
+    lines = []
+    previous = ''
+    for uid in sorted(set(uids)):
+        shared = _shared_prefix_length(previous, uid)
+        lines.append(f"{shared}:{uid[shared:]}")
+        previous = uid
+    return base64.b64encode(zlib.compress('\n'.join(lines).encode('ascii'))).decode('ascii')
+
+
+def decode_uids(payload: str, max_size: int = MAX_DECODED_SIZE) -> list[str]:
+    """Decode UIDs encoded with `encode_uids`.
+
+    Args:
+        payload (str): The encoded UIDs.
+        max_size (int): Maximum size in bytes of the decompressed text, larger payloads are refused without
+            decompressing them completely.
+
+    Returns:
+        list[str]: The UIDs in sorted order.
+
+    Raises:
+        ValueError: If the payload is not valid.
+    """
+    try:
+        decompressor = zlib.decompressobj()
+        data = decompressor.decompress(base64.b64decode(payload, validate=True), max_size + 1)
+        if not decompressor.eof:
+            raise ValueError("truncated or too large")
+        text = data.decode('ascii')
+    except (binascii.Error, zlib.error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"Invalid encoded UIDs: {e}") from e
+
+    uids = []
+    previous = ''
+    for line in text.split('\n') if text else ():
+        shared, separator, suffix = line.partition(':')
+        if not separator or not shared.isdigit() or int(shared) > len(previous):
+            raise ValueError(f"Invalid encoded UID entry: {line!r}")
+        previous = previous[:int(shared)] + suffix
+        uids.append(previous)
+    return uids
@@ -1,23 +1,54 @@
+import argparse
+import csv
+import json
+import os
 import sqlite3
-import pandas as pd
+import sys
 
 
-def display_database_contents():
+def display_database_contents(path: str = 'dicom_series.db', output_format: str = 'csv', out=sys.stdout):
     """
-    Connects to the SQLite database 'dicom_series.db' and retrieves all records 
-    from the 'series' table. It prints the contents of the table to validate that 
-    the the extracted information is correctly stored in the database.
+    Connects to the SQLite database 'dicom_series.db' and retrieves all records
+    from the 'series' table with their patient and study. The rows are written one
+    by one as CSV or NDJSON while they are read, so the table is never loaded into
+    memory as a whole. Use it to validate that the extracted information is
+    correctly stored in the database.
     """
 
-    conn = sqlite3.connect('dicom_series.db')
-
-    query = "SELECT * FROM series"
-
-    df = pd.read_sql_query(query, conn)
+    conn = sqlite3.connect(path)
+
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'studies'").fetchone() is None:
+        # Databases not yet migrated by the server store the patient and study in every series
+        query = "SELECT * FROM series ORDER BY SeriesInstanceUID"
+    else:
+        query = """
+        SELECT series.SeriesInstanceUID, studies.PatientID, patients.PatientName, series.StudyInstanceUID,
+            series.InstanceInSeries, series.Summary, series.StoredInstances
+        FROM series
+        LEFT JOIN studies ON studies.StudyInstanceUID = series.StudyInstanceUID
+        LEFT JOIN patients ON patients.PatientID = studies.PatientID
+        ORDER BY series.SeriesInstanceUID
+        """
+    cursor = conn.execute(query)
+    columns = [description[0] for description in cursor.description]
+
+    if output_format == 'ndjson':
+        for row in cursor:
+            out.write(json.dumps(dict(zip(columns, row))) + '\n')
+    else:
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        for row in cursor:
+            writer.writerow(row)
 
     conn.close()
 
-    print(df.to_string(index=False))
 
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export the contents of the series table.")
+    parser.add_argument('--db', default=os.environ.get('DICOM_DB_PATH', 'dicom_series.db'),
+                        help="Path of the database.")
+    parser.add_argument('--format', choices=('csv', 'ndjson'), default='csv', help="Output format.")
+    args = parser.parse_args()
 
-display_database_contents()
+    display_database_contents(args.db, args.format)